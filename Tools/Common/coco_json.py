@@ -1,8 +1,7 @@
 import json
 from collections import defaultdict
-from itertools import islice
-from copy import deepcopy
 from pathlib import Path
+from Common.detection_array import detections_from_coco_result, convert_detections_to_global, detections_to_dict_list
 
 # Writer 부분은 현재 특별히 분리 필요성이 없어서 함수만 제공
 # Predict_Postprocess의 parse_test_gt_xmls() 함수 부분 검토 필요
@@ -11,6 +10,32 @@ def coco_json_write(outpath, coco_data):
     with open(outpath, "w") as json_out:
         json.dump(coco_data, json_out, indent=4)
 
+def build_image_indexes(coco_data):
+    """ coco 형식 dict의 images로부터 도면 이름(확장자 제외) <-> image id 양방향 index 생성
+
+    Return:
+        filename_to_image_id (dict): 도면 이름을 key로, image id를 value로 갖는 dict
+        image_id_to_filename (dict): image id를 key로, 도면 이름을 value로 갖는 dict
+    """
+    filename_to_image_id = {}
+    image_id_to_filename = {}
+    for image in coco_data['images']:
+        filename = image["file_name"].split(".")[0]
+        filename_to_image_id.setdefault(filename, image["id"]) # 이름이 같은 image가 있으면 첫번째 image (기존 선형 탐색과 동일)
+        image_id_to_filename[image["id"]] = filename
+    return filename_to_image_id, image_id_to_filename
+
+def group_annotations_by_image(coco_data):
+    """ coco 형식 dict의 annotations를 image id별로 묶음 (각 image 내에서는 기존 순서 유지)
+
+    Return:
+        image id를 key로, 해당 image의 annotation list를 value로 갖는 dict (annotation이 없는 image는 빈 list)
+    """
+    annotations_by_image_id = {image["id"]: [] for image in coco_data['images']}
+    for annotation in coco_data['annotations']:
+        annotations_by_image_id.setdefault(annotation["image_id"], []).append(annotation)
+    return annotations_by_image_id
+
 class coco_json_reader():
     """ 도면 인식 관련 json 기본 클래스
 
@@ -68,19 +93,11 @@ class coco_dt_json_reader(coco_gt_json_reader):
         self.stride_h = stride_h
 
         # img_id / filename / bbox / global bbox로 용어 통일
-        self.img_id_to_bbox_dict = self.get_img_id_to_bbox_dict() # {(segmented)img_id : [(local)bbox], score, category_id}
-        self.img_id_to_global_bbox_dict = self.convert_bbox_coordinate_to_global(self.drawing_resize_scale) # {(segmented)img_id : [(global)bbox], score, category_id}
-        # 최종 결과 데이터. 도면 이름을 key로, 변환된 박스 정보들을 value로 가지고 있는 dict # TODO: 변환 기능을 별도 모듈로 분리 검토
+        self.filename_to_dets = detections_from_coco_result(self.dt_json_data, self.img_id_to_filename_dict) # {(source)img_name : detection array((local)bbox, score, category_id, tile_h, tile_w)}
+        self.filename_to_global_dets = self.convert_bbox_coordinate_to_global(self.drawing_resize_scale) # {(source)img_name : detection array((global)bbox, ...)}
+        # 최종 결과 데이터. 도면 이름을 key로, 변환된 박스 정보들을 value로 가지고 있는 dict
         self.filename_to_global_bbox_dict = self.get_filename_to_global_bbox_dict() # {(source)img_name : list([(global)bbox], score, category_id})}
 
-    def get_img_id_to_bbox_dict(self):
-        img_id_to_bbox_dict = defaultdict(list)
-
-        for result_dict in self.dt_json_data:
-            image_id = result_dict['image_id']
-            img_id_to_bbox_dict[image_id].append(dict(islice(result_dict.items(), 1, None)))
-        return img_id_to_bbox_dict
-
     def convert_bbox_coordinate_to_global(self, resize_scale):
         """ 분할 도면의 박스 좌표를 global 좌표(원본 도면 기준의 좌표)로 변환
 
@@ -88,35 +105,20 @@ class coco_dt_json_reader(coco_gt_json_reader):
             resize_scale (float): 분할시에 사용한 resize scaling factor
 
         Return:
-            도면의 id를 key로, 변환된 box 정보를 value로 갖는 dict
+            도면의 이름을 key로, 변환된 detection array를 value로 갖는 dict
         """
-        img_id_to_global_bbox_dict = deepcopy(self.img_id_to_bbox_dict)
-        for image_id in img_id_to_global_bbox_dict.keys():
-            bboxs_info = img_id_to_global_bbox_dict[image_id]
-            image_name, h, w = self.img_id_to_filename_dict[image_id]
-
-            for bbox_info in bboxs_info:
-                bbox_in_grid = bbox_info['bbox']
-                bbox_in_grid[0] = int((bbox_in_grid[0] + self.stride_w * w)/resize_scale)
-                bbox_in_grid[1] = int((bbox_in_grid[1] + self.stride_h * h)/resize_scale)
-                bbox_in_grid[2] = int(bbox_in_grid[2]/resize_scale)
-                bbox_in_grid[3] = int(bbox_in_grid[3]/resize_scale)
-
-        return img_id_to_global_bbox_dict
+        return {image_name: convert_detections_to_global(dets, self.stride_w, self.stride_h, resize_scale)
+                for image_name, dets in self.filename_to_dets.items()}
 
     def get_filename_to_global_bbox_dict(self):
-        """ 편의성을 위해 key를 id에서 도면 이름으로 변환하여 반환
+        """ 기존 코드와의 호환을 위해 detection array를 box dict의 list로 변환하여 반환
 
         Return:
             도면의 이름을 key로, 변환된 box 정보를 value로 갖는 dict
         """
         filename_to_global_bbox_dict = defaultdict(list)
-
-        for image_id in self.img_id_to_global_bbox_dict.keys():
-            bboxs_info = self.img_id_to_global_bbox_dict[image_id]
-            image_name, h, w = self.img_id_to_filename_dict[image_id]
-
-            filename_to_global_bbox_dict[image_name] += bboxs_info
+        for image_name, dets in self.filename_to_global_dets.items():
+            filename_to_global_bbox_dict[image_name] = detections_to_dict_list(dets)
 
         return filename_to_global_bbox_dict
 
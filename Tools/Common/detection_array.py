@@ -0,0 +1,134 @@
+import numpy as np
+
+# 분할 도면의 detection 결과를 박스 하나당 한 행으로 저장하는 structured array 포맷
+# (x, y, w, h는 분할 도면 좌표 또는 global 좌표, tile_h/tile_w는 분할 도면의 행/열 index)
+detection_dtype = np.dtype([
+    ('x', np.float64),
+    ('y', np.float64),
+    ('w', np.float64),
+    ('h', np.float64),
+    ('score', np.float64),
+    ('category_id', np.int64),
+    ('tile_h', np.int64),
+    ('tile_w', np.int64),
+])
+
+def empty_detections(num=0):
+    return np.zeros(num, dtype=detection_dtype)
+
+def detections_from_mmdet_result(result, tile_h, tile_w, score_threshold=None):
+    """ mmdetection의 분할 도면 하나의 inference 결과를 detection array로 변환
+
+    Arguments:
+        result (list): 클래스별 [x_min, y_min, x_max, y_max, score] 배열의 list (inference_detector 결과)
+        tile_h, tile_w (int): 분할 도면의 행/열 index
+        score_threshold (float): None이 아니면 score < score_threshold인 박스 제거
+    Return:
+        detection_dtype 형식의 np.ndarray (분할 도면 좌표)
+    """
+    counts = [len(category) for category in result]
+    if sum(counts) == 0:
+        return empty_detections()
+
+    boxes = np.concatenate([np.asarray(category, dtype=np.float64).reshape(-1, 5) for category in result])
+    category_ids = np.repeat(np.arange(len(result)), counts)
+
+    if score_threshold is not None:
+        keep = boxes[:, 4] >= score_threshold
+        boxes = boxes[keep]
+        category_ids = category_ids[keep]
+
+    dets = empty_detections(boxes.shape[0])
+    dets['x'] = boxes[:, 0]
+    dets['y'] = boxes[:, 1]
+    dets['w'] = boxes[:, 2] - boxes[:, 0]
+    dets['h'] = boxes[:, 3] - boxes[:, 1]
+    dets['score'] = boxes[:, 4]
+    dets['category_id'] = category_ids
+    dets['tile_h'] = tile_h
+    dets['tile_w'] = tile_w
+
+    return dets
+
+def detections_from_coco_result(dt_json_data, img_id_to_filename_dict):
+    """ mmdetection의 test 결과 json(COCO result 형식)을 도면별 detection array로 변환
+
+    Arguments:
+        dt_json_data (list): {'image_id', 'bbox', 'score', 'category_id'} dict의 list
+        img_id_to_filename_dict (dict): 분할 도면 id를 key로, [도면 이름, h, w]를 value로 갖는 dict
+    Return:
+        도면 이름을 key로, detection array(분할 도면 좌표)를 value로 갖는 dict
+        (도면 및 박스 순서는 json에서 분할 도면 id가 처음 등장한 순서를 유지)
+    """
+    if len(dt_json_data) == 0:
+        return {}
+
+    image_ids = np.array([x['image_id'] for x in dt_json_data])
+    boxes = np.array([x['bbox'] for x in dt_json_data], dtype=np.float64).reshape(-1, 4)
+
+    dets = empty_detections(len(dt_json_data))
+    dets['x'] = boxes[:, 0]
+    dets['y'] = boxes[:, 1]
+    dets['w'] = boxes[:, 2]
+    dets['h'] = boxes[:, 3]
+    dets['score'] = [x['score'] for x in dt_json_data]
+    dets['category_id'] = [x['category_id'] for x in dt_json_data]
+
+    unique_ids, first_index, inverse = np.unique(image_ids, return_index=True, return_inverse=True)
+    id_order = np.argsort(first_index)
+    tile_info = [img_id_to_filename_dict[image_id] for image_id in unique_ids.tolist()]
+    dets['tile_h'] = np.array([info[1] for info in tile_info])[inverse]
+    dets['tile_w'] = np.array([info[2] for info in tile_info])[inverse]
+
+    # 분할 도면 id 등장 순서대로 정렬 후, 분할 도면 단위로 잘라서 도면별로 모음
+    id_rank = np.empty_like(id_order)
+    id_rank[id_order] = np.arange(len(id_order))
+    sorted_index = np.argsort(id_rank[inverse], kind='stable')
+    dets = dets[sorted_index]
+    split_points = np.cumsum(np.bincount(id_rank[inverse], minlength=len(id_order)))[:-1]
+
+    filename_to_dets_list = {}
+    for id_index, tile_dets in zip(id_order, np.split(dets, split_points)):
+        image_name = tile_info[id_index][0]
+        filename_to_dets_list.setdefault(image_name, []).append(tile_dets)
+
+    return {image_name: np.concatenate(dets_list) for image_name, dets_list in filename_to_dets_list.items()}
+
+def convert_detections_to_global(dets, stride_w, stride_h, resize_scale):
+    """ 분할 도면 좌표의 detection array를 global 좌표(원본 도면 기준의 좌표)로 변환
+
+    Arguments:
+        dets (np.ndarray): detection_dtype 형식의 배열 (분할 도면 좌표)
+        stride_w, stride_h (int): 분할시에 사용한 stride
+        resize_scale (float): 분할시에 사용한 resize scaling factor
+    Return:
+        좌표가 변환된 새로운 detection array (좌표는 int로 절삭)
+    """
+    global_dets = dets.copy()
+    global_dets['x'] = np.trunc((dets['x'] + stride_w * dets['tile_w']) / resize_scale)
+    global_dets['y'] = np.trunc((dets['y'] + stride_h * dets['tile_h']) / resize_scale)
+    global_dets['w'] = np.trunc(dets['w'] / resize_scale)
+    global_dets['h'] = np.trunc(dets['h'] / resize_scale)
+
+    return global_dets
+
+def detections_to_dict_list(dets, coco_annotation_fields=False):
+    """ global 좌표의 detection array를 기존 코드에서 사용하는 box dict의 list로 변환
+
+    Arguments:
+        dets (np.ndarray): detection_dtype 형식의 배열 (global 좌표)
+        coco_annotation_fields (bool): True면 area, segmentation, iscrowd, ignore 항목도 추가
+    Return:
+        {'bbox': [x, y, width, height], 'score', 'category_id', ...} dict의 list
+    """
+    bboxes = np.stack([dets['x'], dets['y'], dets['w'], dets['h']], axis=1).astype(np.int64).tolist()
+    scores = dets['score'].tolist()
+    category_ids = dets['category_id'].tolist()
+
+    if coco_annotation_fields == False:
+        return [{'bbox': bbox, 'score': score, 'category_id': category_id}
+                for bbox, score, category_id in zip(bboxes, scores, category_ids)]
+
+    return [{'bbox': bbox, 'category_id': category_id, 'score': score, 'area': bbox[2] * bbox[3],
+             'segmentation': [], 'iscrowd': 0, 'ignore': 0}
+            for bbox, score, category_id in zip(bboxes, scores, category_ids)]
@@ -0,0 +1,65 @@
+import os
+import cv2
+from collections import OrderedDict
+
+class drawing_image_cache():
+    """ 도면 이미지를 한 번만 decode해서 분할, 텍스트 인식, 평가용 crop, 시각화에서 함께 사용하기 위한 LRU cache
+
+        전체 크기(byte)가 max_bytes를 넘으면 가장 오래 사용하지 않은 이미지부터 제거함.
+        grayscale, resize 된 이미지는 처음 요청될 때 원본 이미지로부터 만들어서 같은 cache에 저장함.
+        반환된 이미지는 여러 곳에서 공유하므로 수정이 필요하면 copy 후 사용해야 함
+
+    Arguments:
+        max_bytes (int): cache에 저장할 이미지들의 최대 전체 크기 (byte)
+    """
+    def __init__(self, max_bytes=1 << 30):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # {(도면 경로, variant): 이미지}
+        self.current_bytes = 0
+
+        self.hit_num = 0
+        self.miss_num = 0
+
+    def get(self, img_path):
+        """ 원본 도면 이미지 (cv2.imread(img_path)와 동일, 읽을 수 없으면 None)
+
+        """
+        return self._get((img_path, "original"), lambda: cv2.imread(img_path))
+
+    def get_gray(self, img_path):
+        """ grayscale 도면 이미지 (cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)와 같은 용도)
+
+        """
+        return self._get((img_path, "gray"), lambda: self._convert(self.get(img_path), lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)))
+
+    def get_resized(self, img_path, resize_scale):
+        """ resize_scale로 크기를 조정한 도면 이미지 (read_resized_drawing과 동일)
+
+        """
+        return self._get((img_path, "resized", resize_scale),
+                         lambda: self._convert(self.get(img_path), lambda img: cv2.resize(img, dsize=(0,0), fx=resize_scale, fy=resize_scale,
+                                                                                           interpolation=cv2.INTER_LINEAR)))
+
+    def clear(self):
+        self.entries.clear()
+        self.current_bytes = 0
+
+    def _convert(self, img, convert_func):
+        return convert_func(img) if img is not None else None
+
+    def _get(self, key, load_func):
+        key = (os.path.abspath(key[0]),) + key[1:]
+        if key in self.entries:
+            self.hit_num += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.miss_num += 1
+        img = load_func()
+        if img is not None and img.nbytes <= self.max_bytes:
+            self.entries[key] = img
+            self.current_bytes += img.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+        return img
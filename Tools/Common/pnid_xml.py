@@ -1,4 +1,4 @@
-from xml.etree.ElementTree import parse
+from xml.etree.ElementTree import parse, iterparse
 import xml.etree.ElementTree as ET
 import math
 import cv2
@@ -6,154 +6,190 @@ import os
 import numpy as np
 import matplotlib.pyplot as plt
 from xml.etree.ElementTree import Element, ElementTree, dump
+from xml.sax.saxutils import escape
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from Common.symbol_io import as_symbol_registry
 
 
-def write_symbol_result_to_xml(out_dir, dt_result, symbol_dict, symbol_type_dict=None, img_shape_tuple=(9933, 7016, 3)):
-    for filename, objects in dt_result.items():
-        root = Element("annotation")
+def write_symbol_result_to_xml(out_dir, dt_result, symbol_dict, symbol_type_dict=None, img_shape_tuple=(9933, 7016, 3), num_workers=1):
+    """ 도면별 심볼 detection 결과를 {도면 이름}.xml로 출력 (text 클래스는 제외, write_text_result_to_xml로 출력)
 
-        # add basic_drawing_information_node start
-        '''
-        width, height, depth = img_shape_tuple
-        basic_drawing_information_node = Element('basic_drawing_information')
+    Arguments:
+        symbol_dict (dict): 심볼 이름을 key로, id를 value로 갖는 dict (또는 symbol_registry)
+        symbol_type_dict (dict): None이 아니면 type 항목도 출력
+        num_workers (int): 도면을 나누어 출력할 process 수 (1이면 순차 처리)
+    """
+    registry = as_symbol_registry(symbol_dict, symbol_type_dict) # symbol_dict는 dict 또는 symbol_registry
+    out_paths = [os.path.join(out_dir, f"{filename}.xml") for filename in dt_result.keys()]
+    _run_xml_writer(partial(stream_symbol_xml, registry=registry), out_paths, list(dt_result.values()), num_workers)
 
-        filename_node = ET.SubElement(basic_drawing_information_node, "filename")
-        filename_node.text = f"{filename}.jpg"
 
-        path_node = ET.SubElement(basic_drawing_information_node, "path")
-        path_node.text = ""
+def write_text_result_to_xml(out_dir, dt_result_text, symbol_dict, num_workers=1):
+    """ 도면별 텍스트 인식 결과를 {도면 이름}_text.xml로 출력
 
-        size_node = ET.SubElement(basic_drawing_information_node, "size")
-        width_node = ET.SubElement(size_node, "width")
-        height_node = ET.SubElement(size_node, "height")
-        depth_node = ET.SubElement(size_node, "depth")
+    """
+    registry = as_symbol_registry(symbol_dict)
+    out_paths = [os.path.join(out_dir, f"{filename}_text.xml") for filename in dt_result_text.keys()]
+    _run_xml_writer(partial(stream_text_xml, registry=registry), out_paths, list(dt_result_text.values()), num_workers)
 
-        width_node.text = str(width)
-        height_node.text = str(height)
-        depth_node.text = str(depth)
 
-        root.append(basic_drawing_information_node)        # add basic_drawing_information_node end
-        '''
+def write_result_to_xml(out_dir, dt_result, dt_result_text, symbol_dict, symbol_type_dict=None, num_workers=1):
+    """ 여러 도면의 심볼 xml과 텍스트 xml을 하나의 process pool에서 함께 출력
 
-        for object in objects:
+    """
+    registry = as_symbol_registry(symbol_dict, symbol_type_dict)
+    jobs = [(stream_symbol_xml, os.path.join(out_dir, f"{filename}.xml"), objects) for filename, objects in dt_result.items()]
+    jobs += [(stream_text_xml, os.path.join(out_dir, f"{filename}_text.xml"), objects) for filename, objects in dt_result_text.items()]
+    _run_xml_writer(partial(_run_xml_job, registry=registry), [job[1] for job in jobs], jobs, num_workers)
+
+
+def _run_xml_job(out_path, job, registry):
+    job[0](out_path, job[2], registry)
 
-            # text가 key에 있는경우 제외 (텍스트는 별도 XML로 출력함)
+
+def _run_xml_writer(write_func, out_paths, objects_list, num_workers):
+    if num_workers > 1 and len(out_paths) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(write_func, out_paths, objects_list))
+    else:
+        for out_path, objects in zip(out_paths, objects_list):
+            write_func(out_path, objects)
+
+
+def stream_symbol_xml(out_path, objects, registry):
+    """ 한 도면의 심볼 detection 결과를 object 단위로 바로 파일에 출력
+
+        ElementTree를 만들고 indent() 후 write하던 기존 방식과 byte 단위로 동일한 xml을 출력함
+    """
+    with _open_xml_writer(out_path) as f:
+        object_num = 0
+        for object in objects:
             category_id = object["category_id"]
-            if "text" in symbol_dict.keys() and category_id == symbol_dict["text"]:
-                continue
-            if "text_rotated" in symbol_dict.keys() and category_id == symbol_dict["text_rotated"]:
-                continue
-            if "text_rotated_45" in symbol_dict.keys() and category_id == symbol_dict["text_rotated_45"]:
+            if registry.is_text_class(category_id): # 텍스트는 별도 XML로 출력함
                 continue
 
-            symbol_node = Element("symbol_object")
+            if object_num == 0:
+                f.write("<annotation>\n")
+            object_num += 1
 
-            class_node = Element("class")
-            symbol_name = [sym_name for sym_name, id in symbol_dict.items() if id == object["category_id"]][0]
-            class_node.text = symbol_name
+            symbol_name = registry.get_name(category_id)
+            type_name = registry.get_type(symbol_name) if registry.has_types() else None
+            f.write(_symbol_object_xml(type_name, symbol_name, object["bbox"], 0))
 
-            if symbol_type_dict is not None:
-                type_node = Element("type")
-                type_node.text = [typename_name for sym_name, typename_name in symbol_type_dict.items() if sym_name == symbol_name][0]
+        f.write("</annotation>\n" if object_num > 0 else "<annotation />")
 
-            bndbox_node = Element("bndbox")
 
-            xmin_node = Element("xmin")
-            xmin_node.text = str(object["bbox"][0])
-            ymin_node = Element("ymin")
-            ymin_node.text = str(object["bbox"][1])
-            xmax_node = Element("xmax")
-            xmax_node.text = str(object["bbox"][0] + object["bbox"][2])
-            ymax_node = Element("ymax")
-            ymax_node.text = str(object["bbox"][1] + object["bbox"][3])
+def stream_text_xml(out_path, objects, registry):
+    """ 한 도면의 텍스트 인식 결과를 object 단위로 바로 파일에 출력 (stream_symbol_xml과 동일한 방식)
 
-            bndbox_node.append(xmin_node)
-            bndbox_node.append(ymin_node)
-            bndbox_node.append(xmax_node)
-            bndbox_node.append(ymax_node)
+    """
+    with _open_xml_writer(out_path) as f:
+        if len(objects) == 0:
+            f.write("<annotation />")
+            return
 
-            degree_node = Element("degree")
-            degree_node.text = str(0)
+        f.write("<annotation>\n")
+        for object in objects:
+            f.write(_symbol_object_xml("text", object["string"], object["bbox"], registry.get_text_degree(object["category_id"])))
+        f.write("</annotation>\n")
 
-            flip_node = Element("flip")
-            flip_node.text = "n"
 
-            etc_node = Element("etc")
-            etc_node.text = ""
+def _open_xml_writer(out_path):
+    # ElementTree.write(out_path)의 기본 설정과 동일 (us-ascii, ascii 외 문자는 &#...;로 출력)
+    return open(out_path, "w", encoding="us-ascii", errors="xmlcharrefreplace", buffering=1 << 20)
 
-            if symbol_type_dict is not None:
-                symbol_node.append(type_node)
-            symbol_node.append(class_node)
-            symbol_node.append(bndbox_node)
-            symbol_node.append(degree_node)
-            symbol_node.append(flip_node)
-            symbol_node.append(etc_node)
 
-            root.append(symbol_node)
+def _xml_leaf(tag, text, indent_str):
+    if not text: # ElementTree와 같이 text가 비어 있으면 <tag /> 로 출력
+        return f"{indent_str}<{tag} />\n"
+    return f"{indent_str}<{tag}>{escape(text)}</{tag}>\n"
 
-        indent(root)
-        out_path = os.path.join(out_dir, f"{filename}.xml")
-        ElementTree(root).write(out_path)
 
+def _symbol_object_xml(type_text, class_text, bbox, degree):
+    """ indent(root) 후의 symbol_object element 하나와 같은 문자열 (type_text가 None이면 type 항목 없음)
 
-def write_text_result_to_xml(out_dir, dt_result_text, symbol_dict):
-    for filename, objects in dt_result_text.items():
-        root = Element("annotation")
-        #filename_node = Element("filename")
-        #filename_node.text = f"{filename}.jpg"
-        #root.append(filename_node)
-        for object in objects:
-            symbol_node = Element("symbol_object")
+    """
+    return "".join([
+        "  <symbol_object>\n",
+        _xml_leaf("type", type_text, "    ") if type_text is not None else "",
+        _xml_leaf("class", class_text, "    "),
+        "    <bndbox>\n",
+        f"      <xmin>{bbox[0]}</xmin>\n",
+        f"      <ymin>{bbox[1]}</ymin>\n",
+        f"      <xmax>{bbox[0] + bbox[2]}</xmax>\n",
+        f"      <ymax>{bbox[1] + bbox[3]}</ymax>\n",
+        "    </bndbox>\n",
+        f"    <degree>{degree}</degree>\n",
+        "    <flip>n</flip>\n",
+        "    <etc />\n",
+        "  </symbol_object>\n",
+    ])
+
+
+def iter_xml_objects(filepath, object_tag="object", degree_tag=None, header=None):
+    """ iterparse로 xml 파일을 읽으면서 object를 하나씩 반환하는 generator
+
+        전체 tree를 만들지 않고, object 하나를 읽을 때마다 해당 element를 지우므로
+        xml 크기와 관계없이 일정한 메모리만 사용함 (많은 xml을 읽어서 통계/평가/학습 데이터를 만들 때 사용)
+
+    Arguments:
+        filepath (string): xml 파일 경로
+        object_tag (string): object element의 tag
+        degree_tag (string): None이면 심볼 xml, 아니면 텍스트 xml로 보고 해당 tag의 값을 orientation으로 읽음
+        header (dict): None이 아니면 filename, width, height, depth를 채워서 반환
+    Return:
+        심볼 xml은 [symbolname, xmin, ymin, xmax, ymax], 텍스트 xml은 [class, xmin, ymin, xmax, ymax, orientation, string]
+        (symbol_xml_reader, text_xml_reader의 object_list 항목과 동일)
+    """
+    depth = 0
+    root = None
+    for event, element in iterparse(filepath, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if element.tag == object_tag:
+            bndbox = element.find("bndbox")
+            xmin = int(bndbox.findtext("xmin"))
+            xmax = int(bndbox.findtext("xmax"))
+            ymin = int(bndbox.findtext("ymin"))
+            ymax = int(bndbox.findtext("ymax"))
+            if degree_tag is None:
+                yield [element.findtext("name"), xmin, ymin, xmax, ymax]
+            else:
+                orientation = int(math.ceil(float(element.findtext(degree_tag)))) # 89.9991이 있음 (예외)
+                yield [element.findtext("class"), xmin, ymin, xmax, ymax, orientation, element.findtext("string")]
+            element.clear()
+        elif depth == 1 and header is not None: # root의 자식 element (object 내부의 filename 등은 제외)
+            if element.tag == "filename":
+                header["filename"] = element.text
+            elif element.tag == "size":
+                header["width"] = int(element.findtext("width"))
+                header["height"] = int(element.findtext("height"))
+                header["depth"] = int(element.findtext("depth"))
+
+        if depth == 1: # 처리가 끝난 root의 자식 element 삭제
+            root.clear()
+
+def read_symbol_xml(filepath):
+    """ 심볼 xml을 iterparse로 읽어서 symbol_xml_reader(filepath).getInfo()와 같은 값을 반환 (error_correction이 필요 없을 때 사용)
 
-            type_node = Element("type")
-            type_node.text = "text"
+    """
+    header = {}
+    object_list = list(iter_xml_objects(filepath, header=header))
+    return header.get("filename"), header["width"], header["height"], header["depth"], object_list
 
-            class_node = Element("class")
-            class_node.text = object["string"]
+def read_text_xml(filepath, object_tag="object", degree_tag="orientation"):
+    """ 텍스트 xml을 iterparse로 읽어서 text_xml_reader(filepath).getInfo()와 같은 값을 반환 (error_correction이 필요 없을 때 사용)
 
-            degree_node = Element("degree")
-            category_id = object["category_id"]
-            if 'text_rotated' in symbol_dict.keys() and category_id == symbol_dict["text_rotated"]:
-                degree_node.text = str(90)
-            elif 'text_rotated_45' in symbol_dict.keys() and category_id == symbol_dict["text_rotated_45"]:
-                degree_node.text = str(45)
-            else:
-                degree_node.text = str(0)
-
-            bndbox_node = Element("bndbox")
-
-            xmin_node = Element("xmin")
-            xmin_node.text = str(object["bbox"][0])
-            ymin_node = Element("ymin")
-            ymin_node.text = str(object["bbox"][1])
-            xmax_node = Element("xmax")
-            xmax_node.text = str(object["bbox"][0] + object["bbox"][2])
-            ymax_node = Element("ymax")
-            ymax_node.text = str(object["bbox"][1] + object["bbox"][3])
-
-
-            flip_node = Element("flip")
-            flip_node.text = "n"
-
-            etc_node = Element("etc")
-            etc_node.text = ""
-
-            bndbox_node.append(xmin_node)
-            bndbox_node.append(ymin_node)
-            bndbox_node.append(xmax_node)
-            bndbox_node.append(ymax_node)
-
-            symbol_node.append(type_node)
-            symbol_node.append(class_node)
-            symbol_node.append(bndbox_node)
-            symbol_node.append(degree_node)
-            symbol_node.append(flip_node)
-            symbol_node.append(etc_node)
-            root.append(symbol_node)
-
-        indent(root)
-        out_path = os.path.join(out_dir, f"{filename}_text.xml")
-        ElementTree(root).write(out_path)
+    """
+    header = {}
+    object_list = list(iter_xml_objects(filepath, object_tag, degree_tag, header))
+    return header.get("filename"), header["width"], header["height"], header["depth"], object_list
 
 
 class xml_reader():
@@ -32,6 +32,67 @@ def read_symbol_txt(filename, include_text_as_class, include_text_orientation_as
 
     return class_name_to_index_dict
 
+class symbol_registry():
+    """ 심볼 이름 <-> id, 심볼 이름 -> type 변환 테이블과 text 클래스 정보를 미리 계산해 두는 클래스
+
+        symbol_dict에서 id로 이름을 찾을 때 dict 전체를 순회하지 않도록, 역방향 dict를 한 번만 만들어 둠
+
+    Arguments:
+        symbol_dict (dict): 심볼 이름을 key로, id를 value로 갖는 dict (read_symbol_txt 결과)
+        symbol_type_dict (dict): 심볼 이름을 key로, type을 value로 갖는 dict (read_symbol_type_txt 결과, 없으면 None)
+    """
+    text_class_names = ("text", "text_rotated", "text_rotated_45")
+    text_class_degrees = {"text_rotated": 90, "text_rotated_45": 45}
+
+    def __init__(self, symbol_dict, symbol_type_dict=None):
+        self.name_to_id = dict(symbol_dict)
+        self.id_to_name = {}
+        for name, id in symbol_dict.items():
+            self.id_to_name.setdefault(id, name) # 같은 id가 여러 개면 먼저 나온 이름 사용 (기존 list comprehension의 [0]과 동일)
+        self.name_to_type = dict(symbol_type_dict) if symbol_type_dict is not None else None
+
+        # text, text_rotated, text_rotated_45 순서 (symbol_dict에 있는 것만)
+        self.text_class_id_list = [symbol_dict[name] for name in self.text_class_names if name in symbol_dict]
+        self.text_class_ids = frozenset(self.text_class_id_list)
+        self.text_degree_by_id = {}
+        for name in self.text_class_names[1:]:
+            if name in symbol_dict:
+                self.text_degree_by_id.setdefault(symbol_dict[name], self.text_class_degrees[name])
+
+    @classmethod
+    def from_txt(cls, symbol_txt_path, include_text_as_class, include_text_orientation_as_class, symbol_type_txt_path=None):
+        symbol_dict = read_symbol_txt(symbol_txt_path, include_text_as_class, include_text_orientation_as_class)
+        symbol_type_dict = read_symbol_type_txt(symbol_type_txt_path) if symbol_type_txt_path is not None else None
+        return cls(symbol_dict, symbol_type_dict)
+
+    def has_types(self):
+        return self.name_to_type is not None
+
+    def is_text_class(self, category_id):
+        return category_id in self.text_class_ids
+
+    def get_name(self, category_id):
+        return self.id_to_name[category_id]
+
+    def get_type(self, symbol_name):
+        return self.name_to_type[symbol_name]
+
+    def get_text_degree(self, category_id):
+        """ text 클래스 id의 xml degree (text_rotated는 90, text_rotated_45는 45, 그 외는 0)
+
+        """
+        return self.text_degree_by_id.get(category_id, 0)
+
+def as_symbol_registry(symbol_dict, symbol_type_dict=None):
+    """ symbol_dict가 dict면 symbol_registry로 변환하고, 이미 symbol_registry면 그대로 반환 (symbol_type_dict가 주어지면 type 정보를 추가)
+
+    """
+    if isinstance(symbol_dict, symbol_registry):
+        if symbol_type_dict is None or symbol_dict.has_types():
+            return symbol_dict
+        return symbol_registry(symbol_dict.name_to_id, symbol_type_dict)
+    return symbol_registry(symbol_dict, symbol_type_dict)
+
 def read_symbol_pbtxt(filename, start_id = 0, merge=True):
     symbol_dict = {}
     source_symbol_dict = {}
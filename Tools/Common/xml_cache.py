@@ -0,0 +1,174 @@
+import os
+import numpy as np
+from Common.pnid_xml import iter_xml_objects
+
+class xml_annotation_cache():
+    """ 심볼/텍스트 xml 폴더의 annotation을 column 형식의 npz 파일 하나로 저장하고 읽는 클래스
+
+        xml 파일마다 mtime, size를 함께 저장하므로, 변경되거나 새로 추가된 xml만 다시 파싱함.
+        좌표는 (N, 4) int 배열, 심볼 이름/텍스트 문자열은 string table의 index 배열로 저장되어 있어서
+        수천개의 xml을 매번 파싱하는 대신 npz 하나만 읽으면 됨
+
+    Arguments:
+        cache_path (string): npz 파일 경로 (없으면 update/save 시 생성)
+        is_text_xml (bool): True면 텍스트 xml (orientation, string도 저장)
+        object_tag, degree_tag (string): 텍스트 xml의 object, orientation tag (text_xml_reader와 동일)
+    """
+    def __init__(self, cache_path, is_text_xml=False, object_tag="object", degree_tag="orientation"):
+        self.cache_path = cache_path
+        self.is_text_xml = is_text_xml
+        self.object_tag = object_tag
+        self.degree_tag = degree_tag if is_text_xml == True else None
+
+        self.columns = None
+        self.strings = []
+        self.path_to_index = {}
+        self.pending = {} # {xml 경로: (mtime_ns, size, header, object_list)}, 아직 npz에 반영되지 않은 xml
+
+        if os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as data:
+                self.columns = {key: data[key] for key in data.files}
+            if bool(self.columns["is_text_xml"]) == is_text_xml:
+                self.strings = self.columns["strings"].tolist()
+                self.path_to_index = {path: i for i, path in enumerate(self.columns["paths"].tolist())}
+            else:
+                self.columns = None
+
+    def is_valid(self, xml_path):
+        """ xml_path가 cache에 있고 그 이후로 변경되지 않았는지 여부
+
+        """
+        xml_path = os.path.abspath(xml_path)
+        stat = os.stat(xml_path)
+        if xml_path in self.pending:
+            return self.pending[xml_path][0] == stat.st_mtime_ns and self.pending[xml_path][1] == stat.st_size
+        if xml_path in self.path_to_index:
+            i = self.path_to_index[xml_path]
+            return self.columns["mtime_ns"][i] == stat.st_mtime_ns and self.columns["file_size"][i] == stat.st_size
+        return False
+
+    def update(self, xml_paths):
+        """ xml_paths 중 cache에 없거나 변경된 xml만 파싱하고, 변경 사항이 있으면 npz 파일로 저장
+
+        Return:
+            reparsed_num (int): 새로 파싱한 xml 수
+        """
+        reparsed_num = 0
+        for xml_path in xml_paths:
+            if self.is_valid(xml_path) == False:
+                self.parse(xml_path)
+                reparsed_num += 1
+
+        if len(self.pending) > 0:
+            self.save()
+
+        return reparsed_num
+
+    def parse(self, xml_path):
+        xml_path = os.path.abspath(xml_path)
+        stat = os.stat(xml_path)
+        header = {}
+        object_list = list(iter_xml_objects(xml_path, self.object_tag, self.degree_tag, header))
+        self.pending[xml_path] = (stat.st_mtime_ns, stat.st_size, header, object_list)
+
+    def get_info(self, xml_path):
+        """ read_symbol_xml(xml_path) 또는 read_text_xml(xml_path)와 동일한 값을 반환 (cache가 오래되었으면 다시 파싱)
+
+        """
+        if self.is_valid(xml_path) == False:
+            self.parse(xml_path)
+
+        xml_path = os.path.abspath(xml_path)
+        if xml_path in self.pending:
+            _, _, header, object_list = self.pending[xml_path]
+            return header.get("filename"), header["width"], header["height"], header["depth"], [list(x) for x in object_list]
+
+        return self.get_cached_info(self.path_to_index[xml_path])
+
+    def get_cached_info(self, i):
+        """ npz에 저장된 i번째 xml의 정보를 get_info와 같은 형식으로 반환
+
+        """
+        columns = self.columns
+        start, end = columns["offsets"][i], columns["offsets"][i + 1]
+
+        strings = self.strings
+        def to_string(string_id):
+            return strings[string_id] if string_id >= 0 else None
+
+        names = [to_string(x) for x in columns["name_ids"][start:end].tolist()]
+        coords = columns["coords"][start:end].tolist()
+        if self.is_text_xml == False:
+            object_list = [[name] + coord for name, coord in zip(names, coords)]
+        else:
+            orientations = columns["orientations"][start:end].tolist()
+            texts = [to_string(x) for x in columns["text_ids"][start:end].tolist()]
+            object_list = [[name] + coord + [orientation, text] for name, coord, orientation, text in zip(names, coords, orientations, texts)]
+
+        return to_string(columns["filename_ids"][i]), *columns["shapes"][i].tolist(), object_list
+
+    def save(self):
+        """ 기존 cache와 pending을 합쳐서 column 형식으로 다시 저장
+
+        """
+        entries = {}
+        if self.columns is not None:
+            for xml_path in self.path_to_index.keys():
+                if xml_path not in self.pending:
+                    entries[xml_path] = self.get_cached_info(self.path_to_index[xml_path])
+        for xml_path, (_, _, header, object_list) in self.pending.items():
+            entries[xml_path] = (header.get("filename"), header["width"], header["height"], header["depth"], object_list)
+
+        string_to_id = {}
+        def to_id(string):
+            if string is None:
+                return -1
+            return string_to_id.setdefault(string, len(string_to_id))
+
+        paths = sorted(entries.keys())
+        mtime_ns = []
+        file_size = []
+        for xml_path in paths:
+            if xml_path in self.pending:
+                mtime_ns.append(self.pending[xml_path][0])
+                file_size.append(self.pending[xml_path][1])
+            else:
+                i = self.path_to_index[xml_path]
+                mtime_ns.append(self.columns["mtime_ns"][i])
+                file_size.append(self.columns["file_size"][i])
+
+        objects = [x for xml_path in paths for x in entries[xml_path][4]]
+        columns = {
+            "is_text_xml": np.array(self.is_text_xml),
+            "paths": np.array(paths, dtype=str),
+            "mtime_ns": np.array(mtime_ns, dtype=np.int64),
+            "file_size": np.array(file_size, dtype=np.int64),
+            "filename_ids": np.array([to_id(entries[xml_path][0]) for xml_path in paths], dtype=np.int64),
+            "shapes": np.array([entries[xml_path][1:4] for xml_path in paths], dtype=np.int64).reshape(-1, 3),
+            "offsets": np.cumsum([0] + [len(entries[xml_path][4]) for xml_path in paths]).astype(np.int64),
+            "coords": np.array([x[1:5] for x in objects], dtype=np.int64).reshape(-1, 4),
+            "name_ids": np.array([to_id(x[0]) for x in objects], dtype=np.int64),
+        }
+        if self.is_text_xml == True:
+            columns["orientations"] = np.array([x[5] for x in objects], dtype=np.int64)
+            columns["text_ids"] = np.array([to_id(x[6]) for x in objects], dtype=np.int64)
+        columns["strings"] = np.array(list(string_to_id.keys()), dtype=str)
+
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir != "":
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(self.cache_path, "wb") as f: # np.savez는 확장자가 없으면 .npz를 붙이므로 파일 객체로 저장
+            np.savez(f, **columns)
+
+        self.columns = columns
+        self.strings = columns["strings"].tolist()
+        self.path_to_index = {path: i for i, path in enumerate(paths)}
+        self.pending = {}
+
+def read_xmls_with_cache(xml_paths, cache_path, is_text_xml=False):
+    """ xml_paths를 cache를 통해 읽어서, 각 xml의 read_symbol_xml/read_text_xml 결과를 같은 순서의 list로 반환 (변경된 xml은 cache에 반영)
+
+    """
+    cache = xml_annotation_cache(cache_path, is_text_xml)
+    cache.update(xml_paths)
+    return [cache.get_info(xml_path) for xml_path in xml_paths]
@@ -1,7 +1,7 @@
 import cv2
 import os
 import numpy as np
-from Common.pnid_xml import symbol_xml_reader, text_xml_reader
+from Common.pnid_xml import read_symbol_xml, read_text_xml
 from pathlib import Path
 
 
@@ -75,8 +75,7 @@ def generate_bigsize_data(xml_list, drawing_dir, drawing_output_dir, text_xml_di
         if ext != ".xml":
             continue
 
-        xmlReader = symbol_xml_reader(str(xmlPath.resolve()))
-        img_filename, width, height, depth, object_list = xmlReader.getInfo()
+        img_filename, width, height, depth, object_list = read_symbol_xml(str(xmlPath.resolve()))
 
         for obj in object_list:
             # obj [class_name_str, bbox] -> [class_number, bbox]
@@ -92,8 +91,7 @@ def generate_bigsize_data(xml_list, drawing_dir, drawing_output_dir, text_xml_di
 
         if include_text_as_class and text_xml_dir.joinpath(xmlPath.name).exists():
             text_xml_path = str(text_xml_dir.joinpath(xmlPath.name))
-            text_xml_reader_obj = text_xml_reader(text_xml_path)
-            _, _, _, _, txt_object_list = text_xml_reader_obj.getInfo()
+            _, _, _, _, txt_object_list = read_text_xml(text_xml_path)
             for text_obj in txt_object_list:
                 # text_obj = [text, xmin, ymin, xmax, ymax, direction]
                 text_bbox = text_obj[1:5]
@@ -1,10 +1,14 @@
 import cv2
 import os
 import numpy as np
-from Common.pnid_xml import symbol_xml_reader, text_xml_reader
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from Data_Generator.segment_module import crop_tile, build_tile_object_index, get_text_class_ids, tile_object_rows
+from Common.pnid_xml import read_symbol_xml, read_text_xml
+from Common.xml_cache import read_xmls_with_cache
 
 def generate_segmented_data(xml_list, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir, symbol_dict, include_text_as_class, include_text_orientation_as_class,
-                            drawing_resize_scale, prefix):
+                            drawing_resize_scale, prefix, num_workers=1, xml_cache_dir=None):
     """ drawing_dir 내의 모든 원본 이미지 도면들을 분할하는 함수
 
     Arguments:
@@ -17,39 +21,99 @@ def generate_segmented_data(xml_list, drawing_dir, drawing_segment_dir, segment_
         include_text_as_class (bool): text 데이터를 class로 추가할 것인지
         drawing_resize_scale (float): 도면 조정 스케일
         prefix (string): train/val/test 중 하나. 분할 이미지 도면 저장 폴더명 생성에 필요
+        num_workers (int): 도면을 나누어 처리할 process 수 (1이면 순차 처리)
+        xml_cache_dir (string): None이 아니면 symbol/text xml을 이 폴더의 npz cache를 통해 읽음 (변경된 xml만 다시 파싱)
 
     Return:
         entire_segmented_info (list): 모든 분할 이미지 도면 리스트 [sub_img_name, symbol_name, xmin, ymin, xmax, ymax]
+                                      (num_workers와 관계없이 xml_list 순서대로 병합되므로 write_coco_annotation의 image id가 항상 같음)
     """
+    os.makedirs(os.path.join(drawing_segment_dir, prefix), exist_ok=True)
+
+    segment_drawing_func = partial(segment_drawing, drawing_dir=drawing_dir, drawing_segment_dir=drawing_segment_dir,
+                                   segment_params=segment_params, text_xml_dir=text_xml_dir, symbol_dict=symbol_dict,
+                                   include_text_as_class=include_text_as_class,
+                                   include_text_orientation_as_class=include_text_orientation_as_class,
+                                   drawing_resize_scale=drawing_resize_scale, prefix=prefix)
+
+    if xml_cache_dir is not None:
+        annotations = read_annotations_with_cache(xml_list, text_xml_dir, include_text_as_class, xml_cache_dir)
+    else:
+        annotations = [None] * len(xml_list)
+
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_segment_worker) as executor:
+            segmented_info_list = list(executor.map(segment_drawing_func, xml_list, annotations))
+    else:
+        segmented_info_list = map(segment_drawing_func, xml_list, annotations)
+
     entire_segmented_info = []
+    for segmented_objects_info in segmented_info_list:
+        entire_segmented_info.extend(segmented_objects_info)
 
-    for xmlPath in xml_list:
-        print(f"Proceccing {xmlPath} ...")
-        fname, ext = os.path.splitext(xmlPath)
-        if ext.lower() != ".xml":
-            continue
+    return entire_segmented_info
+
+def read_annotations_with_cache(xml_list, text_xml_dir, include_text_as_class, xml_cache_dir):
+    """ xml_list의 symbol xml과 (있으면) 같은 이름의 text xml을 cache를 통해 읽음
 
-        xmlReader = symbol_xml_reader(xmlPath)
-        img_filename, width, height, depth, object_list = xmlReader.getInfo()
+    Return:
+        annotations (list): xml_list 순서대로 (read_symbol_xml 결과, read_text_xml 결과 또는 None), xml이 아니면 None
+    """
+    symbol_xml_paths = [x for x in xml_list if os.path.splitext(x)[1].lower() == ".xml"]
+    symbol_infos = dict(zip(symbol_xml_paths, read_xmls_with_cache(symbol_xml_paths, os.path.join(xml_cache_dir, "symbol_xml.npz"))))
 
-        for i in range(len(object_list)):
-            object_list[i][0] = symbol_dict[object_list[i][0].split("-")[0]]
+    text_infos = {}
+    if include_text_as_class == True:
+        text_xml_paths = {x: os.path.join(text_xml_dir, os.path.basename(x)) for x in symbol_xml_paths}
+        text_xml_paths = {x: text_xml_path for x, text_xml_path in text_xml_paths.items() if os.path.exists(text_xml_path)}
+        text_infos = dict(zip(text_xml_paths.keys(), read_xmls_with_cache(list(text_xml_paths.values()), os.path.join(xml_cache_dir, "text_xml.npz"), True)))
 
+    return [(symbol_infos[x], text_infos.get(x)) if x in symbol_infos else None for x in xml_list]
 
-        img_file_path = os.path.join(drawing_dir, img_filename)
+def init_segment_worker():
+    # 도면 단위로 process를 나누므로, 각 process의 opencv 내부 thread는 1개만 사용
+    cv2.setNumThreads(1)
 
+def segment_drawing(xmlPath, annotation, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir, symbol_dict, include_text_as_class, include_text_orientation_as_class,
+                    drawing_resize_scale, prefix):
+    """ symbol xml 하나에 해당하는 원본 이미지 도면을 분할하여 저장하는 함수 (인자는 generate_segmented_data와 동일)
+
+    Arguments:
+        annotation (tuple): None이 아니면 미리 읽은 (symbol xml 정보, text xml 정보 또는 None). None이면 xml을 직접 파싱
+
+    Return:
+        segmented_objects_info (list): 도면의 분할 이미지 도면 정보 [sub_img_name, symbol_name, xmin, ymin, xmax, ymax]
+    """
+    print(f"Proceccing {xmlPath} ...")
+    fname, ext = os.path.splitext(xmlPath)
+    if ext.lower() != ".xml":
+        return []
+
+    if annotation is not None:
+        symbol_info, text_info = annotation
+    else:
+        symbol_info = read_symbol_xml(xmlPath)
+        text_info = None
         if include_text_as_class == True and os.path.exists(os.path.join(text_xml_dir, os.path.basename(xmlPath))):
-            text_xml_reader_obj = text_xml_reader(os.path.join(text_xml_dir, os.path.basename(xmlPath)))
-            _, _, _, _, txt_object_list = text_xml_reader_obj.getInfo()
-            segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, txt_object_list, include_text_orientation_as_class,
-                                                    symbol_dict, segment_params, drawing_resize_scale, prefix)
-        else:
-            segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, None, None,
-                                                    symbol_dict, segment_params, drawing_resize_scale, prefix)
+            text_info = read_text_xml(os.path.join(text_xml_dir, os.path.basename(xmlPath)))
 
-        entire_segmented_info.extend(segmented_objects_info)
+    img_filename, width, height, depth, object_list = symbol_info
+
+    for i in range(len(object_list)):
+        object_list[i][0] = symbol_dict[object_list[i][0].split("-")[0]]
 
-    return entire_segmented_info
+
+    img_file_path = os.path.join(drawing_dir, img_filename)
+
+    if text_info is not None:
+        _, _, _, _, txt_object_list = text_info
+        segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, txt_object_list, include_text_orientation_as_class,
+                                                symbol_dict, segment_params, drawing_resize_scale, prefix)
+    else:
+        segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, None, None,
+                                                symbol_dict, segment_params, drawing_resize_scale, prefix)
+
+    return segmented_objects_info
 
 def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, include_text_orientation_as_class, symbol_dict, segment_params, drawing_resize_scale, prefix):
     """ img_path의 원본 이미지 도면을 분할하는 함수
@@ -68,8 +132,7 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
     Return:
         seg_obj_info (list): 스케일이 적용된 분할 이미지 도면 정보 [sub_img_name, symbol_name, xmin, ymin, xmax, ymax]
     """
-    if os.path.exists(os.path.join(seg_out_dir, prefix)) == False:
-        os.mkdir(os.path.join(seg_out_dir, prefix))
+    os.makedirs(os.path.join(seg_out_dir, prefix), exist_ok=True) # 여러 process에서 동시에 호출될 수 있음
 
     out_dir = os.path.join(seg_out_dir, prefix)
 
@@ -78,7 +141,7 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
     width_stride = segment_params[2]
     height_stride = segment_params[3]
 
-    bbox_array = np.zeros((len(objects),4))
+    bbox_array = np.zeros((len(objects),4), dtype=np.int64)
     for ind in range(len(objects)):
         objects[ind] = [objects[ind][0],
                         int(objects[ind][1]*drawing_resize_scale),
@@ -89,7 +152,7 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
         bbox_array[ind, :] = np.array([bbox_object[1] , bbox_object[2], bbox_object[3], bbox_object[4]])
 
     if txt_object_list is not None:
-        txt_boox_array = np.zeros((len(txt_object_list), 4))
+        txt_boox_array = np.zeros((len(txt_object_list), 4), dtype=np.int64)
         for ind in range(len(txt_object_list)):
             txt_object_list[ind] = [txt_object_list[ind][0],
                                     int(txt_object_list[ind][1] * drawing_resize_scale),
@@ -100,81 +163,49 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
             txt_bbox_object = txt_object_list[ind]
             txt_boox_array[ind, :] = np.array([txt_bbox_object[1], txt_bbox_object[2], txt_bbox_object[3], txt_bbox_object[4]])
 
-    img = cv2.imread(img_path)
-    img = cv2.resize(img, dsize=(0,0), fx=drawing_resize_scale, fy=drawing_resize_scale, interpolation=cv2.INTER_LINEAR)
+    img = read_resized_drawing(img_path, drawing_resize_scale)
 
     seg_obj_info = []
     start_height = 0
     h_index = 0
 
+    class_ids = [object[0] for object in objects]
+    tile_index = build_tile_object_index(bbox_array, img.shape, segment_params)
+    if txt_object_list is not None:
+        txt_tile_index = build_tile_object_index(txt_boox_array, img.shape, segment_params)
+        txt_class_ids = get_text_class_ids(txt_object_list, include_text_orientation_as_class, symbol_dict)
+    no_object = np.zeros(0, dtype=np.int64)
+
     while start_height < img.shape[0]: # 1픽셀때문에 이미지를 하나 더 만들 필요는 없음
 
         start_width = 0
         w_index = 0
 
         while start_width < img.shape[1]:
-            xmin_in = bbox_array[:, 0] > start_width
-            ymin_in = bbox_array[:, 1] > start_height
-            xmax_in = bbox_array[:, 2] < start_width+width_size
-            ymax_in = bbox_array[:, 3] < start_height+height_size
-            is_bbox_in = xmin_in & ymin_in & xmax_in & ymax_in
-            in_bbox_ind = [i for i, val in enumerate(is_bbox_in) if val == True]
-
-            txt_in_bbox_ind = []
+            in_bbox_ind = tile_index.get((h_index, w_index), no_object)
+
+            txt_in_bbox_ind = no_object
             if txt_object_list is not None:
-                txt_xmin_in = txt_boox_array[:, 0] > start_width
-                txt_ymin_in = txt_boox_array[:, 1] > start_height
-                txt_xmax_in = txt_boox_array[:, 2] < start_width + width_size
-                txt_ymax_in = txt_boox_array[:, 3] < start_height + height_size
-                is_bbox_in = txt_xmin_in & txt_ymin_in & txt_xmax_in & txt_ymax_in
-                txt_in_bbox_ind = [i for i, val in enumerate(is_bbox_in) if val == True]
+                txt_in_bbox_ind = txt_tile_index.get((h_index, w_index), no_object)
 
             if len(in_bbox_ind) == 0 and len(txt_in_bbox_ind) == 0 and prefix == "train":
                 start_width += width_stride
                 w_index += 1
                 continue
 
-            sub_img = np.ones((height_size, width_size, 3)) * 255
-            if start_width+width_size > img.shape[1] and start_height+height_size > img.shape[0]:
-                sub_img[0:img.shape[0] - (start_height + height_size),
-                        0:img.shape[1] - (start_width + width_size), :] = img[start_height:start_height + height_size,
-                                                                             start_width:start_width + width_size, :]
-            elif start_width+width_size > img.shape[1]:
-                sub_img[:, 0:img.shape[1]-(start_width+width_size), :] = img[start_height:start_height+height_size, start_width:img.shape[1],:]
-            elif start_height+height_size > img.shape[0]:
-                sub_img[0:img.shape[0] - (start_height + height_size), : , :] = img[start_height:img.shape[0], start_width:start_width+width_size, :]
-            else:
-                sub_img = img[start_height:start_height+height_size, start_width:start_width+width_size, :]
+            sub_img = crop_tile(img, start_width, start_height, width_size, height_size)
 
             filename, _ = os.path.splitext(os.path.basename(img_path))
             sub_img_filename = f"{filename}_{h_index}_{w_index}.jpg"
             cv2.imwrite(os.path.join(out_dir, sub_img_filename), sub_img)
 
-
-            for i in in_bbox_ind:
-                seg_obj_info.append([sub_img_filename, objects[i][0], objects[i][1] - start_width, objects[i][2] - start_height,
-                                     objects[i][3] - start_width, objects[i][4] - start_height])
+            seg_obj_info.extend(tile_object_rows(sub_img_filename, class_ids, bbox_array, in_bbox_ind,
+                                                 start_width, start_height))
 
             # TODO: Text의 경우 text string을 같이 넣도록 추가 구현?
-            for i in txt_in_bbox_ind:
-                if include_text_orientation_as_class == True:
-                    if txt_object_list[i][5] == 0:
-                        seg_obj_info.append([sub_img_filename, symbol_dict["text"], txt_object_list[i][1] - start_width,
-                                             txt_object_list[i][2] - start_height,
-                                             txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
-                    if txt_object_list[i][5] == 90:
-                        seg_obj_info.append(
-                            [sub_img_filename, symbol_dict["text_rotated"], txt_object_list[i][1] - start_width,
-                             txt_object_list[i][2] - start_height,
-                             txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
-                    if txt_object_list[i][5] == 45:
-                        seg_obj_info.append(
-                            [sub_img_filename, symbol_dict["text_rotated_45"], txt_object_list[i][1] - start_width,
-                             txt_object_list[i][2] - start_height,
-                             txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
-                else:
-                    seg_obj_info.append([sub_img_filename, symbol_dict["text"], txt_object_list[i][1] - start_width, txt_object_list[i][2] - start_height,
-                                         txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
+            if len(txt_in_bbox_ind) > 0:
+                seg_obj_info.extend(tile_object_rows(sub_img_filename, txt_class_ids, txt_boox_array, txt_in_bbox_ind,
+                                                     start_width, start_height))
 
             if prefix != "train": # test/val은 박스가 없어도 이미지 인덱스를 만들기 위해 추가
                 seg_obj_info.append([sub_img_filename, -1,0,0,0,0])
@@ -211,64 +242,104 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
 
     return seg_obj_info
 
-def segment_image(img_path, segment_params, drawing_resize_scale):
-    """ img_path의 원본 이미지 도면을 분할하는 함수
-        
-        Arguments:
-            img_path (string): 원본 이미지 도면 경로
-            segment_params (list): 분할 파라메터 [가로 크기, 세로 크기, 가로 stride, 세로 stride]
-            drawing_resize_scale (float): 도면 조정 스케일
-        Return:
-            seg_imgs (list): 분할 이미지 도면 리스트
+def read_resized_drawing(img_path, drawing_resize_scale, drawing_cache=None):
+    """ 원본 이미지 도면을 읽고 drawing_resize_scale로 크기를 조정하여 반환
+
+    Arguments:
+        img_path (string): 원본 이미지 도면 경로
+        drawing_resize_scale (float): 도면 조정 스케일
+        drawing_cache (drawing_image_cache): None이 아니면 cache를 통해 읽음 (원본 도면도 cache에 남아서 이후 단계에서 재사용)
+    Return:
+        img (np.ndarray): 크기가 조정된 uint8 도면 이미지 (H, W, 3)
     """
+    if drawing_cache is not None:
+        return drawing_cache.get_resized(img_path, drawing_resize_scale)
 
-    # try:
     img = cv2.imread(img_path)
     img = cv2.resize(img, dsize=(0,0), fx=drawing_resize_scale, fy=drawing_resize_scale, interpolation=cv2.INTER_LINEAR)
-    # except Exception as e:
-    #     print(str(e))
+    return img
 
+def iter_segment_image(img, segment_params, tile_filter=None):
+    """ 도면 이미지를 분할하여 분할 이미지를 하나씩 반환하는 generator
+
+        분할 이미지를 list로 모두 저장하지 않으므로, inference 과정에서 stream 형태로 사용하면
+        도면 크기와 관계없이 일정한 메모리만 사용함 (경계 분할 이미지 외에는 img의 view)
+
+    Arguments:
+        img (np.ndarray): 크기가 조정된 도면 이미지 (read_resized_drawing 결과)
+        segment_params (list): 분할 파라메터 [가로 크기, 세로 크기, 가로 stride, 세로 stride]
+        tile_filter (callable): None이 아니면 분할 이미지의 (start_width, start_height)를 받아 False를 반환한 분할 이미지는 crop하지 않고 건너뜀
+    Return:
+        {'w': w_index, 'h': h_index, 'img': sub_img} 형식의 dict를 순서대로 yield
+    """
     width_size = segment_params[0]
     height_size = segment_params[1]
     width_stride = segment_params[2]
     height_stride = segment_params[3]
 
-    seg_imgs = []
-    start_height = 0
-    h_index = 0
+    for h_index, start_height in enumerate(range(0, img.shape[0], height_stride)): # 1픽셀때문에 이미지를 하나 더 만들 필요는 없음
+        for w_index, start_width in enumerate(range(0, img.shape[1], width_stride)):
+            if tile_filter is not None and not tile_filter(start_width, start_height):
+                continue
+            yield {
+                'w' : w_index,
+                'h' : h_index,
+                'img' : crop_tile(img, start_width, start_height, width_size, height_size)
+            }
 
-    while start_height < img.shape[0]: # 1픽셀때문에 이미지를 하나 더 만들 필요는 없음
-        start_width = 0
-        w_index = 0
+class ink_density_map():
+    """ 크기가 조정된 도면의 저해상도 ink 밀도 map
 
-        while start_width < img.shape[1]:
-            sub_img = np.ones((height_size, width_size, 3)) * 255
-            if start_width+width_size > img.shape[1] and start_height+height_size > img.shape[0]:
-                sub_img[0:img.shape[0] - (start_height + height_size),
-                        0:img.shape[1] - (start_width + width_size), :] = img[start_height:start_height + height_size,
-                                                                             start_width:start_width + width_size, :]
-            elif start_width+width_size > img.shape[1]:
-                sub_img[:, 0:img.shape[1]-(start_width+width_size), :] = img[start_height:start_height+height_size, start_width:img.shape[1],:]
-            elif start_height+height_size > img.shape[0]:
-                sub_img[0:img.shape[0] - (start_height + height_size), : , :] = img[start_height:img.shape[0], start_width:start_width+width_size, :]
-            else:
-                sub_img = img[start_height:start_height+height_size, start_width:start_width+width_size, :]
-
-            seg_imgs.append(
-                {
-                    'w' : w_index,
-                    'h' : h_index,
-                    'img' : sub_img
-                }
-            )
-            
-            # sub_img_filename = f"C:\\Users\\DongwonJeong\\Desktop\\seg\\{h_index}_{w_index}.jpg"
-            # cv2.imwrite(sub_img_filename, sub_img)
+        도면을 cell_size 크기의 cell로 나누어 cell별 ink(어두운) 픽셀 수를 세고 integral image로 저장하므로,
+        임의의 분할 이미지 영역의 ink 비율을 O(1)로 계산할 수 있음 (여백만 있는 분할 이미지를 inference 전에 거르는 용도)
 
-            start_width += width_stride
-            w_index += 1
+    Arguments:
+        img (np.ndarray): 크기가 조정된 도면 이미지 (read_resized_drawing 결과)
+        cell_size (int): cell 크기 (분할 크기와 stride의 약수이면 분할 이미지의 ink 비율이 정확함)
+        ink_pixel_threshold (int): 모든 채널 중 가장 어두운 값이 이 값보다 작으면 ink 픽셀로 판단
+    """
+    def __init__(self, img, cell_size=4, ink_pixel_threshold=128):
+        self.cell_size = cell_size
+        self.img_height = img.shape[0]
+        self.img_width = img.shape[1]
+
+        darkest = img
+        if img.ndim == 3: # img.min(axis=2)보다 채널별 np.minimum이 훨씬 빠름
+            darkest = img[:, :, 0]
+            for channel in range(1, img.shape[2]):
+                darkest = np.minimum(darkest, img[:, :, channel])
+
+        cell_h = -(-self.img_height // cell_size)
+        cell_w = -(-self.img_width // cell_size)
+        padded_ink = np.zeros((cell_h * cell_size, cell_w * cell_size), dtype=np.uint8)
+        padded_ink[:self.img_height, :self.img_width] = darkest < ink_pixel_threshold
+        cell_ink = padded_ink.reshape(cell_h, cell_size, cell_w, cell_size).sum(axis=3, dtype=np.int32).sum(axis=1)
+
+        self.integral = np.zeros((cell_h + 1, cell_w + 1), dtype=np.int64)
+        self.integral[1:, 1:] = cell_ink.cumsum(axis=0).cumsum(axis=1)
+
+    def ink_ratio(self, start_width, start_height, width_size, height_size):
+        """ 분할 이미지 영역 중 ink 픽셀의 비율 (도면 밖 영역은 흰색으로 취급)
+
+        """
+        x1 = min(start_width // self.cell_size, self.integral.shape[1] - 1)
+        y1 = min(start_height // self.cell_size, self.integral.shape[0] - 1)
+        x2 = min(-(-(start_width + width_size) // self.cell_size), self.integral.shape[1] - 1)
+        y2 = min(-(-(start_height + height_size) // self.cell_size), self.integral.shape[0] - 1)
+
+        ink_num = self.integral[y2, x2] - self.integral[y1, x2] - self.integral[y2, x1] + self.integral[y1, x1]
+        return ink_num / (width_size * height_size)
 
-        start_height += height_stride
-        h_index += 1
+def segment_image(img_path, segment_params, drawing_resize_scale):
+    """ img_path의 원본 이미지 도면을 분할하는 함수
+        
+        Arguments:
+            img_path (string): 원본 이미지 도면 경로
+            segment_params (list): 분할 파라메터 [가로 크기, 세로 크기, 가로 stride, 세로 stride]
+            drawing_resize_scale (float): 도면 조정 스케일
+        Return:
+            seg_imgs (list): 분할 이미지 도면 리스트 (메모리 사용량을 줄이려면 iter_segment_image 사용)
+    """
+    img = read_resized_drawing(img_path, drawing_resize_scale)
 
-    return seg_imgs
\ No newline at end of file
+    return list(iter_segment_image(img, segment_params))
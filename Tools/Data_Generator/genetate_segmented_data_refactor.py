@@ -1,11 +1,14 @@
 import cv2
 import os
 import numpy as np
-from segment_module import segment_image, segment_symbols, segment_text, index_objects
-from Common.pnid_xml import symbol_xml_reader, text_xml_reader
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from segment_module import segment_image, segment_symbols, segment_text, build_tile_object_index, get_text_class_ids, tile_object_rows
+from Common.pnid_xml import read_symbol_xml, read_text_xml
+from Common.xml_cache import read_xmls_with_cache
 
 def generate_segmented_data(xml_list, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir, symbol_dict, include_text_as_class, include_text_orientation_as_class,
-                            drawing_resize_scale, prefix):
+                            drawing_resize_scale, prefix, num_workers=1, xml_cache_dir=None):
     """ drawing_dir 내의 모든 원본 이미지 도면들을 분할하는 함수
 
     Arguments:
@@ -18,39 +21,99 @@ def generate_segmented_data(xml_list, drawing_dir, drawing_segment_dir, segment_
         include_text_as_class (bool): text 데이터를 class로 추가할 것인지
         drawing_resize_scale (float): 도면 조정 스케일
         prefix (string): train/val/test 중 하나. 분할 이미지 도면 저장 폴더명 생성에 필요
+        num_workers (int): 도면을 나누어 처리할 process 수 (1이면 순차 처리)
+        xml_cache_dir (string): None이 아니면 symbol/text xml을 이 폴더의 npz cache를 통해 읽음 (변경된 xml만 다시 파싱)
 
     Return:
         entire_segmented_info (list): 모든 분할 이미지 도면 리스트 [sub_img_name, symbol_name, xmin, ymin, xmax, ymax]
+                                      (num_workers와 관계없이 xml_list 순서대로 병합되므로 write_coco_annotation의 image id가 항상 같음)
     """
+    os.makedirs(os.path.join(drawing_segment_dir, prefix), exist_ok=True)
+
+    segment_drawing_func = partial(segment_drawing, drawing_dir=drawing_dir, drawing_segment_dir=drawing_segment_dir,
+                                   segment_params=segment_params, text_xml_dir=text_xml_dir, symbol_dict=symbol_dict,
+                                   include_text_as_class=include_text_as_class,
+                                   include_text_orientation_as_class=include_text_orientation_as_class,
+                                   drawing_resize_scale=drawing_resize_scale, prefix=prefix)
+
+    if xml_cache_dir is not None:
+        annotations = read_annotations_with_cache(xml_list, text_xml_dir, include_text_as_class, xml_cache_dir)
+    else:
+        annotations = [None] * len(xml_list)
+
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_segment_worker) as executor:
+            segmented_info_list = list(executor.map(segment_drawing_func, xml_list, annotations))
+    else:
+        segmented_info_list = map(segment_drawing_func, xml_list, annotations)
+
     entire_segmented_info = []
+    for segmented_objects_info in segmented_info_list:
+        entire_segmented_info.extend(segmented_objects_info)
+
+    return entire_segmented_info
+
+def read_annotations_with_cache(xml_list, text_xml_dir, include_text_as_class, xml_cache_dir):
+    """ xml_list의 symbol xml과 (있으면) 같은 이름의 text xml을 cache를 통해 읽음
+
+    Return:
+        annotations (list): xml_list 순서대로 (read_symbol_xml 결과, read_text_xml 결과 또는 None), xml이 아니면 None
+    """
+    symbol_xml_paths = [x for x in xml_list if os.path.splitext(x)[1].lower() == ".xml"]
+    symbol_infos = dict(zip(symbol_xml_paths, read_xmls_with_cache(symbol_xml_paths, os.path.join(xml_cache_dir, "symbol_xml.npz"))))
 
-    for xmlPath in xml_list:
-        print(f"Proceccing {xmlPath} ...")
-        fname, ext = os.path.splitext(xmlPath)
-        if ext.lower() != ".xml":
-            continue
+    text_infos = {}
+    if include_text_as_class == True:
+        text_xml_paths = {x: os.path.join(text_xml_dir, os.path.basename(x)) for x in symbol_xml_paths}
+        text_xml_paths = {x: text_xml_path for x, text_xml_path in text_xml_paths.items() if os.path.exists(text_xml_path)}
+        text_infos = dict(zip(text_xml_paths.keys(), read_xmls_with_cache(list(text_xml_paths.values()), os.path.join(xml_cache_dir, "text_xml.npz"), True)))
 
-        xmlReader = symbol_xml_reader(xmlPath)
-        img_filename, width, height, depth, object_list = xmlReader.getInfo()
+    return [(symbol_infos[x], text_infos.get(x)) if x in symbol_infos else None for x in xml_list]
 
-        for i in range(len(object_list)):
-            object_list[i][0] = symbol_dict[object_list[i][0].split("-")[0]]
+def init_segment_worker():
+    # 도면 단위로 process를 나누므로, 각 process의 opencv 내부 thread는 1개만 사용
+    cv2.setNumThreads(1)
 
+def segment_drawing(xmlPath, annotation, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir, symbol_dict, include_text_as_class, include_text_orientation_as_class,
+                    drawing_resize_scale, prefix):
+    """ symbol xml 하나에 해당하는 원본 이미지 도면을 분할하여 저장하는 함수 (인자는 generate_segmented_data와 동일)
 
-        img_file_path = os.path.join(drawing_dir, img_filename)
+    Arguments:
+        annotation (tuple): None이 아니면 미리 읽은 (symbol xml 정보, text xml 정보 또는 None). None이면 xml을 직접 파싱
 
+    Return:
+        segmented_objects_info (list): 도면의 분할 이미지 도면 정보 [sub_img_name, symbol_name, xmin, ymin, xmax, ymax]
+    """
+    print(f"Proceccing {xmlPath} ...")
+    fname, ext = os.path.splitext(xmlPath)
+    if ext.lower() != ".xml":
+        return []
+
+    if annotation is not None:
+        symbol_info, text_info = annotation
+    else:
+        symbol_info = read_symbol_xml(xmlPath)
+        text_info = None
         if include_text_as_class == True and os.path.exists(os.path.join(text_xml_dir, os.path.basename(xmlPath))):
-            text_xml_reader_obj = text_xml_reader(os.path.join(text_xml_dir, os.path.basename(xmlPath)))
-            _, _, _, _, txt_object_list = text_xml_reader_obj.getInfo()
-            segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, txt_object_list, include_text_orientation_as_class,
-                                                    symbol_dict, segment_params, drawing_resize_scale, prefix)
-        else:
-            segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, None, None,
-                                                    symbol_dict, segment_params, drawing_resize_scale, prefix)
+            text_info = read_text_xml(os.path.join(text_xml_dir, os.path.basename(xmlPath)))
 
-        entire_segmented_info.extend(segmented_objects_info)
+    img_filename, width, height, depth, object_list = symbol_info
+
+    for i in range(len(object_list)):
+        object_list[i][0] = symbol_dict[object_list[i][0].split("-")[0]]
 
-    return entire_segmented_info
+
+    img_file_path = os.path.join(drawing_dir, img_filename)
+
+    if text_info is not None:
+        _, _, _, _, txt_object_list = text_info
+        segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, txt_object_list, include_text_orientation_as_class,
+                                                symbol_dict, segment_params, drawing_resize_scale, prefix)
+    else:
+        segmented_objects_info = segment_write_images(img_file_path, drawing_segment_dir, object_list, None, None,
+                                                symbol_dict, segment_params, drawing_resize_scale, prefix)
+
+    return segmented_objects_info
 
 def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, include_text_orientation_as_class, symbol_dict, segment_params, drawing_resize_scale, prefix):
     """ img_path의 원본 이미지 도면을 분할하는 함수
@@ -69,8 +132,7 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
     Return:
         seg_obj_info (list): 스케일이 적용된 분할 이미지 도면 정보 [sub_img_name, symbol_name, xmin, ymin, xmax, ymax]
     """
-    if os.path.exists(os.path.join(seg_out_dir, prefix)) == False:
-        os.mkdir(os.path.join(seg_out_dir, prefix))
+    os.makedirs(os.path.join(seg_out_dir, prefix), exist_ok=True) # 여러 process에서 동시에 호출될 수 있음
 
     out_dir = os.path.join(seg_out_dir, prefix)
 
@@ -91,17 +153,24 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
     start_height = 0
     h_index = 0
 
+    class_ids = [object[0] for object in objects]
+    tile_index = build_tile_object_index(bbox_array, img.shape, segment_params)
+    if txt_object_list is not None:
+      txt_tile_index = build_tile_object_index(txt_bbox_array, img.shape, segment_params)
+      txt_class_ids = get_text_class_ids(txt_object_list, include_text_orientation_as_class, symbol_dict)
+    no_object = np.zeros(0, dtype=np.int64)
+
     while start_height < img.shape[0]: # 1픽셀때문에 이미지를 하나 더 만들 필요는 없음
 
         start_width = 0
         w_index = 0
 
         while start_width < img.shape[1]:
-            in_bbox_ind = index_objects(bbox_array, start_width, start_height, width_size, height_size)
+            in_bbox_ind = tile_index.get((h_index, w_index), no_object)
 
-            txt_in_bbox_ind = []
+            txt_in_bbox_ind = no_object
             if txt_object_list is not None:
-                txt_in_bbox_ind = index_objects(txt_bbox_array, start_width, start_height, width_size, height_size)
+                txt_in_bbox_ind = txt_tile_index.get((h_index, w_index), no_object)
 
             if len(in_bbox_ind) == 0 and len(txt_in_bbox_ind) == 0 and prefix == "train":
                 start_width += width_stride
@@ -114,30 +183,13 @@ def segment_write_images(img_path, seg_out_dir, objects, txt_object_list, includ
             sub_img_filename = f"{filename}_{h_index}_{w_index}.jpg"
             cv2.imwrite(os.path.join(out_dir, sub_img_filename), sub_img)
 
-            for i in in_bbox_ind:
-                seg_obj_info.append([sub_img_filename, objects[i][0], objects[i][1] - start_width, objects[i][2] - start_height,
-                                     objects[i][3] - start_width, objects[i][4] - start_height])
+            seg_obj_info.extend(tile_object_rows(sub_img_filename, class_ids, bbox_array, in_bbox_ind,
+                                                 start_width, start_height))
 
             # TODO: Text의 경우 text string을 같이 넣도록 추가 구현?
-            for i in txt_in_bbox_ind:
-                if include_text_orientation_as_class == True:
-                    if txt_object_list[i][5] == 0:
-                        seg_obj_info.append([sub_img_filename, symbol_dict["text"], txt_object_list[i][1] - start_width,
-                                             txt_object_list[i][2] - start_height,
-                                             txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
-                    if txt_object_list[i][5] == 90:
-                        seg_obj_info.append(
-                            [sub_img_filename, symbol_dict["text_rotated"], txt_object_list[i][1] - start_width,
-                             txt_object_list[i][2] - start_height,
-                             txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
-                    if txt_object_list[i][5] == 45:
-                        seg_obj_info.append(
-                            [sub_img_filename, symbol_dict["text_rotated_45"], txt_object_list[i][1] - start_width,
-                             txt_object_list[i][2] - start_height,
-                             txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
-                else:
-                    seg_obj_info.append([sub_img_filename, symbol_dict["text"], txt_object_list[i][1] - start_width, txt_object_list[i][2] - start_height,
-                                         txt_object_list[i][3] - start_width, txt_object_list[i][4] - start_height])
+            if len(txt_in_bbox_ind) > 0:
+                seg_obj_info.extend(tile_object_rows(sub_img_filename, txt_class_ids, txt_bbox_array, txt_in_bbox_ind,
+                                                     start_width, start_height))
 
             if prefix != "train": # test/val은 박스가 없어도 이미지 인덱스를 만들기 위해 추가
                 seg_obj_info.append([sub_img_filename, -1,0,0,0,0])
@@ -1,7 +1,7 @@
 import numpy as np
 
 def segment_symbols(objects, drawing_resize_scale):
-    bbox_array = np.zeros((len(objects),4))
+    bbox_array = np.zeros((len(objects),4), dtype=np.int64)
     for ind in range(len(objects)):
         objects[ind] = [objects[ind][0],
                         int(objects[ind][1]*drawing_resize_scale),
@@ -13,7 +13,7 @@ def segment_symbols(objects, drawing_resize_scale):
     return bbox_array
 
 def segment_text(txt_object_list, drawing_resize_scale):
-  txt_bbox_array = np.zeros((len(txt_object_list), 4))
+  txt_bbox_array = np.zeros((len(txt_object_list), 4), dtype=np.int64)
   for ind in range(len(txt_object_list)):
       txt_object_list[ind] = [txt_object_list[ind][0],
                               int(txt_object_list[ind][1] * drawing_resize_scale),
@@ -34,16 +34,102 @@ def index_objects(bbox_array, start_width, start_height, width_size, height_size
   in_bbox_ind = [i for i, val in enumerate(is_bbox_in) if val == True]
   return in_bbox_ind
 
+def build_tile_object_index(bbox_array, img_shape, segment_params):
+  """ 각 분할 이미지에 완전히 포함되는 object index를 미리 계산하는 함수
+
+    object (xmin, ymin, xmax, ymax)가 분할 이미지 (start_width, start_height)에 포함되려면
+    start_width < xmin, xmax < start_width + width_size 이어야 하므로 (세로도 동일),
+    object마다 포함되는 분할 이미지의 행/열 index 범위를 직접 계산함. 분할 이미지마다 전체 object를 비교하지 않아도 됨
+
+  Arguments:
+    bbox_array (np.ndarray): (N, 4) [xmin, ymin, xmax, ymax] int 박스 배열 (스케일 적용된 좌표)
+    img_shape (tuple): 크기가 조정된 도면 이미지의 shape
+    segment_params (list): 분할 파라메터 [가로 크기, 세로 크기, 가로 stride, 세로 stride]
+  Return:
+    (h_index, w_index)를 key로, 포함되는 object index 배열(오름차순)을 value로 갖는 dict (object가 없는 분할 이미지는 key 없음)
+  """
+  width_size = segment_params[0]
+  height_size = segment_params[1]
+  width_stride = segment_params[2]
+  height_stride = segment_params[3]
+
+  w_num = -(-img_shape[1] // width_stride)
+  h_num = -(-img_shape[0] // height_stride)
+
+  # w_index * stride < xmin  ->  w_index <= (xmin - 1) // stride
+  # w_index * stride > xmax - size  ->  w_index >= ceil((xmax - size + 1) / stride)
+  w_lo = np.maximum(-((width_size - 1 - bbox_array[:, 2]) // width_stride), 0)
+  w_hi = np.minimum((bbox_array[:, 0] - 1) // width_stride, w_num - 1)
+  h_lo = np.maximum(-((height_size - 1 - bbox_array[:, 3]) // height_stride), 0)
+  h_hi = np.minimum((bbox_array[:, 1] - 1) // height_stride, h_num - 1)
+
+  w_count = np.maximum(w_hi - w_lo + 1, 0)
+  h_count = np.maximum(h_hi - h_lo + 1, 0)
+  tile_count = w_count * h_count
+
+  # object별 (object, 분할 이미지) 쌍을 펼친 뒤, 분할 이미지 순으로 정렬 (stable이므로 object index 오름차순 유지)
+  object_ids = np.repeat(np.arange(bbox_array.shape[0]), tile_count)
+  k = np.arange(object_ids.shape[0]) - np.repeat(np.cumsum(tile_count) - tile_count, tile_count)
+  tile_h = h_lo[object_ids] + k // w_count[object_ids]
+  tile_w = w_lo[object_ids] + k % w_count[object_ids]
+
+  tile_ids = tile_h * w_num + tile_w
+  order = np.argsort(tile_ids, kind='stable')
+  tile_ids = tile_ids[order]
+  object_ids = object_ids[order]
+
+  unique_tile_ids, split_points = np.unique(tile_ids, return_index=True)
+  return {(tile_id // w_num, tile_id % w_num): ids
+          for tile_id, ids in zip(unique_tile_ids.tolist(), np.split(object_ids, split_points[1:]))}
+
+def get_text_class_ids(txt_object_list, include_text_orientation_as_class, symbol_dict):
+  """ text object별 category id list를 반환 (orientation class를 사용할 때 0/45/90도가 아닌 text는 None)
+
+  """
+  if include_text_orientation_as_class == False:
+    return [symbol_dict["text"]] * len(txt_object_list)
+
+  orientation_to_class = {0: "text", 90: "text_rotated", 45: "text_rotated_45"}
+  return [symbol_dict[orientation_to_class[txt_object[5]]] if txt_object[5] in orientation_to_class else None
+          for txt_object in txt_object_list]
+
+def tile_object_rows(sub_img_filename, class_ids, bbox_array, object_ids, start_width, start_height):
+  """ 분할 이미지에 포함되는 object들의 [sub_img_name, symbol_name, xmin, ymin, xmax, ymax] 행을 한 번에 생성
+
+  Arguments:
+    sub_img_filename (string): 분할 이미지 파일 이름
+    class_ids (list): object별 category id (None이면 행을 만들지 않음)
+    bbox_array (np.ndarray): (N, 4) [xmin, ymin, xmax, ymax] int 박스 배열
+    object_ids (np.ndarray): 분할 이미지에 포함되는 object index
+    start_width, start_height (int): 분할 이미지의 좌상단 좌표
+  Return:
+    분할 이미지 좌표로 변환된 행의 list
+  """
+  boxes = (bbox_array[object_ids] - np.array([start_width, start_height, start_width, start_height])).tolist()
+  return [[sub_img_filename, class_ids[i]] + box for i, box in zip(object_ids.tolist(), boxes) if class_ids[i] is not None]
+
+def crop_tile(img, start_width, start_height, width_size, height_size):
+  """ 도면에서 (start_width, start_height) 위치의 분할 이미지를 잘라서 반환
+
+    도면 내부에 완전히 포함되는 분할 이미지는 복사 없이 img의 view를 반환하고,
+    도면 경계에 걸치는 분할 이미지만 흰색(255)으로 채운 uint8 배열에 복사하여 반환함
+
+  Arguments:
+    img (np.ndarray): 크기가 조정된 도면 이미지
+    start_width, start_height (int): 분할 이미지의 좌상단 좌표
+    width_size, height_size (int): 분할 이미지의 크기
+  Return:
+    sub_img (np.ndarray): (height_size, width_size, channel) 크기의 분할 이미지
+  """
+  end_width = min(start_width + width_size, img.shape[1])
+  end_height = min(start_height + height_size, img.shape[0])
+  view = img[start_height:end_height, start_width:end_width]
+  if view.shape[0] == height_size and view.shape[1] == width_size:
+      return view
+  sub_img = np.full((height_size, width_size) + img.shape[2:], 255, dtype=img.dtype)
+  sub_img[0:view.shape[0], 0:view.shape[1]] = view
+  return sub_img
+
 def segment_image(img, start_width, start_height, width_size, height_size):
-  sub_img = np.ones((height_size, width_size, 3)) * 255
-  if start_width+width_size > img.shape[1] and start_height+height_size > img.shape[0]:
-      sub_img[0:img.shape[0] - (start_height + height_size),
-              0:img.shape[1] - (start_width + width_size), :] = img[start_height:start_height + height_size,
-                                                                    start_width:start_width + width_size, :]
-  elif start_width+width_size > img.shape[1]:
-      sub_img[:, 0:img.shape[1]-(start_width+width_size), :] = img[start_height:start_height+height_size, start_width:img.shape[1],:]
-  elif start_height+height_size > img.shape[0]:
-      sub_img[0:img.shape[0] - (start_height + height_size), : , :] = img[start_height:img.shape[0], start_width:start_width+width_size, :]
-  else:
-      sub_img = img[start_height:start_height+height_size, start_width:start_width+width_size, :]
-  return sub_img
\ No newline at end of file
+  # crop_tile과 같음 (기존 이름 유지)
+  return crop_tile(img, start_width, start_height, width_size, height_size)
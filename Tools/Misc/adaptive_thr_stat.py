@@ -1,6 +1,6 @@
 import os
 import numpy as np
-from Common.pnid_xml import symbol_xml_reader
+from Common.xml_cache import read_xmls_with_cache
 from Common.symbol_io import read_symbol_txt
 from collections import defaultdict
 
@@ -8,6 +8,7 @@ base_dir = "D:/Test_Models/PNID/HyundaiEng/210520_Data/"
 drawing_dir = base_dir + "Drawing"
 symbol_xml_dir = base_dir + "SymbolXML"
 text_xml_dir = base_dir + "TextXML"
+xml_cache_path = base_dir + "XMLCache/symbol_xml.npz"
 
 val_drawings = ['26071-200-M6-052-00004', '26071-200-M6-052-00013', '26071-200-M6-052-00015', '26071-200-M6-052-00021',
                 '26071-200-M6-052-00032', '26071-200-M6-052-00036', '26071-200-M6-052-00048', '26071-200-M6-052-00074',
@@ -38,15 +39,14 @@ val_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in val_drawings]
 test_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in test_drawings]
 
 self_interection_stat = defaultdict(list)
-for xml in train_xmls + val_xmls:
+for xml, (_, _, _, _, object_list) in zip(train_xmls + val_xmls, read_xmls_with_cache(train_xmls + val_xmls, xml_cache_path)):
     print(xml)
-    sym_data = symbol_xml_reader(xml)
 
-    boxes = np.array([[x[1],x[2],x[3],x[4]] for x in sym_data.object_list])
+    boxes = np.array([[x[1],x[2],x[3],x[4]] for x in object_list])
     boxes[:,2] = boxes[:,2] - boxes[:,0]
     boxes[:, 3] = boxes[:, 3] - boxes[:, 1] # [xmin, ymin, xmax, ymax] -> [x, y, w, h]
 
-    classes = np.array([symbol_dict[x[0]] for x in sym_data.object_list])
+    classes = np.array([symbol_dict[x[0]] for x in object_list])
 
     unique_classes = set(classes)
 
@@ -0,0 +1,140 @@
+import numpy as np
+
+def box_iou_matrix(dt_boxes, gt_boxes, gt_areas=None):
+    """ dt 박스들과 gt 박스들 간의 IOU 행렬 (compare_gt_and_dt의 기존 계산과 같은 +1 픽셀 기준, 같은 연산 순서)
+
+    Arguments:
+        dt_boxes (np.ndarray): (D, 4) [x, y, width, height] 박스 배열
+        gt_boxes (np.ndarray): (G, 4) [x, y, width, height] 박스 배열
+        gt_areas (np.ndarray): (G,) gt 박스 넓이 (None이면 계산)
+    Return:
+        iou (np.ndarray): (D, G) IOU 행렬
+    """
+    if gt_areas is None:
+        gt_areas = gt_boxes[:, 2] * gt_boxes[:, 3]
+    dt_areas = dt_boxes[:, 2] * dt_boxes[:, 3]
+
+    intersection_x1 = np.maximum(dt_boxes[:, None, 0], gt_boxes[None, :, 0])
+    intersection_y1 = np.maximum(dt_boxes[:, None, 1], gt_boxes[None, :, 1])
+    intersection_x2 = np.minimum(dt_boxes[:, None, 0] + dt_boxes[:, None, 2], gt_boxes[None, :, 0] + gt_boxes[None, :, 2])
+    intersection_y2 = np.minimum(dt_boxes[:, None, 1] + dt_boxes[:, None, 3], gt_boxes[None, :, 1] + gt_boxes[None, :, 3])
+
+    intersection_w = np.maximum(0, intersection_x2 - intersection_x1 + 1)
+    intersection_h = np.maximum(0, intersection_y2 - intersection_y1 + 1)
+    intersection = intersection_w * intersection_h
+
+    return intersection / (gt_areas[None, :] + dt_areas[:, None] - intersection)
+
+def same_class_iou_pairs(dt_boxes, dt_classes, gt_boxes, gt_classes, min_iou, strip_size=256, max_block_elements=1 << 20):
+    """ 같은 클래스의 dt-gt 박스 쌍 중 IOU > min_iou인 쌍을 모두 반환
+
+        클래스별로 dt, gt를 x 좌표 순으로 정렬하고, dt strip_size개씩 x 방향으로 겹칠 수 있는 gt들과의 IOU 행렬을 한 번에 계산함.
+        (IOU > min_iou >= 0 이려면 교집합이 있어야 하므로 x 범위가 겹치지 않는 gt는 계산하지 않아도 결과가 같음)
+
+    Arguments:
+        strip_size (int): 한 번에 IOU 행렬을 계산할 dt 수 (IOU 행렬 원소 수가 max_block_elements를 넘으면 줄임)
+    Return:
+        dt_index, gt_index (np.ndarray): 쌍의 dt, gt index
+        iou (np.ndarray): 쌍의 IOU
+    """
+    gt_areas = gt_boxes[:, 2] * gt_boxes[:, 3]
+
+    dt_index_list = []
+    gt_index_list = []
+    iou_list = []
+    for c in np.intersect1d(dt_classes, gt_classes):
+        class_dt_index = np.where(dt_classes == c)[0]
+        class_dt_index = class_dt_index[np.argsort(dt_boxes[class_dt_index, 0], kind="stable")]
+        class_gt_index = np.where(gt_classes == c)[0]
+        class_gt_index = class_gt_index[np.argsort(gt_boxes[class_gt_index, 0], kind="stable")]
+        class_gt_boxes = gt_boxes[class_gt_index]
+        class_gt_areas = gt_areas[class_gt_index]
+        class_gt_x1 = class_gt_boxes[:, 0]
+        max_gt_width = class_gt_boxes[:, 2].max()
+
+        chunk_size = min(strip_size, max(max_block_elements // class_gt_index.shape[0], 1))
+        for start in range(0, class_dt_index.shape[0], chunk_size):
+            chunk_dt_index = class_dt_index[start:start + chunk_size]
+            chunk_dt_boxes = dt_boxes[chunk_dt_index]
+
+            gt_start, gt_end = 0, class_gt_index.shape[0]
+            if min_iou >= 0:
+                gt_start = np.searchsorted(class_gt_x1, chunk_dt_boxes[:, 0].min() - max_gt_width - 1, side="left")
+                gt_end = np.searchsorted(class_gt_x1, (chunk_dt_boxes[:, 0] + chunk_dt_boxes[:, 2]).max() + 1, side="right")
+                if gt_start >= gt_end:
+                    continue
+
+            iou = box_iou_matrix(chunk_dt_boxes, class_gt_boxes[gt_start:gt_end], class_gt_areas[gt_start:gt_end])
+            rows, cols = np.nonzero(iou > min_iou)
+            dt_index_list.append(chunk_dt_index[rows])
+            gt_index_list.append(class_gt_index[gt_start + cols])
+            iou_list.append(iou[rows, cols])
+
+    if len(iou_list) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(dt_index_list), np.concatenate(gt_index_list), np.concatenate(iou_list)
+
+def greedy_match(dt_order, dt_index, gt_index, iou, dt_boxes, gt_boxes):
+    """ score 순으로 정렬된 dt마다, IOU가 높은 gt부터 아직 매칭되지 않은 gt 하나와 매칭
+
+        dt_index, gt_index, iou는 매칭 후보 쌍(같은 클래스, IOU > threshold)이며, 기존 compare_gt_and_dt와 같은 결과를 반환함.
+        (기존 구현은 gt 전체의 IOU를 argsort한 순서를 사용하므로, 한 dt의 후보들 중 IOU가 같은 gt가 있으면
+        그 dt만 기존과 같이 전체 IOU를 argsort해서 순서를 정함)
+
+    Arguments:
+        dt_order (np.ndarray): score 내림차순으로 정렬된 dt index ((-scores).argsort())
+        dt_boxes, gt_boxes (np.ndarray): IOU가 같은 후보가 있을 때 순서를 정하기 위한 박스 배열
+    Return:
+        gt_to_dt (dict): gt index를 key로, 매칭된 dt index를 value로 갖는 dict
+        dt_to_gt (dict): dt의 score 순위(dt_order에서의 위치)를 key로, 매칭된 gt index를 value로 갖는 dict (기존 구현과 동일)
+    """
+    gt_to_dt = {}
+    dt_to_gt = {}
+    if iou.shape[0] == 0:
+        return gt_to_dt, dt_to_gt
+
+    dt_rank = np.empty_like(dt_order)
+    dt_rank[dt_order] = np.arange(dt_order.shape[0])
+
+    # dt 순위별로, 같은 dt 내에서는 IOU 내림차순으로 정렬
+    pair_rank = dt_rank[dt_index]
+    pair_order = np.lexsort((-iou, pair_rank))
+    pair_rank = pair_rank[pair_order]
+    pair_gt = gt_index[pair_order]
+    pair_iou = iou[pair_order]
+
+    same_dt = pair_rank[1:] == pair_rank[:-1]
+    tied_ranks = set(pair_rank[1:][same_dt & (pair_iou[1:] == pair_iou[:-1])].tolist())
+
+    group_starts = np.concatenate([[0], np.where(~same_dt)[0] + 1, [pair_rank.shape[0]]]).tolist()
+    pair_rank = pair_rank.tolist()
+    pair_gt = pair_gt.tolist()
+
+    gt_areas = gt_boxes[:, 2] * gt_boxes[:, 3]
+    for start, end in zip(group_starts[:-1], group_starts[1:]):
+        rank = pair_rank[start]
+        candidates = pair_gt[start:end]
+        if rank in tied_ranks:
+            row_iou = box_iou_matrix(dt_boxes[dt_order[rank]][None, :], gt_boxes, gt_areas)[0]
+            row_order = np.empty(gt_boxes.shape[0], dtype=np.int64)
+            row_order[(-row_iou).argsort()] = np.arange(gt_boxes.shape[0])
+            candidates = sorted(candidates, key=lambda g: row_order[g])
+
+        for g in candidates:
+            if g not in gt_to_dt:
+                gt_to_dt[g] = int(dt_order[rank])
+                dt_to_gt[rank] = g
+                break
+
+    return gt_to_dt, dt_to_gt
+
+def match_drawing(gt_boxes, gt_classes, dt_boxes, dt_classes, dt_scores, matching_iou_threshold):
+    """ 도면 하나의 gt, dt 박스를 매칭 (compare_gt_and_dt의 도면 하나에 대한 결과와 동일)
+
+    """
+    dt_order = (-dt_scores).argsort()
+    if gt_boxes.shape[0] == 0 or dt_boxes.shape[0] == 0:
+        return {}, {}
+
+    dt_index, gt_index, iou = same_class_iou_pairs(dt_boxes, dt_classes, gt_boxes, gt_classes, matching_iou_threshold)
+    return greedy_match(dt_order, dt_index, gt_index, iou, dt_boxes, gt_boxes)
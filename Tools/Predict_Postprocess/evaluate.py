@@ -2,11 +2,14 @@ import os, sys, io
 import numpy as np
 import cv2 as cv
 from collections import defaultdict
+from contextlib import redirect_stdout
 from pycocotools import coco, cocoeval
 from pathlib import Path
 
 
-from Common.coco_json import coco_json_write
+from Common.coco_json import coco_json_write, build_image_indexes
+from Common.symbol_io import as_symbol_registry
+from Predict_Postprocess.box_matching import match_drawing, same_class_iou_pairs, greedy_match
 
 class evaluate():
     """ Precision-Recall, AP 성능 계산 및 결과 Dump
@@ -33,74 +36,27 @@ class evaluate():
         dt_to_gt_match_dict = {}
 
         for filename, annotations in dt_result.items():
-            gt_to_result_index_match_dict = {}
-            result_to_gt_index_match_dict = {}
-
-            gt_boxes = [x["bbox"] for x in gt_result[filename]]
-            gt_boxes = np.array(gt_boxes)
-            g_w = gt_boxes[:, 2]
-            g_h = gt_boxes[:, 3]
-            gt_boxes_area = g_w * g_h
-            gt_boxes_class = [x["category_id"] for x in gt_result[filename]]
-            gt_boxes_class = np.array(gt_boxes_class)
-
-            boxes = np.array([x["bbox"] for x in annotations])
-            classes = np.array([x["category_id"] for x in annotations])
-            scores = np.array([x["score"] for x in annotations])
-            result_boxes = np.zeros((boxes.shape[0], boxes.shape[1] + 2))
-            result_boxes[:,0:4] = boxes
-            result_boxes[:,4] = classes
-            result_boxes[:,5] = scores
-
-            result_boxes_score = result_boxes[:, -1]
-            result_boxes_score_sorted_index = (-result_boxes_score).argsort()
-            result_boxes_score_sorted = result_boxes[result_boxes_score_sorted_index]
-
-            for result_index in range(result_boxes_score_sorted.shape[0]):
-                result_box, result_box_class = result_boxes_score_sorted[result_index, :-2], result_boxes_score_sorted[
-                    result_index, -2]
-
-                same_class_gt_box_index = (result_box_class == gt_boxes_class)
-                if np.any(same_class_gt_box_index) == False:
-                    continue
-
-                r_w = result_box[2]
-                r_h = result_box[3]
-                result_box_area = r_w * r_h
-
-                intersection_x1 = np.maximum(result_box[0], gt_boxes[:, 0])
-                intersection_y1 = np.maximum(result_box[1], gt_boxes[:, 1])
-                intersection_x2 = np.minimum(result_box[0] + result_box[2], gt_boxes[:, 0] + gt_boxes[:, 2])
-                intersection_y2 = np.minimum(result_box[1] + result_box[3], gt_boxes[:, 1] + gt_boxes[:, 3])
-
-                intersection_w = np.maximum(0, intersection_x2 - intersection_x1 + 1)
-                intersection_h = np.maximum(0, intersection_y2 - intersection_y1 + 1)
-                intersection = intersection_w * intersection_h
-
-                iou = intersection / (gt_boxes_area + result_box_area - intersection)
-
-                iou_threshold = matching_iou_threshold
-                over_IOU_index = iou > iou_threshold
-                iou_sorted_index = (-iou).argsort()
-
-                iou_sorted_over_threshold_same_class_index = (over_IOU_index & same_class_gt_box_index)[iou_sorted_index]
-                iou_sorted_same_class_over_iou_threshold_indexs = np.where(iou_sorted_over_threshold_same_class_index)[0]
-
-                for iou_sorted_same_class_over_iou_threshold_index in iou_sorted_same_class_over_iou_threshold_indexs:
-                    real_gt_index = iou_sorted_index[iou_sorted_same_class_over_iou_threshold_index]
-                    real_result_index = result_boxes_score_sorted_index[result_index]
-
-                    if real_gt_index not in gt_to_result_index_match_dict.keys():
-                        gt_to_result_index_match_dict[real_gt_index] = real_result_index
-                        result_to_gt_index_match_dict[result_index] = real_gt_index
-                        break
+            gt_boxes = np.array([x["bbox"] for x in gt_result[filename]]).reshape(-1, 4)
+            gt_boxes_class = np.array([x["category_id"] for x in gt_result[filename]])
+
+            # 기존과 같이 box, class, score를 float 배열로 저장한 값을 사용
+            result_boxes = np.zeros((len(annotations), 6))
+            if len(annotations) > 0:
+                result_boxes[:,0:4] = np.array([x["bbox"] for x in annotations])
+                result_boxes[:,4] = np.array([x["category_id"] for x in annotations])
+                result_boxes[:,5] = np.array([x["score"] for x in annotations])
+
+            # 같은 클래스의 gt-dt IOU를 행렬 단위로 계산한 후, score 순으로 greedy 매칭
+            gt_to_result_index_match_dict, result_to_gt_index_match_dict = match_drawing(gt_boxes, gt_boxes_class,
+                                                                                         result_boxes[:,0:4], result_boxes[:,4], result_boxes[:,5],
+                                                                                         matching_iou_threshold)
 
             gt_to_dt_match_dict[filename] = gt_to_result_index_match_dict
             dt_to_gt_match_dict[filename] = result_to_gt_index_match_dict
 
         return gt_to_dt_match_dict, dt_to_gt_match_dict
     
-    def label_cropped_image(self, gt_result, dt_result, gt_to_dt_match_dict, symbol_dict, imgs_path):
+    def label_cropped_image(self, gt_result, dt_result, gt_to_dt_match_dict, symbol_dict, imgs_path, drawing_cache=None):
         """ Recognition 결과를 파일로 출력. test 내에 존재하는 모든 도면에 대해 한 파일로 한꺼번에 출력함
 
         Arguments:
@@ -109,6 +65,7 @@ class evaluate():
             gt_to_dt_match_dict (dict): gt의 심볼 index를 key로, 매칭된 dt의 심볼 index를 value로 갖는 dict
             recognition_result (dict): 도면 이름을 key로, 각 도면에서의 text recognition 계산에 필요한 정보들(recog_num, gt_text_num)을 저장한 dict
             symbol_dict (dict): 심볼 이름을 key로, id를 value로 갖는 dict
+            drawing_cache (drawing_image_cache): None이 아니면 도면을 cache를 통해 읽음
         Returns:
             None
         """
@@ -121,7 +78,7 @@ class evaluate():
             Path(f"{self.output_dir}/tp_cropped/{filename}").mkdir(parents=True, exist_ok=True)
             Path(f"{self.output_dir}/dt_only_cropped/{filename}").mkdir(parents=True, exist_ok=True)
 
-            diagram_img = cv.imread(img_path)
+            diagram_img = drawing_cache.get(img_path) if drawing_cache is not None else cv.imread(img_path)
 
             for gt_index, gt_value in enumerate(gt_values):
                 dt_value = {}
@@ -162,7 +119,7 @@ class evaluate():
                         idx += 1
                     cv.imwrite(write_path, cropped)
 
-    def visualize_recog_image(self, gt_result, dt_result, gt_to_dt_match_dict, symbol_dict, imgs_path):
+    def visualize_recog_image(self, gt_result, dt_result, gt_to_dt_match_dict, symbol_dict, imgs_path, drawing_cache=None):
         """ Recognition 결과를 파일로 출력. test 내에 존재하는 모든 도면에 대해 한 파일로 한꺼번에 출력함
 
         Arguments:
@@ -171,6 +128,7 @@ class evaluate():
             gt_to_dt_match_dict (dict): gt의 심볼 index를 key로, 매칭된 dt의 심볼 index를 value로 갖는 dict
             recognition_result (dict): 도면 이름을 key로, 각 도면에서의 text recognition 계산에 필요한 정보들(recog_num, gt_text_num)을 저장한 dict
             symbol_dict (dict): 심볼 이름을 key로, id를 value로 갖는 dict
+            drawing_cache (drawing_image_cache): None이 아니면 도면을 cache를 통해 읽음
         Returns:
             None
         """
@@ -183,7 +141,7 @@ class evaluate():
             Path(f"{self.output_dir}/visualized/{filename}").mkdir(parents=True, exist_ok=True)
             Path(f"{self.output_dir}/dt_only_cropped/{filename}").mkdir(parents=True, exist_ok=True)
 
-            diagram_img = cv.imread(img_path)
+            diagram_img = drawing_cache.get(img_path) if drawing_cache is not None else cv.imread(img_path)
 
             for gt_index, gt_value in enumerate(gt_values):
                 dt_value = {}
@@ -285,15 +243,16 @@ class evaluate():
                 mean_recog_ratio = mean_recog_ratio / total_tp_text_num if total_tp_text_num != 0 else 0
             f.write(f"(mean recognition ratio) = ({mean_recog_ratio})")
 
-    def dump_pr_and_ap_result(self, pr_result, ap_result_str, recognition_result, symbol_dict, ap_result_only_sym_str=None, score_type = 'gt'):
+    def dump_pr_and_ap_result(self, pr_result, ap_result_str, recognition_result, symbol_dict, ap_result_only_sym_str=None, score_type = 'gt', ap_stats=None, ap_only_sym_stats=None):
         """ AP와 PR 계산 결과를 파일로 출력. test 내에 존재하는 모든 도면에 대해 한 파일로 한꺼번에 출력함
 
         Arguments:
             pr_result (dict): 도면 이름을 key로, 각 도면에서의 PR 계산에 필요한 정보들(detected_num, gt_num 및 클래스별 gt/dt num)을 저장한 dict
             ap_result_str (string): cocoeval의 evaluate summary를 저장한 문자열
             recognition_result (dict): 도면 이름을 key로, 각 도면에서의 text recognition 계산에 필요한 정보들(recog_num, gt_text_num)을 저장한 dict
-            symbol_dict (dict): 심볼 이름을 key로, id를 value로 갖는 dict
+            symbol_dict (dict): 심볼 이름을 key로, id를 value로 갖는 dict (또는 symbol_registry)
             ap_result_only_sym_str (string)_: text class를 제외하고 계산된 cocoeval의 evaluate summary를 저장한 문자열, None인 경우는 text class가 추가되지 않았다고 생각함
+            ap_stats, ap_only_sym_stats (np.ndarray): calculate_ap_stats에서 얻은 stats. 주어지면 summary 문자열을 다시 파싱하지 않고 AP 값을 사용
         Returns:
             None
         """
@@ -306,14 +265,9 @@ class evaluate():
             total_gt_text_num = 0
             total_tp_text_num = 0
 
+            registry = as_symbol_registry(symbol_dict) if symbol_dict is not None else None
             if write_only_sym_reslt:
-                text_classes_list = []
-                if "text" in symbol_dict.keys():
-                    text_classes_list.append(symbol_dict["text"])
-                if "text_rotated" in symbol_dict.keys():
-                    text_classes_list.append(symbol_dict["text_rotated"])
-                if "text_rotated_45" in symbol_dict.keys():
-                    text_classes_list.append(symbol_dict["text_rotated_45"])
+                text_class_ids = registry.text_class_ids
                 mean_precision_only_sym = 0
                 mean_recall_only_sym = 0
 
@@ -347,7 +301,7 @@ class evaluate():
                     only_text_prediction_num = 0
                     only_text_gt_num = 0
                     for gt_class, gt_num, detected_num, detection_num in zip(values["gt_classes"], values["per_class_gt_num"],values["per_class_detected_num"], values['per_class_detection_num']):
-                        if gt_class in text_classes_list:
+                        if gt_class in text_class_ids:
                             only_sym_detected_num -= detected_num
                             only_sym_all_prediction_num -= detection_num
                             only_sym_all_gt_num -= gt_num
@@ -363,8 +317,8 @@ class evaluate():
                     mean_recall_only_sym += only_sym_detected_num/only_sym_all_gt_num
                     
                 for gt_class, gt_num, detected_num in zip(values["gt_classes"], values["per_class_gt_num"],values["per_class_detected_num"]):
-                    if symbol_dict is not None:
-                        sym_name = [k for k,v in symbol_dict.items() if v == gt_class]
+                    if registry is not None:
+                        sym_name = [registry.id_to_name[gt_class]] if gt_class in registry.id_to_name else []
                     else:
                         sym_name = ""
                     f.write(f"class {gt_class} ({sym_name}) : {detected_num} / {gt_num}\n")
@@ -376,12 +330,7 @@ class evaluate():
                 mean_precision_only_sym /= len(pr_result.keys())
                 mean_recall_only_sym /= len(pr_result.keys())
 
-                ap_strs = ap_result_only_sym_str.splitlines()[0].split(" ")
-                ap = float(ap_strs[len(ap_strs) - 1])
-                ap_50_strs = ap_result_only_sym_str.splitlines()[1].split(" ")
-                ap_50 = float(ap_50_strs[len(ap_50_strs) - 1])
-                ap_75_strs = ap_result_only_sym_str.splitlines()[2].split(" ")
-                ap_75 = float(ap_75_strs[len(ap_75_strs) - 1])
+                ap, ap_50, ap_75 = self._get_ap_values(ap_result_only_sym_str, ap_only_sym_stats)
                 f.write(f"(mean precision only sym, mean recall only sym, ap, ap50, ap75) = ({mean_precision_only_sym}, {mean_recall_only_sym}, {ap}, {ap_50}, {ap_75})\n")
 
             mean_precision /= len(pr_result.keys())
@@ -389,42 +338,72 @@ class evaluate():
             if score_type == 'gt': mean_recog_ratio = mean_recog_ratio / total_gt_text_num if total_gt_text_num != 0 else 0
             else: mean_recog_ratio = mean_recog_ratio / total_tp_text_num if total_tp_text_num != 0 else 0
 
-            ap_strs = ap_result_str.splitlines()[0].split(" ")
-            ap = float(ap_strs[len(ap_strs)-1])
-            ap_50_strs = ap_result_str.splitlines()[1].split(" ")
-            ap_50 = float(ap_50_strs[len(ap_50_strs) - 1])
-            ap_75_strs = ap_result_str.splitlines()[2].split(" ")
-            ap_75 = float(ap_75_strs[len(ap_75_strs) - 1])
+            ap, ap_50, ap_75 = self._get_ap_values(ap_result_str, ap_stats)
 
             f.write(f"(mean precision, mean recall, mean recognition ratio, ap, ap50, ap75) = ({mean_precision}, {mean_recall}, {mean_recog_ratio}, {ap}, {ap_50}, {ap_75})")
 
-    def calculate_ap(self, gt_result_json, dt_result, ignore_class_list=None):
-        """ COCOeval을 사용한 AP계산. 중간 과정으로 gt와 dt에 대한 json파일이 out_dir에 생성됨
+    def _get_ap_values(self, ap_result_str, ap_stats=None):
+        """ AP, AP50, AP75 값 반환 (stats가 없으면 COCOeval summary 문자열의 처음 세 줄에서 파싱)
+
+        """
+        if ap_stats is not None:
+            return float(ap_stats[0]), float(ap_stats[1]), float(ap_stats[2])
+
+        ap_values = []
+        for line in ap_result_str.splitlines()[0:3]:
+            line_strs = line.split(" ")
+            ap_values.append(float(line_strs[len(line_strs) - 1]))
+        return tuple(ap_values)
+
+    def calculate_ap(self, gt_result_json, dt_result, ignore_class_list=None, write_json=False, filename_to_image_id=None):
+        """ COCOeval을 사용한 AP계산 (summary 문자열 반환, calculate_ap_stats 참고)
 
         Arguments:
             gt_result_json (dict): test 내에 존재하는 모든 도면에 대한 images, annotation, category 정보를 coco json 형태로 저장한 dict
             dt_result (dict): 도면 이름을 key로, box들을 value로 갖는 dt dict
             ignore_class_list (list[int]) : cocoeval 계산에서 무시할 class의 리스트 예를들어 [12, 35, 68] 이라면 이 세 class 제외하고 계산
+            write_json (bool): True이면 gt와 dt를 coco json 파일(test_gt_global.json, test_dt_global.json)로 output_dir에 출력
+            filename_to_image_id (dict): 도면 이름을 key로, image id를 value로 갖는 dict (gt_dt_data.filename_to_image_id). None이면 gt_result_json으로부터 생성
         Returns:
             result_str (string): COCOeval의 계산 결과 summary 저장한 문자열
         """
-        # 먼저 gt_json을 파일로 출력
-        gt_outpath = os.path.join(self.output_dir, "test_gt_global.json")
-        coco_json_write(gt_outpath, gt_result_json)
+        _, result_str = self.calculate_ap_stats(gt_result_json, dt_result, ignore_class_list, write_json, filename_to_image_id)
+        return result_str
+
+    def calculate_ap_stats(self, gt_result_json, dt_result, ignore_class_list=None, write_json=False, filename_to_image_id=None):
+        """ COCOeval을 사용한 AP계산. json 파일을 거치지 않고 dict로부터 바로 COCO 객체를 만들어 계산함
+
+        Arguments:
+            gt_result_json (dict): test 내에 존재하는 모든 도면에 대한 images, annotation, category 정보를 coco json 형태로 저장한 dict
+            dt_result (dict): 도면 이름을 key로, box들을 value로 갖는 dt dict
+            ignore_class_list (list[int]) : cocoeval 계산에서 무시할 class의 리스트
+            write_json (bool): True이면 gt와 dt를 coco json 파일(test_gt_global.json, test_dt_global.json)로 output_dir에 출력
+            filename_to_image_id (dict): 도면 이름을 key로, image id를 value로 갖는 dict (gt_dt_data.filename_to_image_id). None이면 gt_result_json으로부터 생성
+        Returns:
+            stats (np.ndarray): COCOeval.stats (AP, AP50, AP75, AP_small, AP_medium, AP_large, AR1, AR10, AR100, AR_small, AR_medium, AR_large)
+            result_str (string): COCOeval의 계산 결과 summary 저장한 문자열
+        """
+        # dt_result를 coco형식으로 변환 (주의! dt는 NMS 이전의 결과여야 함)
+        if filename_to_image_id is None:
+            filename_to_image_id, _ = build_image_indexes(gt_result_json)
 
-        # dt_result를 coco형식으로 변환하여 파일로 출력 (주의! dt는 NMS 이전의 결과여야 함)
         test_dt_global = []
         for filename, bboxes in dt_result.items():
+            image_id = filename_to_image_id.get(filename)
             for box in bboxes:
-                box["image_id"] = self.get_gt_img_id_from_filename(filename, gt_result_json)
-                test_dt_global.append(box)
-
-        dt_outpath = os.path.join(self.output_dir, "test_dt_global.json")
-        coco_json_write(dt_outpath, test_dt_global)
-
-        # gt와 dt파일을 로드하여 ap 계산
-        cocoGT = coco.COCO(gt_outpath)
-        cocoDt = cocoGT.loadRes(dt_outpath)
+                box["image_id"] = image_id
+                test_dt_global.append(dict(box)) # loadRes가 area, id 등을 추가하므로 원본 box는 그대로 둠
+
+        if write_json:
+            coco_json_write(os.path.join(self.output_dir, "test_gt_global.json"), gt_result_json)
+            coco_json_write(os.path.join(self.output_dir, "test_dt_global.json"), test_dt_global)
+
+        # gt와 dt를 메모리에서 바로 COCO 객체로 만들어 ap 계산
+        cocoGT = coco.COCO()
+        cocoGT.dataset = dict(gt_result_json)
+        cocoGT.dataset['annotations'] = [dict(ann) for ann in gt_result_json['annotations']] # COCOeval이 ignore 등을 추가하므로 원본 annotation은 그대로 둠
+        cocoGT.createIndex()
+        cocoDt = cocoGT.loadRes(test_dt_global)
         annType = 'bbox'
         cocoEval = cocoeval.COCOeval(cocoGT,cocoDt,annType)
 
@@ -436,15 +415,12 @@ class evaluate():
         cocoEval.evaluate()
         cocoEval.accumulate()
 
-        original_stdout = sys.stdout
         string_stdout = io.StringIO()
-        sys.stdout = string_stdout
-        cocoEval.summarize()
-        sys.stdout = original_stdout
-
+        with redirect_stdout(string_stdout):
+            cocoEval.summarize()
         result_str = string_stdout.getvalue()
 
-        return result_str
+        return cocoEval.stats, result_str
 
     def calculate_pr(self, gt_result, dt_result, gt_to_dt_match_dict):
         """ 전체 test 도면에 대한 precision 및 recall 계산
@@ -538,6 +514,96 @@ class evaluate():
             recognition_result[filename] = {"all_gt_text_num" : gt_text_count, "all_tp_text_num": tp_text_count, "recognized_num" : recog_count, "recognition" : recog_count / gt_text_count}
         return recognition_result
 
+    def sweep_thresholds(self, gt_dt_result, score_thresholds, nms_thresholds, matching_iou_thresholds, adaptive_thr_dicts=None):
+        """ score, NMS, 매칭 IOU threshold (및 adaptive_thr_dict 후보)의 모든 조합에 대해 precision, recall 계산
+
+            gt-dt IOU는 도면별로 (가장 낮은 score threshold를 통과한 dt와 gt 사이에서) 한 번만 계산하고,
+            각 조합에서는 NMS 후 남은 dt와 IOU > 매칭 threshold인 쌍만 골라 매칭함.
+            각 조합의 결과는 해당 threshold로 gt_dt_data를 만들고 compare_gt_and_dt, calculate_pr를 수행한 결과와 같음
+
+        Arguments:
+            gt_dt_result (gt_dt_data): 데이터를 한 번 읽어둔 gt_dt_data
+            score_thresholds, nms_thresholds, matching_iou_thresholds (list): 각 threshold 후보
+            adaptive_thr_dicts (dict): 후보 이름을 key로, adaptive_thr_dict (또는 None)를 value로 갖는 dict (gt_dt_data.iter_nms_sweep 참고)
+        Returns:
+            sweep_result (list): 조합별 결과 dict (threshold들, 전체 detected/prediction/gt 수, 도면 평균 precision, recall) 의 list
+        """
+        dt_raw_arrays = gt_dt_result.get_dt_raw_arrays()
+        min_score_threshold = min(score_thresholds)
+        min_matching_iou_threshold = min(matching_iou_thresholds)
+
+        # 도면별 gt 배열과 gt-dt IOU 쌍은 한 번만 계산
+        drawing_pairs = {}
+        for filename, (boxes, scores, classes) in dt_raw_arrays.items():
+            gt_boxes = np.array([x["bbox"] for x in gt_dt_result.gt_result[filename]]).reshape(-1, 4)
+            gt_classes = np.array([x["category_id"] for x in gt_dt_result.gt_result[filename]])
+
+            candidate_index = np.where(scores >= min_score_threshold)[0]
+            if gt_boxes.shape[0] > 0 and candidate_index.shape[0] > 0:
+                pair_dt, pair_gt, pair_iou = same_class_iou_pairs(boxes[candidate_index], classes[candidate_index], gt_boxes, gt_classes,
+                                                                  min_matching_iou_threshold)
+                pair_dt = candidate_index[pair_dt]
+            else:
+                pair_dt, pair_gt, pair_iou = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+            drawing_pairs[filename] = (gt_boxes, pair_dt, pair_gt, pair_iou)
+
+        sweep_result = []
+        for score_threshold, nms_threshold, adaptive_name, kept_index_dict in gt_dt_result.iter_nms_sweep(score_thresholds, nms_thresholds, adaptive_thr_dicts):
+            for matching_iou_threshold in matching_iou_thresholds:
+                detected_num = 0
+                prediction_num = 0
+                gt_num = 0
+                precision_sum = 0
+                recall_sum = 0
+                for filename, kept_index in kept_index_dict.items():
+                    boxes, scores, _ = dt_raw_arrays[filename]
+                    gt_boxes, pair_dt, pair_gt, pair_iou = drawing_pairs[filename]
+
+                    # dt_result_raw 기준 index를 NMS 결과(dt_result_after_nms) 기준 index로 변환
+                    kept_position = np.full(boxes.shape[0], -1, dtype=np.int64)
+                    kept_position[kept_index] = np.arange(kept_index.shape[0])
+                    pair_mask = (kept_position[pair_dt] >= 0) & (pair_iou > matching_iou_threshold)
+
+                    gt_to_dt, _ = greedy_match((-scores[kept_index]).argsort(), kept_position[pair_dt[pair_mask]], pair_gt[pair_mask],
+                                               pair_iou[pair_mask], boxes[kept_index], gt_boxes)
+
+                    drawing_detected_num = len(gt_to_dt)
+                    detected_num += drawing_detected_num
+                    prediction_num += kept_index.shape[0]
+                    gt_num += gt_boxes.shape[0]
+                    precision_sum += drawing_detected_num / kept_index.shape[0] if kept_index.shape[0] != 0 else 0
+                    recall_sum += drawing_detected_num / gt_boxes.shape[0] if gt_boxes.shape[0] != 0 else 0
+
+                drawing_num = max(len(kept_index_dict), 1)
+                sweep_result.append({"score_threshold": score_threshold,
+                                     "nms_threshold": nms_threshold,
+                                     "adaptive_thr_dict": adaptive_name,
+                                     "matching_iou_threshold": matching_iou_threshold,
+                                     "detected_num": detected_num,
+                                     "all_prediction_num": prediction_num,
+                                     "all_gt_num": gt_num,
+                                     "mean_precision": precision_sum / drawing_num,
+                                     "mean_recall": recall_sum / drawing_num
+                                     })
+        return sweep_result
+
+    def dump_sweep_result(self, sweep_result, filename="threshold_sweep_result.txt"):
+        """ sweep_thresholds 결과를 조합별 한 줄씩 tab으로 구분된 표로 출력
+
+        Arguments:
+            sweep_result (list): sweep_thresholds의 반환값
+            filename (string): output_dir에 저장할 파일 이름
+        Returns:
+            None
+        """
+        columns = ["score_threshold", "nms_threshold", "adaptive_thr_dict", "matching_iou_threshold",
+                   "detected_num", "all_prediction_num", "all_gt_num", "mean_precision", "mean_recall"]
+        outpath = os.path.join(self.output_dir, filename)
+        with open(outpath, 'w') as f:
+            f.write("\t".join(columns) + "\n")
+            for row in sweep_result:
+                f.write("\t".join(f"{row[column]:.4f}" if isinstance(row[column], float) else str(row[column]) for column in columns) + "\n")
+
     def get_gt_img_id_from_filename(self, filename, gt_result_json):
         """ filename을 입력으로 img_id를 반환하는 함수
 
@@ -546,6 +612,7 @@ class evaluate():
             gt_result_json (dict): test 내에 존재하는 모든 도면에 대한 images, annotation, category 정보를 coco json 형태로 저장한 dict
         Return:
             gt_result_json에 기록된 filename에 해당하는 도면의 id
+            (모든 image를 탐색하므로, 여러 번 찾을 때는 gt_dt_data.filename_to_image_id 또는 build_image_indexes를 사용)
         """
         for imgs in gt_result_json['images']:
             if filename == imgs["file_name"].split(".")[0]:
@@ -4,9 +4,11 @@ import io
 import numpy as np
 from copy import deepcopy
 
-from Common.coco_json import coco_dt_json_reader, coco_json_write
-from Common.pnid_xml import symbol_xml_reader, text_xml_reader
+from Common.coco_json import coco_dt_json_reader, coco_json_write, build_image_indexes, group_annotations_by_image
+from Common.pnid_xml import read_symbol_xml, read_text_xml
+from Common.xml_cache import xml_annotation_cache
 from Common.symbol_io import read_symbol_txt
+from Predict_Postprocess.nms import batched_nms
 
 
 class gt_dt_data():
@@ -22,11 +24,13 @@ class gt_dt_data():
         stride_w, stride_h (int): 도면 분할 과정에서 사용한 width 및 height stride
         score_threshold (float): 테스트 결과에서, score < score_threshold이면 score_filter 과정에서 제거
         nms_threshold (float): NMS threshold
+        xml_cache_dir (string): None이 아니면 GT xml을 이 폴더의 npz cache를 통해 읽음 (변경된 xml만 다시 파싱)
     """
     def __init__(self, gt_json_filepath, dt_json_filepath, drawing_dir, symbol_xml_dir, symbol_filepath, include_text_as_class, include_text_orientation_as_class, text_xml_dir,
                  drawing_resize_scale, stride_w, stride_h,
-                 score_threshold = 0.5, nms_iou_threshold = 0.1, adaptive_thr_dict=None):
+                 score_threshold = 0.5, nms_iou_threshold = 0.1, adaptive_thr_dict=None, xml_cache_dir=None):
         self.drawing_dir = drawing_dir
+        self.xml_cache_dir = xml_cache_dir
         self.symbol_xml_dir = symbol_xml_dir
         self.drawing_resize_scale = drawing_resize_scale
         self.score_threshold = score_threshold
@@ -48,6 +52,9 @@ class gt_dt_data():
         self.dt_result = self.score_filter(score_threshold)
         # 3) gt_result: ground truth xml 데이터. (gt_result_json은 동일한 데이터를 coco json 형태로 변환한 것)
         self.gt_result_json, self.gt_result = self.parse_test_gt_xmls()
+        #    (gt_result_json의 도면 이름 <-> image id index와 image id별 annotation list. 평가, 시각화에서 매번 전체를 탐색하지 않도록 한 번만 생성)
+        self.filename_to_image_id, self.image_id_to_filename = build_image_indexes(self.gt_result_json)
+        self.gt_annotations_by_image_id = group_annotations_by_image(self.gt_result_json)
         # 4) dt_result_after_nms: score 기반으로 필터링 후 NMS를 수행한 데이터
         self.dt_result_after_nms = self.get_dt_result_nms(self.nms_iou_threshold)
 
@@ -110,17 +117,28 @@ class gt_dt_data():
         image_id = 1
         object_id = 1
 
+        symbol_xml_cache = None
+        text_xml_cache = None
+        if self.xml_cache_dir is not None:
+            symbol_xml_cache = xml_annotation_cache(os.path.join(self.xml_cache_dir, "symbol_xml.npz"))
+            text_xml_cache = xml_annotation_cache(os.path.join(self.xml_cache_dir, "text_xml.npz"), is_text_xml=True)
+
         for test_image_filename in test_image_filenames:
-            symbol_xml = symbol_xml_reader(os.path.join(self.symbol_xml_dir, f"{test_image_filename}.xml"))
-            filename, width, height, depth, object_list = symbol_xml.getInfo()
+            symbol_xml_path = os.path.join(self.symbol_xml_dir, f"{test_image_filename}.xml")
+            if symbol_xml_cache is not None:
+                filename, width, height, depth, object_list = symbol_xml_cache.get_info(symbol_xml_path)
+            else:
+                filename, width, height, depth, object_list = read_symbol_xml(symbol_xml_path)
             for obj_element in object_list:
                 obj_element.append('')
 
             if self.include_text_as_class == True:
                 text_xml_path = os.path.join(self.text_xml_dir, f"{test_image_filename}.xml")
                 if os.path.exists(text_xml_path) == True:
-                    text_xml = text_xml_reader(text_xml_path)
-                    _, _, _, _, text_object_list = text_xml.getInfo()
+                    if text_xml_cache is not None:
+                        _, _, _, _, text_object_list = text_xml_cache.get_info(text_xml_path)
+                    else:
+                        _, _, _, _, text_object_list = read_text_xml(text_xml_path)
                     if self.include_text_orientation_as_class == True:
                         converted_text_object_list = [["text", x[1], x[2], x[3], x[4], x[6]] for x in text_object_list if x[5] == 0]
                         converted_text_object_list += [["text_rotated", x[1], x[2], x[3], x[4], x[6]] for x in text_object_list if
@@ -165,6 +183,10 @@ class gt_dt_data():
             gt_result_json[test_image_filename] = annotations_per_image
             image_id += 1
 
+        for xml_cache in [symbol_xml_cache, text_xml_cache]:
+            if xml_cache is not None and len(xml_cache.pending) > 0: # 새로 파싱한 xml을 cache에 반영
+                xml_cache.save()
+
         gt_json['annotations'] = annotations
         gt_json['images'] = images
         gt_json['categories'] = categories
@@ -187,74 +209,69 @@ class gt_dt_data():
 
         return filename_to_global_bbox_dict_after_nms
 
+    def get_dt_raw_arrays(self):
+        """ dt_result_raw를 도면별 numpy 배열로 변환 (threshold sweep에서 한 번만 변환하여 재사용)
+
+        Return:
+            도면 이름을 key로, (boxes (N, 4) float, scores (N,), classes (N,)) 를 value로 갖는 dict
+        """
+        dt_raw_arrays = {}
+        for filename, values in self.dt_result_raw.items():
+            boxes = np.array([x["bbox"] for x in values], dtype=np.float64).reshape(-1, 4)
+            scores = np.array([x["score"] for x in values], dtype=np.float64)
+            classes = np.array([x["category_id"] for x in values])
+            dt_raw_arrays[filename] = (boxes, scores, classes)
+        return dt_raw_arrays
+
+    def iter_nms_sweep(self, score_thresholds, nms_thresholds, adaptive_thr_dicts=None):
+        """ score threshold, NMS threshold, adaptive_thr_dict 후보들의 모든 조합에 대해 score filtering과 NMS를 수행
+            (json, xml은 다시 읽지 않음. 각 조합의 결과는 score_filter 후 get_dt_result_nms를 수행한 결과와 같음)
+
+        Arguments:
+            score_thresholds (list): score filtering threshold 후보
+            nms_thresholds (list): NMS threshold 후보
+            adaptive_thr_dicts (dict): 후보 이름을 key로, adaptive_thr_dict (또는 None)를 value로 갖는 dict. None이면 self.adaptive_thr_dict만 사용
+        Return:
+            (score_threshold, nms_threshold, adaptive 후보 이름, kept_index_dict)를 반환하는 generator
+            kept_index_dict는 도면 이름을 key로, NMS 후 남은 dt의 dt_result_raw 기준 index 배열(dt_result_after_nms와 같은 순서)을 value로 가짐
+        """
+        if adaptive_thr_dicts is None:
+            adaptive_thr_dicts = {"default": self.adaptive_thr_dict}
+        dt_raw_arrays = self.get_dt_raw_arrays()
+
+        for score_threshold in score_thresholds:
+            score_index_dict = {filename: np.where(scores >= score_threshold)[0] for filename, (_, scores, _) in dt_raw_arrays.items()}
+            for nms_threshold in nms_thresholds:
+                for adaptive_name, adaptive_thr_dict in adaptive_thr_dicts.items():
+                    kept_index_dict = {}
+                    for filename, (boxes, scores, classes) in dt_raw_arrays.items():
+                        score_index = score_index_dict[filename]
+                        pick = batched_nms(boxes[score_index], scores[score_index], classes[score_index], nms_threshold,
+                                           adaptive_thr_dict=adaptive_thr_dict)
+                        kept_index_dict[filename] = score_index[pick]
+                    yield score_threshold, nms_threshold, adaptive_name, kept_index_dict
+
     # TODO : mmcv의 SoftNMX 사용
 def non_max_suppression_fast(result_boxes, iou_threshold, perClass=True, adaptive_thr_dict=None):
-    """ 도면별 Box list에 대해 NMS 수행
+    """ 도면별 Box list에 대해 NMS 수행 (클래스별로 분리하여 계산, Predict_Postprocess.nms.batched_nms 참고)
 
     Arguments:
         dict result_boxes: [bbox], category_id, image_id 등등을 모두 가지고있는 bbox dict
         float iou_threshold: NMS threshold
         bool perClass: true면 동일 클래스끼리만 NMS 수행, false면 클래스 상관없이 NMS 수행
+        dict adaptive_thr_dict: category_id를 key로, 해당 클래스에 적용할 NMS threshold를 value로 갖는 dict
 
     Return:
         NMS 후 남아있는 result_boxes의 부분집합 dict
     """
+    if len(result_boxes) == 0:
+        return []
 
     boxes = np.array([x["bbox"] for x in result_boxes])
     classes = np.array([x["category_id"] for x in result_boxes])
     scores = np.array([x["score"] for x in result_boxes])
 
-    if boxes.shape[0] == 0:
-        return []
-
-    # Init the picked box info
-    pick = []
-
-    # Box coordinate consist of left top and right bottom
-    x1 = boxes[:, 0]
-    y1 = boxes[:, 1]
-    w = boxes[:, 2]
-    h = boxes[:, 3]
-
-    # Compute area of each boxes
-    area = w * h
-
-    # Greedily select the order of box to compare iou
-    idxs = np.argsort(scores)
-
-    while len(idxs) > 0:
-        last = len(idxs) - 1  # Scrore가 가장 높은 박스
-        i = idxs[last]  # Score가 가장 높은 박스의 인덱스
-        c = classes[i]
-        pick.append(i)  # Score가 가장 높은 박스의 인덱스를 pick에 저장
-
-        # With vector implementation, we can calculate fast
-        xx1 = np.maximum(x1[i], x1[idxs[:last]])  # Score가 가장 높은 박스와 나머지 박스의 좌표 비교
-        yy1 = np.maximum(y1[i], y1[idxs[:last]])
-        xx2 = np.minimum(x1[i] + w[i], x1[idxs[:last]] + w[idxs[:last]])
-        yy2 = np.minimum(y1[i] + h[i], y1[idxs[:last]] + h[idxs[:last]])
-
-        w_ = np.maximum(0, xx2 - xx1 + 1)
-        h_ = np.maximum(0, yy2 - yy1 + 1)
-        intersection = w_ * h_
-
-        # Calculate the iou
-        try:
-            iou = intersection / (area[idxs[:last]] + area[idxs[last]] - intersection)
-        except ZeroDivisionError:
-            print('Zero division occurred in NMS -> IOU calculation')
-
-        if perClass:  # perClass == true인 경우에는, class index가 같은 경우에만 삭제 대상
-            if adaptive_thr_dict is not None and c in adaptive_thr_dict.keys():
-                iou_threshold_for_adaptive_thr = adaptive_thr_dict[c]
-                outCheck = (iou > iou_threshold_for_adaptive_thr)
-            else:
-                outCheck = (iou > iou_threshold)
-            sameClassCheck = (classes[idxs[:last]] == c)
-            allCheck = sameClassCheck & outCheck
-            idxs = np.delete(idxs, np.concatenate(([last], np.where(allCheck)[0])))
-        else:
-            idxs = np.delete(idxs, np.concatenate(([last], np.where(iou > iou_threshold)[0])))
+    pick = batched_nms(boxes, scores, classes, iou_threshold, perClass, adaptive_thr_dict)
 
     return [result_boxes[i] for i in pick]
 
@@ -0,0 +1,107 @@
+import numpy as np
+
+def batched_nms(boxes, scores, classes, iou_threshold, per_class=True, adaptive_thr_dict=None):
+    """ 클래스별로 분리하여 NMS를 수행하고, 남는 박스의 index를 반환
+
+        non_max_suppression_fast의 기존 구현(score 순으로 한 박스씩 뽑고 np.delete로 나머지 박스를 제거)과
+        완전히 동일한 결과를 반환함. 다만 클래스별로 나누어 계산하고, x좌표로 정렬된 배열에서
+        뽑힌 박스와 겹칠 수 있는 박스들만 찾아서 IOU를 계산하므로 박스 수가 많아도 빠름
+
+    Arguments:
+        boxes (np.ndarray): (N, 4) [x, y, width, height] 박스 배열
+        scores (np.ndarray): (N,) score 배열
+        classes (np.ndarray): (N,) category_id 배열
+        iou_threshold (float): NMS threshold
+        per_class (bool): true면 동일 클래스끼리만 NMS 수행, false면 클래스 상관없이 NMS 수행
+        adaptive_thr_dict (dict): category_id를 key로, 해당 클래스에 적용할 NMS threshold를 value로 갖는 dict
+
+    Return:
+        pick (np.ndarray): NMS 후 남은 박스의 index (기존 구현과 같은 순서, score 내림차순)
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores)
+    classes = np.asarray(classes)
+
+    if boxes.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # 기존 구현과 동일한 정렬 결과를 사용해야 score가 같은 박스들의 처리 순서도 동일함
+    score_order = np.argsort(scores)
+    rank = np.empty_like(score_order)
+    rank[score_order] = np.arange(score_order.shape[0])
+
+    if per_class:
+        groups = [np.where(classes == c)[0] for c in np.unique(classes)]
+    else:
+        groups = [np.arange(boxes.shape[0])]
+
+    pick = []
+    for group in groups:
+        group = group[np.argsort(-rank[group])] # score 높은 순 (기존 구현의 처리 순서)
+
+        threshold = iou_threshold
+        if per_class and adaptive_thr_dict is not None and classes[group[0]] in adaptive_thr_dict.keys():
+            threshold = adaptive_thr_dict[classes[group[0]]]
+
+        keep = _greedy_nms(boxes[group], threshold)
+        pick.append(group[keep])
+
+    pick = np.concatenate(pick)
+    return pick[np.argsort(-rank[pick])]
+
+def _greedy_nms(boxes, iou_threshold):
+    """ score 내림차순으로 정렬된 박스들에 대해 greedy NMS 수행
+
+    Arguments:
+        boxes (np.ndarray): (N, 4) [x, y, width, height] 박스 배열 (score 내림차순)
+        iou_threshold (float): NMS threshold
+    Return:
+        keep (list): 남는 박스의 index
+    """
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    w = boxes[:, 2]
+    h = boxes[:, 3]
+    x2 = x1 + w
+    y2 = y1 + h
+    area = w * h
+
+    # IOU > 0이 되려면 x 구간이 (+1 픽셀 포함) 겹쳐야 하므로, x1 기준 정렬 후 겹칠 수 있는 구간만 탐색
+    # (threshold가 음수면 겹치지 않는 박스도 제거 대상이므로 전체 탐색)
+    x_order = np.argsort(x1, kind='stable')
+    sorted_x1 = x1[x_order]
+    max_w = max(float(np.max(w)), 0.0)
+    use_window = iou_threshold >= 0
+
+    suppressed = np.zeros(boxes.shape[0], dtype=bool)
+    keep = []
+    for i in range(boxes.shape[0]):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+
+        if use_window:
+            lo = np.searchsorted(sorted_x1, x1[i] - max_w - 2, side='left')
+            hi = np.searchsorted(sorted_x1, x2[i] + 2, side='left')
+            candidates = x_order[lo:hi]
+        else:
+            candidates = np.arange(boxes.shape[0])
+        candidates = candidates[(candidates > i) & ~suppressed[candidates]]
+        if candidates.shape[0] == 0:
+            continue
+
+        xx1 = np.maximum(x1[i], x1[candidates])
+        yy1 = np.maximum(y1[i], y1[candidates])
+        xx2 = np.minimum(x2[i], x2[candidates])
+        yy2 = np.minimum(y2[i], y2[candidates])
+
+        w_ = np.maximum(0, xx2 - xx1 + 1)
+        h_ = np.maximum(0, yy2 - yy1 + 1)
+        intersection = w_ * h_
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iou = intersection / (area[candidates] + area[i] - intersection)
+
+        suppressed[candidates[iou > iou_threshold]] = True
+
+    return keep
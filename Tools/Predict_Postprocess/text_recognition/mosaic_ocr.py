@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+from Predict_Postprocess.text_recognition.ocr_engine import local_ocr_engine, tesseract_backend, merge_words
+
+class mosaic_layout():
+    """ mosaic page 하나에 배치된 crop들의 위치 정보
+
+    Arguments:
+        crop_indices (list): page의 각 줄에 배치된 crop의 index (입력 crop list 기준)
+        line_tops (list): 각 줄의 crop이 시작하는 y 좌표
+        line_heights (list): 각 줄에 배치된 crop의 높이 (정규화 후)
+        slot_height (int): 한 줄이 차지하는 높이 (line_height + line_gap)
+        margin (int): page 상하좌우 여백
+    """
+    def __init__(self, crop_indices, line_tops, line_heights, slot_height, margin):
+        self.crop_indices = crop_indices
+        self.line_tops = line_tops
+        self.line_heights = line_heights
+        self.slot_height = slot_height
+        self.margin = margin
+
+    def find_line(self, top, height):
+        """ page 좌표 기준 [top, top + height) 영역의 단어가 속한 줄 번호 반환 (어느 줄과도 겹치지 않으면 None)
+
+        """
+        line = (top + height / 2 - self.margin) // self.slot_height # 단어의 세로 중심이 있는 줄
+        if line < 0 or line >= len(self.crop_indices):
+            return None
+        line = int(line)
+        if top >= self.line_tops[line] + self.line_heights[line] or top + height <= self.line_tops[line]:
+            return None
+        return line
+
+class mosaic_ocr_engine():
+    """ 여러 텍스트 crop을 높이를 맞춰 큰 page 이미지 하나에 한 줄씩 배치하고, page 단위로 OCR 한 뒤 단어 위치로 crop별 결과를 찾는 OCR engine
+
+        crop마다 OCR을 호출하는 대신 page 하나(최대 max_lines_per_page개 crop)에 한 번만 호출하므로
+        OCR 호출/레이아웃 분석 비용이 crop 수만큼 나누어짐. local_ocr_engine, ocr_worker_pool과 같은 interface
+
+    Arguments:
+        page_engine (local_ocr_engine or ocr_worker_pool): page를 인식할 engine (backend에 recognize_words가 있어야 함, None이면 local tesseract)
+        line_height (int): crop을 정규화할 높이 (픽셀)
+        line_gap (int): 줄 사이 간격 (픽셀)
+        max_page_width (int): page 최대 폭. 정규화 후 이보다 넓은 crop은 폭에 맞춰 더 줄임
+        max_lines_per_page (int): page 하나에 배치할 최대 crop 수
+        margin (int): page 상하좌우 여백 (픽셀)
+    """
+    def __init__(self, page_engine=None, line_height=32, line_gap=24, max_page_width=2400, max_lines_per_page=200, margin=16):
+        self.own_page_engine = page_engine is None
+        self.page_engine = page_engine if page_engine is not None else local_ocr_engine(tesseract_backend)
+        self.line_height = line_height
+        self.line_gap = line_gap
+        self.max_page_width = max_page_width
+        self.max_lines_per_page = max_lines_per_page
+        self.margin = margin
+
+        self.page_num = 0 # 지금까지 OCR한 page 수
+
+    def normalize_crop(self, crop):
+        """ crop을 grayscale로 바꾸고 높이가 line_height가 되도록 resize (폭이 max_page_width를 넘으면 폭에 맞춤)
+
+        """
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        height, width = crop.shape[:2]
+        if height == 0 or width == 0:
+            return None
+
+        max_width = self.max_page_width - 2 * self.margin
+        scale = min(self.line_height / height, max_width / width)
+        new_width = min(max(int(round(width * scale)), 1), max_width)
+        new_height = min(max(int(round(height * scale)), 1), self.line_height)
+        return cv2.resize(crop, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+    def build_pages(self, crops):
+        """ crop들을 정규화해서 page 이미지들로 배치
+
+        Return:
+            pages (list): grayscale page 이미지 list
+            layouts (list): 각 page의 mosaic_layout
+        """
+        slot_height = self.line_height + self.line_gap
+        normalized = [(i, self.normalize_crop(np.asarray(crop))) for i, crop in enumerate(crops)]
+        normalized = [(i, crop) for i, crop in normalized if crop is not None]
+
+        pages = []
+        layouts = []
+        for start in range(0, len(normalized), self.max_lines_per_page):
+            page_crops = normalized[start:start + self.max_lines_per_page]
+            page_width = max(crop.shape[1] for _, crop in page_crops) + 2 * self.margin
+            page_height = len(page_crops) * slot_height - self.line_gap + 2 * self.margin
+            page = np.full((page_height, page_width), 255, dtype=np.uint8)
+
+            line_tops = []
+            for line, (_, crop) in enumerate(page_crops):
+                top = self.margin + line * slot_height + (self.line_height - crop.shape[0]) // 2 # 줄 안에서 세로 가운데 정렬
+                page[top:top + crop.shape[0], self.margin:self.margin + crop.shape[1]] = crop
+                line_tops.append(top)
+
+            pages.append(page)
+            layouts.append(mosaic_layout([i for i, _ in page_crops], line_tops, [crop.shape[0] for _, crop in page_crops],
+                                         slot_height, self.margin))
+        return pages, layouts
+
+    def recognize_batch(self, imgs):
+        """ imgs의 인식 결과 (string, confidence)를 imgs 순서대로 반환하는 generator (비어 있는 crop은 ("", 0))
+
+        """
+        imgs = list(imgs)
+        pages, layouts = self.build_pages(imgs)
+        self.page_num += len(pages)
+
+        crop_words = [[] for _ in range(len(imgs))]
+        for layout, words in zip(layouts, self.page_engine.recognize_batch(pages, method="recognize_words")):
+            for word in words:
+                line = layout.find_line(word[3], word[5])
+                if line is not None:
+                    crop_words[layout.crop_indices[line]].append(word)
+
+        for words in crop_words:
+            words.sort(key=lambda word: word[2]) # 한 줄 내에서 왼쪽부터
+            yield merge_words(words)
+
+    def close(self):
+        if self.own_page_engine:
+            self.page_engine.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import hashlib
+import numpy as np
+
+class ocr_result_cache():
+    """ 텍스트 crop의 인식 결과(string, confidence)를 crop 픽셀의 hash로 저장하는 on-disk cache (sqlite 파일 하나)
+
+        threshold 등을 바꿔가며 같은 도면을 다시 실행할 때, 이전에 인식한 것과 픽셀이 같은 crop은 OCR 없이 결과를 재사용함.
+        저장된 결과의 전체 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 결과부터 삭제함
+
+    Arguments:
+        cache_path (string): sqlite 파일 경로 (없으면 생성)
+        max_bytes (int): 저장할 결과들의 최대 전체 크기 (key + string 기준의 대략적인 byte 수)
+    """
+    def __init__(self, cache_path, max_bytes=256 << 20):
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir != "":
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(cache_path)
+        # conf는 type affinity가 없는 column이므로 int/float이 저장한 그대로 반환됨
+        self.connection.execute("CREATE TABLE IF NOT EXISTS ocr_cache (key TEXT PRIMARY KEY, string TEXT, conf, size INTEGER, last_used INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ocr_cache_last_used ON ocr_cache (last_used)")
+        self.connection.commit()
+
+        total_bytes, last_used = self.connection.execute("SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM ocr_cache").fetchone()
+        self.total_bytes = total_bytes
+        self.use_counter = last_used # 시계 대신 사용 순서를 기록
+
+        self.hit_num = 0
+        self.miss_num = 0
+        self.evicted_num = 0
+
+    @staticmethod
+    def make_key(img, config_key):
+        """ crop 픽셀, shape(회전 여부 포함), dtype과 OCR 설정으로 만든 key
+
+        """
+        img = np.ascontiguousarray(img)
+        digest = hashlib.sha1(f"{config_key}|{img.shape}|{img.dtype.str}|".encode())
+        digest.update(img.data)
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """ keys에 해당하는 결과 list 반환 (없는 key는 None)
+
+        """
+        results = []
+        hit_keys = []
+        for key in keys:
+            row = self.connection.execute("SELECT string, conf FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            results.append(tuple(row) if row is not None else None)
+            if row is not None:
+                hit_keys.append(key)
+
+        self.hit_num += len(hit_keys)
+        self.miss_num += len(keys) - len(hit_keys)
+        if len(hit_keys) > 0:
+            self.connection.executemany("UPDATE ocr_cache SET last_used = ? WHERE key = ?",
+                                        [(self._next_use(), key) for key in hit_keys])
+            self.connection.commit()
+        return results
+
+    def put_many(self, keys, results):
+        """ keys에 results(string, confidence)를 저장하고, max_bytes를 넘으면 오래된 결과 삭제
+
+        """
+        rows = []
+        for key, (string, conf) in zip(keys, results):
+            rows.append((key, string, conf, len(key) + len(string.encode("utf-8")) + 16, self._next_use()))
+
+        for row in rows:
+            old_size = self.connection.execute("SELECT size FROM ocr_cache WHERE key = ?", (row[0],)).fetchone()
+            if old_size is not None:
+                self.total_bytes -= old_size[0]
+            self.connection.execute("INSERT OR REPLACE INTO ocr_cache VALUES (?, ?, ?, ?, ?)", row)
+            self.total_bytes += row[3]
+
+        while self.total_bytes > self.max_bytes:
+            evicted = self.connection.execute("SELECT key, size FROM ocr_cache ORDER BY last_used LIMIT 1000").fetchall()
+            if len(evicted) == 0:
+                break
+            for key, size in evicted:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.connection.execute("DELETE FROM ocr_cache WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.evicted_num += 1
+        self.connection.commit()
+
+    def stats_str(self):
+        lookup_num = self.hit_num + self.miss_num
+        hit_ratio = self.hit_num / lookup_num if lookup_num != 0 else 0
+        return (f"ocr cache hit {self.hit_num} / {lookup_num} ({hit_ratio * 100:.1f}%), evicted {self.evicted_num}, "
+                f"{self.total_bytes / (1 << 20):.1f} / {self.max_bytes / (1 << 20):.1f} MB")
+
+    def close(self):
+        self.connection.close()
+
+    def _next_use(self):
+        self.use_counter += 1
+        return self.use_counter
+
+class cached_ocr_engine():
+    """ ocr_result_cache에 없는 crop만 engine으로 인식하는 OCR engine (local_ocr_engine, ocr_worker_pool과 같은 interface)
+
+    Arguments:
+        engine (local_ocr_engine or ocr_worker_pool): cache에 없는 crop을 인식할 engine
+            (mosaic_ocr_engine은 crop 결과가 같은 page의 다른 crop에 따라 달라지므로 cache하지 않음)
+        cache (ocr_result_cache): 인식 결과 cache
+        config_key (string): OCR 설정(tesseract_backend.config_key: backend 종류, tesseract 버전, config 등)을 나타내는 문자열. 설정이 다르면 결과를 재사용하지 않음
+    """
+    def __init__(self, engine, cache, config_key):
+        self.engine = engine
+        self.cache = cache
+        self.config_key = config_key
+
+    def recognize_batch(self, imgs):
+        """ imgs의 인식 결과 (string, confidence)를 imgs 순서대로 반환하는 generator
+
+        """
+        imgs = list(imgs)
+        keys = [ocr_result_cache.make_key(img, self.config_key) for img in imgs]
+        results = self.cache.get_many(keys)
+
+        miss_index = [i for i, result in enumerate(results) if result is None]
+        if len(miss_index) > 0:
+            # 같은 crop이 여러 번 나오면 한 번만 인식
+            unique_index = {}
+            for i in miss_index:
+                unique_index.setdefault(keys[i], i)
+            unique_results = list(self.engine.recognize_batch([imgs[i] for i in unique_index.values()]))
+            key_to_result = dict(zip(unique_index.keys(), unique_results))
+            self.cache.put_many(list(key_to_result.keys()), unique_results)
+            for i in miss_index:
+                results[i] = key_to_result[keys[i]]
+
+        for result in results:
+            yield result
+
+    def close(self):
+        pass # engine과 cache는 생성한 쪽에서 닫음
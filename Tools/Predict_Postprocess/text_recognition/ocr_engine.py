@@ -0,0 +1,357 @@
+import time
+import queue
+import hashlib
+import traceback
+import numpy as np
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import tesserocr # tesseract C API wrapper (설치되어 있으면 crop마다 tesseract process를 띄우지 않음)
+except ImportError:
+    tesserocr = None
+
+TESSERACT_CMD = r'C:/Program Files/Tesseract-OCR/tesseract'
+TESSERACT_CONFIG = "--oem 3 --psm 6"
+
+def parse_tess_result(result_str):
+    result_to_list = result_str.split("\n")
+    result_string = ""
+    confidence = 0
+    count = 0
+    for result in result_to_list:
+        res = result.split("\t")
+        if res[0] == '5':
+            count += 1
+            confidence += int(float(res[-2]))
+            result_string = result_string + res[-1]
+
+    if count == 0:
+        confidence = 0
+    else:
+        confidence = confidence / count
+
+    return result_string, confidence
+
+def parse_tess_words(result_str):
+    """ image_to_data 결과에서 단어(level 5)별 [text, confidence, left, top, width, height] list 반환
+
+    """
+    words = []
+    for result in result_str.split("\n"):
+        res = result.split("\t")
+        if res[0] == '5':
+            words.append([res[-1], int(float(res[-2])), int(res[6]), int(res[7]), int(res[8]), int(res[9])])
+    return words
+
+def merge_words(words):
+    """ 단어별 인식 결과를 parse_tess_result와 같은 방식으로 합쳐서 (string, confidence) 반환
+
+    """
+    if len(words) == 0:
+        return "", 0
+    return "".join(word[0] for word in words), sum(word[1] for word in words) / len(words)
+
+class tesseract_backend():
+    """ tesseract로 crop 하나를 인식하는 OCR backend
+
+        tesserocr가 설치되어 있으면 PyTessBaseAPI 하나를 계속 재사용하고 (process 생성, 임시 파일 없음),
+        없으면 pytesseract.image_to_data를 호출함 (crop마다 tesseract process 실행)
+
+    Arguments:
+        tesseract_cmd (string): pytesseract에서 사용할 tesseract 실행 파일 경로
+        lang (string): tesseract 언어 (None이면 tesseract 기본값)
+    """
+    def __init__(self, tesseract_cmd=TESSERACT_CMD, lang=None):
+        if tesserocr is not None:
+            # --oem 3 --psm 6과 동일한 설정
+            self.api = tesserocr.PyTessBaseAPI(lang=lang or "eng", psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+        else:
+            import pytesseract
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+            self.api = None
+            self.pytesseract = pytesseract
+            self.lang = lang
+
+    @staticmethod
+    def config_key(tesseract_cmd=TESSERACT_CMD, lang=None):
+        """ OCR 결과 cache에 사용할 설정 문자열 반환 (backend 종류, tesseract 버전, 언어, 인식 설정)
+
+            tesserocr(PyTessBaseAPI)와 pytesseract(tesseract 실행 파일)는 같은 crop도 결과가 다를 수 있으므로 서로 다른 key를 사용함
+        """
+        if tesserocr is not None:
+            backend_name = "tesserocr.PyTessBaseAPI"
+            version = tesserocr.tesseract_version().split("\n")[0]
+            lang = lang or "eng"
+        else:
+            import pytesseract
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+            backend_name = "pytesseract"
+            version = str(pytesseract.get_tesseract_version())
+        return f"{backend_name}|{version}|lang={lang}|{TESSERACT_CONFIG}"
+
+    def recognize(self, img):
+        """ crop 이미지의 인식 결과 (string, confidence) 반환 (recognize_text.parse_tess_result와 같은 형식)
+
+        """
+        if self.api is None:
+            result_str = self.pytesseract.image_to_data(img, lang=self.lang, config=TESSERACT_CONFIG)
+            return parse_tess_result(result_str)
+
+        return merge_words(self.recognize_words(img))
+
+    def recognize_words(self, img):
+        """ 이미지(여러 줄일 수 있음) 내 단어별 [text, confidence, left, top, width, height] list 반환 (parse_tess_words와 같은 형식)
+
+        """
+        if self.api is None:
+            result_str = self.pytesseract.image_to_data(img, lang=self.lang, config=TESSERACT_CONFIG)
+            return parse_tess_words(result_str)
+
+        img = np.ascontiguousarray(img)
+        channels = img.shape[2] if img.ndim == 3 else 1
+        self.api.SetImageBytes(img.tobytes(), img.shape[1], img.shape[0], channels, img.shape[1] * channels)
+        self.api.Recognize()
+
+        words = []
+        iterator = self.api.GetIterator()
+        for word in tesserocr.iterate_level(iterator, tesserocr.RIL.WORD):
+            text = word.GetUTF8Text(tesserocr.RIL.WORD)
+            if text is None:
+                continue
+            x1, y1, x2, y2 = word.BoundingBox(tesserocr.RIL.WORD)
+            words.append([text, int(word.Confidence(tesserocr.RIL.WORD)), x1, y1, x2 - x1, y2 - y1])
+        return words
+
+    def close(self):
+        if self.api is not None:
+            self.api.End()
+
+class fake_ocr_backend():
+    """ tesseract 없이 ocr pool을 테스트/벤치마크하기 위한 backend
+
+        crop의 픽셀 값과 shape만으로 결과를 만들기 때문에, 같은 crop은 어느 process에서 인식하든 항상 같은 결과를 반환함.
+        recognize_words는 ink 픽셀(ink_pixel_threshold보다 어두운 픽셀)이 있는 행들을 한 줄로, 줄 내에서 word_gap 이상 떨어진
+        ink 구간을 한 단어로 보고, 단어 영역의 픽셀 값으로 text를 만듦 (단어 위치와 관계없이 같은 단어는 같은 text)
+
+    Arguments:
+        delay (float): crop(또는 page) 하나를 인식하는데 걸리는 시간을 흉내내기 위한 대기 시간(초)
+        word_gap (int): 단어를 나누는 최소 가로 간격 (픽셀)
+    """
+    def __init__(self, delay=0.0, word_gap=8, ink_pixel_threshold=128):
+        self.delay = delay
+        self.word_gap = word_gap
+        self.ink_pixel_threshold = ink_pixel_threshold
+
+    def recognize(self, img):
+        if self.delay > 0:
+            time.sleep(self.delay)
+        img = np.ascontiguousarray(img)
+        digest = hashlib.md5(str(img.shape).encode() + img.tobytes()).hexdigest()
+        return digest[:8].upper(), int(digest[8:10], 16) % 101
+
+    def recognize_words(self, img):
+        if self.delay > 0:
+            time.sleep(self.delay)
+        ink = (img.min(axis=2) if img.ndim == 3 else img) < self.ink_pixel_threshold
+
+        words = []
+        for top, bottom in _true_runs(ink.any(axis=1), 1):
+            line_ink = ink[top:bottom]
+            for left, right in _true_runs(line_ink.any(axis=0), self.word_gap):
+                word_ink = line_ink[:, left:right]
+                rows = np.where(word_ink.any(axis=1))[0]
+                word_top, word_bottom = top + rows[0], top + rows[-1] + 1
+                word_img = np.ascontiguousarray(img[word_top:word_bottom, left:right])
+                digest = hashlib.md5(str(word_img.shape).encode() + word_img.tobytes()).hexdigest()
+                words.append([digest[:6].upper(), int(digest[6:8], 16) % 101, int(left), int(word_top), int(right - left), int(word_bottom - word_top)])
+        return words
+
+    def close(self):
+        pass
+
+def _true_runs(mask, min_gap):
+    # 1차원 bool 배열에서 True 구간들의 [start, end) list 반환 (min_gap보다 짧은 False 구간으로 나뉜 구간은 합침)
+    index = np.where(mask)[0]
+    if index.shape[0] == 0:
+        return []
+    breaks = np.where(np.diff(index) > min_gap)[0]
+    starts = np.concatenate([[index[0]], index[breaks + 1]])
+    ends = np.concatenate([index[breaks], [index[-1]]]) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+class local_ocr_engine():
+    """ 현재 process에서 backend 하나로 crop들을 순서대로 인식하는 OCR engine (ocr_worker_pool과 같은 interface)
+
+    Arguments:
+        backend_class (class): tesseract_backend, fake_ocr_backend 등 recognize(img)를 갖는 클래스
+        backend_kwargs (dict): backend_class 생성 인자
+    """
+    def __init__(self, backend_class=tesseract_backend, backend_kwargs=None):
+        self.backend = backend_class(**(backend_kwargs or {}))
+
+    def recognize_batch(self, imgs, method="recognize"):
+        """ imgs의 인식 결과 (string, confidence)를 imgs 순서대로 반환하는 generator
+
+        Arguments:
+            method (string): 호출할 backend 메소드 ("recognize_words"면 단어별 결과 list 반환)
+        """
+        recognize_func = getattr(self.backend, method)
+        for img in imgs:
+            yield recognize_func(img)
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class ocr_worker_pool():
+    """ OCR backend를 하나씩 가진 worker process들에 crop을 나누어 인식하는 OCR engine
+
+        worker process와 backend는 pool이 닫힐 때까지 유지되고, crop은 shared memory의 slot에 복사해서 전달하므로
+        큰 이미지를 pickle하지 않음 (slot보다 큰 crop만 queue로 직접 전달). 결과는 입력 순서대로 반환됨.
+        task마다 batch id를 붙여서, 이전 recognize_batch에서 남은 결과는 버림. worker가 죽으면 pool을 broken으로 표시하고 RuntimeError 발생
+
+    Arguments:
+        backend_class (class): 각 worker에서 생성할 backend 클래스 (pickle 가능해야 함)
+        backend_kwargs (dict): backend_class 생성 인자
+        num_workers (int): worker process 수
+        slot_bytes (int): shared memory slot 하나의 크기 (worker당 2개의 slot 사용)
+        poll_timeout (float): 결과를 기다리다 worker가 살아있는지 확인하는 간격 (초)
+    """
+    def __init__(self, backend_class=tesseract_backend, backend_kwargs=None, num_workers=4, slot_bytes=4 << 20, poll_timeout=1.0):
+        self.num_workers = num_workers
+        self.slot_bytes = slot_bytes
+        self.slot_num = num_workers * 2 # worker가 인식하는 동안 다음 crop을 미리 복사해 둠
+        self.poll_timeout = poll_timeout
+        self.batch_id = 0
+        self.broken = False
+
+        self.shm = SharedMemory(create=True, size=slot_bytes * self.slot_num)
+        self.task_queue = mp.Queue()
+        self.result_queue = mp.Queue()
+        self.workers = [mp.Process(target=_ocr_worker_main, daemon=True,
+                                   args=(backend_class, backend_kwargs or {}, self.shm.name, slot_bytes, self.task_queue, self.result_queue))
+                        for _ in range(num_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def recognize_batch(self, imgs, method="recognize"):
+        """ imgs의 인식 결과 (string, confidence)를 imgs 순서대로 반환하는 generator
+
+            worker에서 오류가 나면 이미 보낸 crop의 결과를 모두 받은 뒤 RuntimeError 발생
+
+        Arguments:
+            method (string): worker의 backend에서 호출할 메소드 ("recognize_words"면 단어별 결과 list 반환)
+        """
+        if self.broken:
+            raise RuntimeError("ocr worker pool is broken (a worker process died)")
+
+        self.batch_id += 1
+        batch_id = self.batch_id
+        imgs = list(imgs)
+        free_slots = list(range(self.slot_num))
+        results = {}
+        submit_index = 0
+        yield_index = 0
+        in_flight = 0
+        errors = []
+
+        while yield_index < len(imgs):
+            while submit_index < len(imgs) and in_flight < self.slot_num and len(errors) == 0:
+                img = np.ascontiguousarray(imgs[submit_index])
+                if img.nbytes <= self.slot_bytes:
+                    slot = free_slots.pop()
+                    offset = slot * self.slot_bytes
+                    np.ndarray(img.shape, img.dtype, buffer=self.shm.buf, offset=offset)[...] = img
+                    self.task_queue.put((batch_id, submit_index, method, slot, img.shape, img.dtype.str, None))
+                else:
+                    self.task_queue.put((batch_id, submit_index, method, None, None, None, img))
+                submit_index += 1
+                in_flight += 1
+
+            if in_flight == 0: # 오류가 난 뒤 보낸 crop의 결과를 모두 받음
+                raise RuntimeError(f"ocr worker error\n{errors[0]}")
+
+            result_batch_id, task_index, slot, result, error = self._get_result()
+            if result_batch_id != batch_id: # 이전 batch에서 남은 결과
+                continue
+            if slot is not None:
+                free_slots.append(slot)
+            in_flight -= 1
+            if error is not None:
+                errors.append(error)
+                continue
+            results[task_index] = result
+
+            while yield_index in results and len(errors) == 0:
+                yield results.pop(yield_index)
+                yield_index += 1
+
+    def _get_result(self):
+        # result_queue에서 결과 하나를 받음. 기다리는 동안 worker가 죽으면 pool을 broken으로 표시하고 RuntimeError 발생
+        while True:
+            try:
+                return self.result_queue.get(timeout=self.poll_timeout)
+            except queue.Empty:
+                dead_workers = [worker for worker in self.workers if not worker.is_alive()]
+                if len(dead_workers) > 0:
+                    self.broken = True
+                    raise RuntimeError(f"ocr worker died (exitcode {dead_workers[0].exitcode})")
+
+    def close(self, timeout=10.0):
+        """ worker들을 종료 (종료를 기다리는 동안 남은 결과를 비워서 worker가 queue에 막히지 않게 하고, timeout이 지나면 강제 종료)
+
+        """
+        for _ in self.workers:
+            self.task_queue.put(None)
+        deadline = time.time() + timeout
+        for worker in self.workers:
+            while worker.is_alive() and time.time() < deadline:
+                self._drain_results()
+                worker.join(timeout=0.1)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._drain_results()
+        self.task_queue.cancel_join_thread() # 종료된 worker가 받지 못한 task 때문에 현재 process가 종료되지 않는 것을 방지
+        self.shm.close()
+        self.shm.unlink()
+
+    def _drain_results(self):
+        while True:
+            try:
+                self.result_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def _ocr_worker_main(backend_class, backend_kwargs, shm_name, slot_bytes, task_queue, result_queue):
+    # ocr_worker_pool의 worker process. backend를 한 번만 생성하고, task_queue가 None을 줄 때까지 crop을 인식함
+    shm = SharedMemory(name=shm_name)
+    backend = backend_class(**backend_kwargs)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        batch_id, task_index, method, slot, shape, dtype, img = task
+        try:
+            if img is None:
+                img = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf, offset=slot * slot_bytes)
+            result_queue.put((batch_id, task_index, slot, getattr(backend, method)(img), None))
+        except Exception:
+            result_queue.put((batch_id, task_index, slot, None, traceback.format_exc()))
+        del img # shared memory를 닫기 전에 view를 해제해야 함
+
+    backend.close()
+    shm.close()
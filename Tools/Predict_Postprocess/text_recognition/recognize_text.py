@@ -1,37 +1,46 @@
 import os
 import cv2
-import pytesseract
 import time
 from Common.print_progress import print_progress
+from Common.symbol_io import as_symbol_registry
+from Predict_Postprocess.text_recognition.ocr_engine import local_ocr_engine, tesseract_backend, parse_tess_result
 from copy import deepcopy
 import matplotlib.pyplot as plt # debug purpose
 
 def get_text_detection_result(dt_result, symbol_dict):
+    registry = as_symbol_registry(symbol_dict)
+    text_class_id_list = registry.text_class_id_list # text, text_rotated, text_rotated_45 순서로 모음
     bboxes_text = {}
     for filename, bboxes in dt_result.items():
-        bboxes_text[filename] = [x for x in bboxes if x["category_id"] == symbol_dict["text"] ]
-        if "text_rotated" in symbol_dict.keys():
-            bboxes_text[filename] += [x for x in bboxes if x["category_id"] == symbol_dict["text_rotated"] ]
-        if "text_rotated_45" in symbol_dict.keys():
-            bboxes_text[filename] += [x for x in bboxes if x["category_id"] == symbol_dict["text_rotated_45"] ]
+        bboxes_text[filename] = []
+        for text_class_id in text_class_id_list:
+            bboxes_text[filename] += [x for x in bboxes if x["category_id"] == text_class_id]
 
     return bboxes_text
 
-def recognize_text(image_path, nms_result, text_img_margin_ratio, symbol_dict):
-    pytesseract.pytesseract.tesseract_cmd = r'C:/Program Files/Tesseract-OCR/tesseract'
+def recognize_text(image_path, nms_result, text_img_margin_ratio, symbol_dict, ocr_engine=None, drawing_cache=None):
+    """ 도면의 텍스트 박스들을 crop하여 인식하고, 인식된 문자열(string)과 confidence(string_conf)를 추가한 결과를 반환
+
+    Arguments:
+        ocr_engine (local_ocr_engine, ocr_worker_pool or mosaic_ocr_engine): crop들을 인식할 OCR engine (None이면 현재 process에서 tesseract로 인식)
+        drawing_cache (drawing_image_cache): None이 아니면 도면을 cache를 통해 읽음
+    """
+    registry = as_symbol_registry(symbol_dict)
+    engine = ocr_engine if ocr_engine is not None else local_ocr_engine(tesseract_backend)
     dt_result_text = deepcopy(nms_result)
 
     new_bboxes = []
     for filename, bboxes in dt_result_text.items():
-        image = cv2.imread(image_path)
+        image = drawing_cache.get(image_path) if drawing_cache is not None else cv2.imread(image_path)
         img_shape= image.shape
         img_height = img_shape[0]
         img_width = img_shape[1]
 
+        crop_boxes = []
+        sub_imgs = []
         for i in range(len(bboxes)):
             new_box = deepcopy(bboxes[i])
 
-            print_progress(i,len(bboxes), 'Progress:', 'Complete')
             box_coord = bboxes[i]["bbox"] # [x, y, width, height]
             height = int(box_coord[3] * (1 + text_img_margin_ratio))
             width = int(box_coord[2] * (1 + text_img_margin_ratio))
@@ -55,18 +64,20 @@ def recognize_text(image_path, nms_result, text_img_margin_ratio, symbol_dict):
             vertical_threshold = 2
             if height > width * vertical_threshold: # 세로 문자열로 판단, aspect ratio 기준
                 sub_img = cv2.rotate(sub_img, cv2.ROTATE_90_CLOCKWISE)
-            if "text_rotated" in symbol_dict.keys():
-                if bboxes[i]["category_id"] == symbol_dict["text_rotated"]: # 세로 문자열로 판단, "text_rotated 카테고리일경우"
-                    sub_img = cv2.rotate(sub_img, cv2.ROTATE_90_CLOCKWISE)
-            if "text_rotated_45" in symbol_dict.keys():
-                if bboxes[i]["category_id"] == symbol_dict["text_rotated_45"]: # 45도 문자열로 판단, "text_rotated_45 카테고리일경우"
-                    center = (width//2, height//2)
-                    rot_matrix = cv2.getRotationMatrix2D(center, 45, 1.0)
-                    sub_img = cv2.warpAffine(sub_img, rot_matrix, (width,height))
+            text_degree = registry.get_text_degree(bboxes[i]["category_id"])
+            if text_degree == 90: # 세로 문자열로 판단, "text_rotated 카테고리일경우"
+                sub_img = cv2.rotate(sub_img, cv2.ROTATE_90_CLOCKWISE)
+            elif text_degree == 45: # 45도 문자열로 판단, "text_rotated_45 카테고리일경우"
+                center = (width//2, height//2)
+                rot_matrix = cv2.getRotationMatrix2D(center, 45, 1.0)
+                sub_img = cv2.warpAffine(sub_img, rot_matrix, (width,height))
 
-            result_str = pytesseract.image_to_data(sub_img, config="--oem 3 --psm 6")
-            recognized_text, conf = parse_tess_result(result_str)
+            crop_boxes.append(new_box)
+            sub_imgs.append(sub_img)
 
+        # crop을 모두 모은 뒤 한꺼번에 인식 (ocr_worker_pool이면 여러 worker에서 동시에 인식)
+        for i, (new_box, (recognized_text, conf)) in enumerate(zip(crop_boxes, engine.recognize_batch(sub_imgs))):
+            print_progress(i, len(sub_imgs), 'Progress:', 'Complete')
             new_box["string"] = recognized_text
             new_box["string_conf"] = conf
 
@@ -74,19 +85,23 @@ def recognize_text(image_path, nms_result, text_img_margin_ratio, symbol_dict):
 
         dt_result_text[filename] = new_bboxes
 
+    if ocr_engine is None:
+        engine.close()
+
     return dt_result_text
 
-def recognize_text_using_tess(drawing_dir, dt_result_after_nms_text_only, text_img_margin_ratio, symbol_dict):
-    pytesseract.pytesseract.tesseract_cmd = r'C:/Program Files/Tesseract-OCR/tesseract'
+def recognize_text_using_tess(drawing_dir, dt_result_after_nms_text_only, text_img_margin_ratio, symbol_dict, ocr_engine=None, drawing_cache=None):
+    registry = as_symbol_registry(symbol_dict)
+    engine = ocr_engine if ocr_engine is not None else local_ocr_engine(tesseract_backend)
     dt_result_text = deepcopy(dt_result_after_nms_text_only)
     for filename, bboxes in dt_result_text.items():
         print(f"recognizing texts in {filename}")
         drawing_path = os.path.join(drawing_dir, f"{filename}.jpg")
         if os.path.exists(drawing_path) == True:
-            img = cv2.imread(drawing_path)
+            img = drawing_cache.get(drawing_path) if drawing_cache is not None else cv2.imread(drawing_path)
 
+            sub_imgs = []
             for i in range(len(bboxes)):
-                print_progress(i,len(bboxes), 'Progress:', 'Complete')
                 box_coord = bboxes[i]["bbox"] # [x, y, width, height]
                 height = int(box_coord[3] * (1 + text_img_margin_ratio))
                 width = int(box_coord[2] * (1 + text_img_margin_ratio))
@@ -100,18 +115,18 @@ def recognize_text_using_tess(drawing_dir, dt_result_after_nms_text_only, text_i
 
                 # if height > width * vertical_threshold: # 세로 문자열로 판단, aspect ratio 기준
                 #     sub_img = cv2.rotate(sub_img, cv2.ROTATE_90_CLOCKWISE)
-                if "text_rotated" in symbol_dict.keys():
-                    if bboxes[i]["category_id"] == symbol_dict["text_rotated"]: # 세로 문자열로 판단, "text_rotated 카테고리일경우"
-                        sub_img = cv2.rotate(sub_img, cv2.ROTATE_90_CLOCKWISE)
-                if "text_rotated_45" in symbol_dict.keys():
-                    if bboxes[i]["category_id"] == symbol_dict["text_rotated_45"]: # 45도 문자열로 판단, "text_rotated_45 카테고리일경우"
-                        center = (width//2, height//2)
-                        rot_matrix = cv2.getRotationMatrix2D(center, 45, 1.0)
-                        sub_img = cv2.warpAffine(sub_img, rot_matrix, (width,height))
-
-                result_str = pytesseract.image_to_data(sub_img, config="--oem 3 --psm 6")
-                recognized_text, conf = parse_tess_result(result_str)
+                text_degree = registry.get_text_degree(bboxes[i]["category_id"])
+                if text_degree == 90: # 세로 문자열로 판단, "text_rotated 카테고리일경우"
+                    sub_img = cv2.rotate(sub_img, cv2.ROTATE_90_CLOCKWISE)
+                elif text_degree == 45: # 45도 문자열로 판단, "text_rotated_45 카테고리일경우"
+                    center = (width//2, height//2)
+                    rot_matrix = cv2.getRotationMatrix2D(center, 45, 1.0)
+                    sub_img = cv2.warpAffine(sub_img, rot_matrix, (width,height))
+
+                sub_imgs.append(sub_img)
 
+            for i, (recognized_text, conf) in enumerate(engine.recognize_batch(sub_imgs)):
+                print_progress(i, len(bboxes), 'Progress:', 'Complete')
                 bboxes[i]["string"] = recognized_text
                 bboxes[i]["string_conf"] = conf
                 
@@ -133,28 +148,11 @@ def recognize_text_using_tess(drawing_dir, dt_result_after_nms_text_only, text_i
                 #         recognized_text = rotated_recognized_text
                 #         conf = rotated_conf
 
+    if ocr_engine is None:
+        engine.close()
 
     return dt_result_text
 
-def parse_tess_result(result_str):
-    result_to_list = result_str.split("\n")
-    result_string = ""
-    confidence = 0
-    count = 0
-    for result in result_to_list:
-        res = result.split("\t")
-        if res[0] == '5':
-            count += 1
-            confidence += int(float(res[-2]))
-            result_string = result_string + res[-1]
-
-    if count == 0:
-        confidence = 0
-    else:
-        confidence = confidence / count
-
-    return result_string, confidence
-
 def is_osd_result_rotated(result_str):
     result_to_list = result_str.split("\n")
     result_string = ""
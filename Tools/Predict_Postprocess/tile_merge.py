@@ -0,0 +1,108 @@
+import numpy as np
+from collections import defaultdict
+from Common.detection_array import empty_detections
+
+class tile_merger():
+    """ 분할 도면의 detection 결과를 global 좌표로 합치면서, 분할 도면 overlap 때문에 생긴 중복 박스를 제거하는 클래스
+
+        박스를 uniform grid(spatial hash)의 cell에 등록하고, 새 박스는 같은 cell을 공유하는 박스들과만 비교함.
+        다른 분할 도면에서 검출된 같은 클래스의 박스와 IOU > iou_threshold이면 score가 높은 박스 하나만 남김
+        (같은 분할 도면 내의 박스끼리는 비교하지 않으며, 최종 NMS에서 처리됨)
+
+        NMS의 근사이므로 최종 NMS 결과가 달라질 수 있음: 제거된 박스 D는 D를 제거한 박스 B가 최종 NMS에서 남을 때만
+        NMS에서도 제거되는데, B가 나중에 다른 박스에 의해 제거되거나 최종 NMS에서 제거되면 NMS에서는 D가 남을 수 있음
+
+    Arguments:
+        iou_threshold (float): 중복으로 판단할 IOU 기준 (NMS threshold보다 높게 설정해야 NMS 결과에 영향이 적음)
+        cell_size (int): grid cell 크기 (global 좌표 기준 픽셀)
+    """
+    def __init__(self, iou_threshold=0.7, cell_size=256):
+        self.iou_threshold = iou_threshold
+        self.cell_size = cell_size
+
+        self.cells = defaultdict(set) # {(cell_x, cell_y): {남아있는 박스 index}}
+        self.box_cells = {} # {남아있는 박스 index: 등록된 cell list} (제거된 박스를 cell에서 바로 빼기 위함)
+        self.boxes = [] # [x1, y1, x2, y2]
+        self.areas = []
+        self.scores = []
+        self.category_ids = []
+        self.tiles = []
+        self.alive = []
+        self.dets_list = []
+
+        self.duplicate_num = 0 # 제거된 중복 박스 수
+
+    def insert(self, dets):
+        """ global 좌표로 변환된 분할 도면 하나의 detection array를 추가
+
+        Arguments:
+            dets (np.ndarray): detection_dtype 형식의 배열 (global 좌표)
+        """
+        self.dets_list.append(dets)
+        offset = len(self.boxes)
+
+        x1 = dets['x']
+        y1 = dets['y']
+        x2 = x1 + dets['w']
+        y2 = y1 + dets['h']
+        cell_x1 = np.floor(x1 / self.cell_size).astype(np.int64)
+        cell_y1 = np.floor(y1 / self.cell_size).astype(np.int64)
+        cell_x2 = np.floor(x2 / self.cell_size).astype(np.int64)
+        cell_y2 = np.floor(y2 / self.cell_size).astype(np.int64)
+
+        self.boxes.extend(np.stack([x1, y1, x2, y2], axis=1).tolist())
+        self.areas.extend((dets['w'] * dets['h']).tolist())
+        self.scores.extend(dets['score'].tolist())
+        self.category_ids.extend(dets['category_id'].tolist())
+        self.tiles.extend(zip(dets['tile_h'].tolist(), dets['tile_w'].tolist()))
+        self.alive.extend([False] * dets.shape[0])
+
+        for i in np.argsort(-dets['score'], kind='stable').tolist():
+            index = offset + i
+            cells = [(cx, cy) for cx in range(cell_x1[i], cell_x2[i] + 1) for cy in range(cell_y1[i], cell_y2[i] + 1)]
+
+            candidates = set()
+            for cell in cells:
+                candidates.update(self.cells.get(cell, ()))
+            candidates = [j for j in candidates if self.category_ids[j] == self.category_ids[index]
+                          and self.tiles[j] != self.tiles[index]]
+
+            if len(candidates) > 0:
+                duplicates = [candidates[k] for k in np.where(self.calculate_iou(index, candidates) > self.iou_threshold)[0]]
+                if any(self.scores[j] >= self.scores[index] for j in duplicates):
+                    self.duplicate_num += 1
+                    continue
+                for j in duplicates:
+                    self.alive[j] = False
+                    for cell in self.box_cells.pop(j):
+                        self.cells[cell].discard(j)
+                self.duplicate_num += len(duplicates)
+
+            self.alive[index] = True
+            self.box_cells[index] = cells
+            for cell in cells:
+                self.cells[cell].add(index)
+
+    def calculate_iou(self, index, candidates):
+        """ index 박스와 candidates 박스들 간의 IOU (non_max_suppression_fast와 동일한 +1 픽셀 기준)
+
+        """
+        box = self.boxes[index]
+        candidate_boxes = np.array([self.boxes[j] for j in candidates])
+        candidate_areas = np.array([self.areas[j] for j in candidates])
+
+        w_ = np.maximum(0, np.minimum(box[2], candidate_boxes[:, 2]) - np.maximum(box[0], candidate_boxes[:, 0]) + 1)
+        h_ = np.maximum(0, np.minimum(box[3], candidate_boxes[:, 3]) - np.maximum(box[1], candidate_boxes[:, 1]) + 1)
+        intersection = w_ * h_
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return intersection / (candidate_areas + self.areas[index] - intersection)
+
+    def get_detections(self):
+        """ 중복이 제거된 detection array 반환 (추가된 순서 유지)
+
+        """
+        if len(self.dets_list) == 0:
+            return empty_detections()
+
+        return np.concatenate(self.dets_list)[np.array(self.alive, dtype=bool)]
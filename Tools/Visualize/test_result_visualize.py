@@ -8,7 +8,7 @@ mode_colors = {1 : (255,0,0),2 : (0,0,255),3 : (0,255,0),4 : (255,255,0),5 : (25
                6 : (128,128,255),7 : (128,128,255), 8: (0,0,255)}
 
 def draw_test_results_to_img(eval_data, gt_to_dt_match_dict, dt_to_gt_match_dict,
-                             drawing_img_dir, output_img_dir, modes, thickness=3):
+                             drawing_img_dir, output_img_dir, modes, thickness=3, drawing_cache=None):
     """ test 결과를 이미지로 출력하기 위한 함수. 기존과 동일하게 7개의 옵션을 갖고 있음. # TODO : 박스 레이블 표기
         mode 1 : GT 박스 출력
         mode 2 : Detection 결과 출력
@@ -27,12 +27,14 @@ def draw_test_results_to_img(eval_data, gt_to_dt_match_dict, dt_to_gt_match_dict
         output_img_dir (string): 결과 이미지 출력 폴더
         modes (list): 1~7까지의 모드 중, 리스트에 숫자가 존재하는 모드를 선택하여 출력
         thickness: 출력 선 두께
+        drawing_cache (drawing_image_cache): None이 아니면 도면을 cache를 통해 읽음
     Return:
          None (이미지 파일로 디스크에 저장)
     """
     dt_result = eval_data.dt_result
     gt_json = eval_data.gt_result_json
     dt_result_after_nms = eval_data.dt_result_after_nms
+    gt_annotations_by_image_id = eval_data.gt_annotations_by_image_id # image id별로 미리 묶어둔 gt annotation
 
     for img in gt_json['images']:
         print(f"Writing result of {img}...")
@@ -41,10 +43,9 @@ def draw_test_results_to_img(eval_data, gt_to_dt_match_dict, dt_to_gt_match_dict
         img_filename_key = img_filename.split(".")[0]
         image_path = os.path.join(drawing_img_dir, img_filename)
         bboxes_per_image_list = []
-        image = cv2.imread(image_path)
+        image = drawing_cache.get(image_path) if drawing_cache is not None else cv2.imread(image_path)
 
-        bboxes = gt_json['annotations']
-        current_gt_bboxes = [x for x in bboxes if x["image_id"] == img["id"]]
+        current_gt_bboxes = gt_annotations_by_image_id.get(img["id"], [])
         draw_additional_data = None
         for mode in modes:
             if mode == 1:
@@ -1,6 +1,7 @@
 import os
 import cv2
 import json
+from collections import defaultdict
 from pathlib import Path
 from image_drawing import draw_bbox_from_bbox_list
 
@@ -8,6 +9,9 @@ def draw_training_data_bbox(data_path: str, json_path: str, output_img_dir: str)
     with open(json_path, 'r') as js:
         data = json.load(js);
         bboxes = data['annotations']
+        bboxes_by_image_id = defaultdict(list) # image마다 전체 annotation을 탐색하지 않도록 image id별로 미리 묶음
+        for bbox in bboxes:
+            bboxes_by_image_id[bbox["image_id"]].append(bbox)
     
         for img_dict in data['images']:
             img_filename = img_dict["file_name"]
@@ -15,7 +19,7 @@ def draw_training_data_bbox(data_path: str, json_path: str, output_img_dir: str)
             img_path = os.path.join(data_path, img_filename)
             image = cv2.imread(img_path)
             
-            bboxes_per_image = [x for x in bboxes if x["image_id"] == img_dict["id"]]
+            bboxes_per_image = bboxes_by_image_id[img_dict["id"]]
             draw_additional_data = [x["category_id"] for x in bboxes_per_image]
 
             bboxes_ = [x["bbox"] for x in bboxes_per_image]
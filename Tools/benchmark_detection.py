@@ -0,0 +1,52 @@
+import sys
+import time
+from itertools import islice
+from pipeline import INPUT_DIR, CONFIG, CHECKPOINT, segment_params, drawing_resize_scale, score_threshold, device, \
+    load_model, detect_segmented_imgs
+from Data_Generator.generate_segmented_data import read_resized_drawing, iter_segment_image
+
+# 분할 이미지 단위 inference(batch_size=1)와 batch inference의 처리 속도(tiles/sec) 비교 코드
+
+batch_sizes = [1, 2, 4, 8, 16] # 비교할 batch size 목록 (1은 기존 per-tile loop와 동일)
+tile_num = 64 # 측정에 사용할 분할 이미지 수 (None이면 도면 전체)
+warmup_tile_num = 4 # cudnn benchmark 등 초기화 시간을 제외하기 위해 먼저 수행할 분할 이미지 수
+
+def benchmark_detection(model, drawing_img, batch_sizes, tile_num=None, warmup_tile_num=4):
+    """ batch size별로 detect_segmented_imgs의 처리 속도를 측정
+
+    Arguments:
+        model: load_model로 로드한 detector
+        drawing_img (np.ndarray): read_resized_drawing으로 읽은 도면 이미지
+        batch_sizes (list): 측정할 batch size 목록
+        tile_num (int): 측정에 사용할 분할 이미지 수 (None이면 도면 전체)
+        warmup_tile_num (int): 측정 전에 먼저 수행할 분할 이미지 수
+    Return:
+        batch size를 key로, [분할 이미지 수, 소요 시간, tiles/sec, 검출 박스 수]를 value로 갖는 dict
+    """
+    if warmup_tile_num > 0:
+        detect_segmented_imgs(model, islice(iter_segment_image(drawing_img, segment_params), warmup_tile_num), score_threshold)
+
+    tiles = list(islice(iter_segment_image(drawing_img, segment_params), tile_num))
+
+    result = {}
+    for batch_size in batch_sizes:
+        start = time.time()
+        dt_results = detect_segmented_imgs(model, tiles, score_threshold, batch_size)
+        elapsed = time.time() - start
+
+        result[batch_size] = [len(tiles), elapsed, len(tiles) / elapsed, len(dt_results['out'])]
+        print(f'* batch size {batch_size}: {len(tiles)} tiles, {elapsed:.3f} sec, {len(tiles) / elapsed:.2f} tiles/sec, {len(dt_results["out"])} boxes')
+
+    return result
+
+if __name__=='__main__':
+    if len(sys.argv) != 2:
+        print('! 입력 도면 파일 이름을 인자로 입력해 주세요')
+        exit()
+
+    image_path = INPUT_DIR + sys.argv[1]
+
+    drawing_img = read_resized_drawing(image_path, drawing_resize_scale)
+    model = load_model(CONFIG, CHECKPOINT, device)
+
+    benchmark_detection(model, drawing_img, batch_sizes, tile_num, warmup_tile_num)
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+from Predict_Postprocess.box_matching import match_drawing
+
+# 합성 도면(gt, dt 5천개 이상)에 대해 기존 compare_gt_and_dt의 dt별 loop와 같은 클래스 IOU 행렬 기반 매칭(match_drawing)의 속도 및 결과 비교 코드
+
+object_nums = [5000, 20000] # 합성 도면 하나의 gt 수
+drawing_size = (9933, 7016) # 도면 해상도 (width, height)
+class_num = 500
+text_class_ratio = 0.5 # 전체 박스 중 text 클래스 박스 비율
+detect_ratio = 1.1 # gt 하나당 평균 dt 수 (오검출, 중복 검출 포함)
+duplicate_gt_ratio = 0.01 # 완전히 같은 위치의 gt 비율 (IOU가 같은 후보가 있는 경우 확인용)
+matching_iou_threshold = 0.5
+
+def make_synthetic_drawing(object_num, seed=0):
+    """ gt 박스와, gt 주변에 jitter를 준 dt 박스(일부 오검출 포함) 생성
+
+    Return:
+        gt_boxes (np.ndarray): (object_num, 4) [x, y, width, height] int 박스 배열
+        gt_classes (np.ndarray): (object_num,) category_id
+        dt_boxes, dt_classes, dt_scores (np.ndarray): compare_gt_and_dt와 같이 float으로 저장한 dt 박스, category_id, score
+    """
+    rng = np.random.default_rng(seed)
+    gt_classes = np.where(rng.random(object_num) < text_class_ratio, 499, rng.integers(0, class_num - 1, object_num))
+    gt_wh = rng.integers(20, 120, (object_num, 2))
+    gt_xy = rng.integers(0, [drawing_size[0] - 120, drawing_size[1] - 120], (object_num, 2))
+    gt_boxes = np.concatenate([gt_xy, gt_wh], axis=1)
+    duplicate = rng.random(object_num) < duplicate_gt_ratio
+    gt_boxes[duplicate] = gt_boxes[np.roll(np.arange(object_num), 1)][duplicate]
+    gt_classes[duplicate] = gt_classes[np.roll(np.arange(object_num), 1)][duplicate]
+
+    dt_num = int(object_num * detect_ratio)
+    source_index = rng.integers(0, object_num, dt_num)
+    dt_boxes = (gt_boxes[source_index] + rng.integers(-8, 9, (dt_num, 4))).astype(np.float64)
+    dt_classes = np.where(rng.random(dt_num) < 0.95, gt_classes[source_index], rng.integers(0, class_num, dt_num)).astype(np.float64)
+    dt_scores = np.round(rng.random(dt_num), 2) # 같은 score가 많도록 반올림
+
+    return gt_boxes, gt_classes, dt_boxes, dt_classes, dt_scores
+
+def reference_match(gt_boxes, gt_boxes_class, dt_boxes, dt_classes, dt_scores, matching_iou_threshold):
+    """ 기존 compare_gt_and_dt의 도면 하나에 대한 구현 (비교용)
+
+    """
+    gt_to_result_index_match_dict = {}
+    result_to_gt_index_match_dict = {}
+    gt_boxes_area = gt_boxes[:, 2] * gt_boxes[:, 3]
+
+    result_boxes = np.zeros((dt_boxes.shape[0], 6))
+    result_boxes[:,0:4] = dt_boxes
+    result_boxes[:,4] = dt_classes
+    result_boxes[:,5] = dt_scores
+
+    result_boxes_score_sorted_index = (-result_boxes[:, -1]).argsort()
+    result_boxes_score_sorted = result_boxes[result_boxes_score_sorted_index]
+
+    for result_index in range(result_boxes_score_sorted.shape[0]):
+        result_box, result_box_class = result_boxes_score_sorted[result_index, :-2], result_boxes_score_sorted[result_index, -2]
+
+        same_class_gt_box_index = (result_box_class == gt_boxes_class)
+        if np.any(same_class_gt_box_index) == False:
+            continue
+
+        result_box_area = result_box[2] * result_box[3]
+        intersection_x1 = np.maximum(result_box[0], gt_boxes[:, 0])
+        intersection_y1 = np.maximum(result_box[1], gt_boxes[:, 1])
+        intersection_x2 = np.minimum(result_box[0] + result_box[2], gt_boxes[:, 0] + gt_boxes[:, 2])
+        intersection_y2 = np.minimum(result_box[1] + result_box[3], gt_boxes[:, 1] + gt_boxes[:, 3])
+        intersection_w = np.maximum(0, intersection_x2 - intersection_x1 + 1)
+        intersection_h = np.maximum(0, intersection_y2 - intersection_y1 + 1)
+        intersection = intersection_w * intersection_h
+        iou = intersection / (gt_boxes_area + result_box_area - intersection)
+
+        iou_sorted_index = (-iou).argsort()
+        iou_sorted_over_threshold_same_class_index = ((iou > matching_iou_threshold) & same_class_gt_box_index)[iou_sorted_index]
+        for index in np.where(iou_sorted_over_threshold_same_class_index)[0]:
+            real_gt_index = iou_sorted_index[index]
+            if real_gt_index not in gt_to_result_index_match_dict.keys():
+                gt_to_result_index_match_dict[real_gt_index] = result_boxes_score_sorted_index[result_index]
+                result_to_gt_index_match_dict[result_index] = real_gt_index
+                break
+
+    return gt_to_result_index_match_dict, result_to_gt_index_match_dict
+
+if __name__ == '__main__':
+    for object_num in object_nums:
+        drawing = make_synthetic_drawing(object_num)
+
+        start = time.time()
+        reference_result = reference_match(*drawing, matching_iou_threshold)
+        reference_elapsed = time.time() - start
+
+        start = time.time()
+        result = match_drawing(*drawing, matching_iou_threshold)
+        elapsed = time.time() - start
+
+        print(f'* {object_num} gt / {drawing[2].shape[0]} dt: loop {reference_elapsed:.3f} sec, matrix {elapsed:.3f} sec, '
+              f'{len(result[0])} matches, identical: {result == reference_result}, speedup: {reference_elapsed / elapsed:.1f}x')
@@ -0,0 +1,71 @@
+import time
+import numpy as np
+from Predict_Postprocess.text_recognition.ocr_engine import fake_ocr_backend, local_ocr_engine
+from Predict_Postprocess.text_recognition.mosaic_ocr import mosaic_ocr_engine
+
+# 합성 텍스트 crop들에 대해 crop마다 OCR하는 방식과 mosaic page 단위로 OCR하는 방식의 속도 및 결과 비교 코드
+# (fake_ocr_backend 사용, delay로 tesseract 호출 한 번의 시작/레이아웃 분석 비용을 흉내냄)
+
+crop_num = 1000
+recognize_delay = 0.02 # OCR 호출 한 번의 고정 비용(초)
+line_height = 32
+max_lines_per_page = 200
+word_gap = 8 # fake_ocr_backend의 단어 구분 간격
+
+def render_synthetic_text(rng, word_num, height):
+    """ 글자를 흉내낸 검은 사각형들로 단어 word_num개를 그린 흰 배경 crop 생성 (단어 사이 간격은 resize 후에도 word_gap 이상)
+
+    """
+    scale = height / line_height
+    char_gap = 2
+    space = int((word_gap + 4) * scale) + 2
+    glyphs = []
+    for word in range(word_num):
+        for char in range(rng.integers(1, 6)):
+            glyphs.append((int(rng.integers(4, 12) * scale), int(rng.integers(10, 24) * scale), int(rng.integers(0, 100))))
+        glyphs.append(None) # 단어 끝
+
+    width = 4 + sum(char_gap + glyph[0] if glyph is not None else space for glyph in glyphs)
+    crop = np.full((height, width, 3), 255, dtype=np.uint8)
+    x = 4
+    for glyph in glyphs:
+        if glyph is None:
+            x += space
+            continue
+        glyph_width, glyph_height, value = glyph
+        top = (height - glyph_height) // 2
+        crop[top:top + glyph_height, x:x + glyph_width] = value
+        x += glyph_width + char_gap
+    return crop
+
+def make_synthetic_crops(seed=0):
+    rng = np.random.default_rng(seed)
+    word_nums = rng.integers(0, 4, crop_num) # 0이면 빈 crop
+    heights = np.where(rng.random(crop_num) < 0.7, line_height, line_height * 2) # 일부는 resize 되는 crop
+    crops = [render_synthetic_text(rng, word_num, height) for word_num, height in zip(word_nums.tolist(), heights.tolist())]
+    return crops, word_nums
+
+if __name__ == '__main__':
+    crops, word_nums = make_synthetic_crops()
+    backend_kwargs = {"delay": recognize_delay, "word_gap": word_gap}
+
+    # page 하나에 crop 하나 = crop마다 OCR 호출
+    start = time.time()
+    with local_ocr_engine(fake_ocr_backend, backend_kwargs) as page_engine:
+        engine = mosaic_ocr_engine(page_engine, line_height=line_height, max_lines_per_page=1)
+        reference_result = list(engine.recognize_batch(crops))
+        reference_call_num = engine.page_num
+    reference_elapsed = time.time() - start
+    print(f'* {crop_num} crops, OCR per crop: {reference_elapsed:.3f} sec, {reference_call_num} OCR calls')
+
+    start = time.time()
+    with local_ocr_engine(fake_ocr_backend, backend_kwargs) as page_engine:
+        engine = mosaic_ocr_engine(page_engine, line_height=line_height, max_lines_per_page=max_lines_per_page)
+        result = list(engine.recognize_batch(crops))
+        call_num = engine.page_num
+    elapsed = time.time() - start
+
+    # fake_ocr_backend는 단어 하나당 6글자를 반환하므로, 그려진 단어 수와 비교하여 mapping이 맞는지 확인
+    word_count_ok = all(len(string) == 6 * word_num for (string, _), word_num in zip(result, word_nums.tolist()))
+    print(f'* {crop_num} crops, mosaic ({max_lines_per_page} lines/page): {elapsed:.3f} sec, {call_num} OCR calls, '
+          f'identical: {result == reference_result}, word count ok: {word_count_ok}, speedup: {reference_elapsed / elapsed:.1f}x')
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+from Predict_Postprocess.nms import batched_nms
+
+# 합성 도면(박스 1만/5만개)에 대해 기존 NMS(np.delete loop)와 클래스별 NMS(batched_nms)의 속도 및 결과 비교 코드
+
+box_nums = [10000, 50000] # 합성 도면 하나의 박스 수
+reference_max_box_num = 20000 # 기존 구현은 O(n^2)이므로 이 수 이하의 도면에서만 비교
+drawing_size = (9933, 7016) # 도면 해상도 (width, height)
+class_num = 500
+text_class_ratio = 0.5 # 전체 박스 중 text 클래스 박스 비율
+duplicate_num = 3 # 분할 도면 overlap 때문에 한 심볼이 중복 검출되는 평균 횟수
+iou_threshold = 0.0
+adaptive_thr_dict = {
+    311: 0.02, 66: 0.06, 145: 0.4,
+    131: 0.65, 431: 0.04, 109: 0.03,
+    239: 0.3, 12: 0.0002, 499: 0.2
+}
+
+def make_synthetic_drawing(box_num, seed=0):
+    """ 심볼이 여러 번 중복 검출된 도면의 detection 결과를 흉내낸 박스 생성
+
+    Return:
+        boxes (np.ndarray): (box_num, 4) [x, y, width, height] int 박스 배열
+        scores (np.ndarray): (box_num,) score
+        classes (np.ndarray): (box_num,) category_id
+    """
+    rng = np.random.default_rng(seed)
+    object_num = box_num // duplicate_num
+
+    object_classes = np.where(rng.random(object_num) < text_class_ratio, 499, rng.integers(0, class_num - 1, object_num))
+    object_wh = rng.integers(20, 120, (object_num, 2))
+    object_xy = rng.integers(0, [drawing_size[0] - 120, drawing_size[1] - 120], (object_num, 2))
+
+    object_index = rng.integers(0, object_num, box_num)
+    jitter = rng.integers(-3, 4, (box_num, 4))
+    boxes = np.concatenate([object_xy[object_index], object_wh[object_index]], axis=1) + jitter
+    scores = rng.random(box_num)
+    classes = object_classes[object_index]
+
+    return boxes, scores, classes
+
+def reference_nms(boxes, scores, classes, iou_threshold, per_class=True, adaptive_thr_dict=None):
+    """ 기존 non_max_suppression_fast의 구현 (비교용)
+
+    """
+    pick = []
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    w = boxes[:, 2]
+    h = boxes[:, 3]
+    area = w * h
+    idxs = np.argsort(scores)
+
+    while len(idxs) > 0:
+        last = len(idxs) - 1
+        i = idxs[last]
+        c = classes[i]
+        pick.append(i)
+
+        xx1 = np.maximum(x1[i], x1[idxs[:last]])
+        yy1 = np.maximum(y1[i], y1[idxs[:last]])
+        xx2 = np.minimum(x1[i] + w[i], x1[idxs[:last]] + w[idxs[:last]])
+        yy2 = np.minimum(y1[i] + h[i], y1[idxs[:last]] + h[idxs[:last]])
+
+        w_ = np.maximum(0, xx2 - xx1 + 1)
+        h_ = np.maximum(0, yy2 - yy1 + 1)
+        intersection = w_ * h_
+        iou = intersection / (area[idxs[:last]] + area[idxs[last]] - intersection)
+
+        if per_class:
+            if adaptive_thr_dict is not None and c in adaptive_thr_dict.keys():
+                outCheck = (iou > adaptive_thr_dict[c])
+            else:
+                outCheck = (iou > iou_threshold)
+            allCheck = (classes[idxs[:last]] == c) & outCheck
+            idxs = np.delete(idxs, np.concatenate(([last], np.where(allCheck)[0])))
+        else:
+            idxs = np.delete(idxs, np.concatenate(([last], np.where(iou > iou_threshold)[0])))
+
+    return np.array(pick)
+
+if __name__ == '__main__':
+    for box_num in box_nums:
+        boxes, scores, classes = make_synthetic_drawing(box_num)
+
+        start = time.time()
+        pick = batched_nms(boxes, scores, classes, iou_threshold, True, adaptive_thr_dict)
+        elapsed = time.time() - start
+        print(f'* {box_num} boxes, batched_nms: {elapsed:.3f} sec, {len(pick)} picked')
+
+        if box_num <= reference_max_box_num:
+            start = time.time()
+            reference_pick = reference_nms(boxes, scores, classes, iou_threshold, True, adaptive_thr_dict)
+            reference_elapsed = time.time() - start
+            print(f'* {box_num} boxes, reference: {reference_elapsed:.3f} sec, {len(reference_pick)} picked, '
+                  f'identical: {np.array_equal(pick, reference_pick)}, speedup: {reference_elapsed / elapsed:.1f}x')
@@ -0,0 +1,42 @@
+import time
+import numpy as np
+from Predict_Postprocess.text_recognition.ocr_engine import fake_ocr_backend, local_ocr_engine, ocr_worker_pool
+
+# tesseract 없이 fake_ocr_backend로 현재 process에서의 순차 인식(local_ocr_engine)과 ocr_worker_pool의 속도 및 결과 비교 코드
+# (fake_ocr_backend의 delay로 crop 하나의 인식 시간을 흉내냄)
+
+crop_num = 2000 # 도면 하나의 텍스트 crop 수
+recognize_delay = 0.005 # crop 하나의 인식 시간(초)
+num_workers_list = [2, 4, 8]
+
+def make_synthetic_crops(seed=0):
+    """ 텍스트 박스 crop을 흉내낸 다양한 크기의 uint8 이미지 생성 (일부는 shared memory slot보다 큰 crop)
+
+    """
+    rng = np.random.default_rng(seed)
+    crops = []
+    for i in range(crop_num):
+        if i % 500 == 0:
+            height, width = 1500, 1500 # slot(4MB)보다 큰 crop은 queue로 전달됨
+        else:
+            height, width = rng.integers(20, 60), rng.integers(40, 400)
+        crops.append(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    return crops
+
+if __name__ == '__main__':
+    crops = make_synthetic_crops()
+    backend_kwargs = {"delay": recognize_delay}
+
+    start = time.time()
+    with local_ocr_engine(fake_ocr_backend, backend_kwargs) as engine:
+        reference_result = list(engine.recognize_batch(crops))
+    reference_elapsed = time.time() - start
+    print(f'* {crop_num} crops, local_ocr_engine: {reference_elapsed:.3f} sec')
+
+    for num_workers in num_workers_list:
+        start = time.time()
+        with ocr_worker_pool(fake_ocr_backend, backend_kwargs, num_workers) as engine:
+            result = list(engine.recognize_batch(crops))
+        elapsed = time.time() - start
+        print(f'* {crop_num} crops, ocr_worker_pool ({num_workers} workers): {elapsed:.3f} sec, '
+              f'identical: {result == reference_result}, speedup: {reference_elapsed / elapsed:.1f}x')
@@ -0,0 +1,150 @@
+import os
+import time
+import tempfile
+import filecmp
+import numpy as np
+from xml.etree.ElementTree import Element, SubElement, ElementTree
+from Common.symbol_io import symbol_registry
+from Common.pnid_xml import write_symbol_result_to_xml, write_text_result_to_xml, write_result_to_xml, indent
+
+# 합성 도면(심볼 2만개)의 xml 출력에서 기존 이름/type 탐색(symbol_dict 전체 순회)과 symbol_registry의 속도 및 결과 비교,
+# 기존 ElementTree + indent() 방식과 streaming 출력의 속도 및 결과 비교 코드
+
+object_num = 20000 # 합성 도면 하나의 object 수
+class_num = 500
+text_class_ratio = 0.3 # 전체 object 중 text 클래스 object 비율
+drawing_size = (9933, 7016) # 도면 해상도 (width, height)
+type_names = ["valve", "instrument", "pipe", "equipment", "etc"]
+drawing_num = 8 # 병렬 출력 비교에 사용할 도면 수
+num_workers = 4
+
+def make_synthetic_symbols(seed=0):
+    """ read_symbol_txt(include_text_as_class=True, include_text_orientation_as_class=True), read_symbol_type_txt 결과를 흉내낸 dict 생성
+
+    """
+    rng = np.random.default_rng(seed)
+    symbol_dict = {f"symbol_{i}": i for i in range(class_num)}
+    symbol_type_dict = {name: type_names[rng.integers(len(type_names))] for name in symbol_dict.keys()}
+    symbol_dict["text"] = class_num
+    symbol_dict["text_rotated"] = class_num + 1
+    symbol_dict["text_rotated_45"] = class_num + 2
+    return symbol_dict, symbol_type_dict
+
+def make_synthetic_result(symbol_dict, seed=0):
+    """ nms 이후의 dt_result({도면 이름: box dict list})를 흉내낸 결과 생성
+
+    """
+    rng = np.random.default_rng(seed)
+    text_ids = [symbol_dict["text"], symbol_dict["text_rotated"], symbol_dict["text_rotated_45"]]
+    classes = np.where(rng.random(object_num) < text_class_ratio, rng.choice(text_ids, object_num), rng.integers(0, class_num, object_num))
+    xy = rng.integers(0, [drawing_size[0] - 120, drawing_size[1] - 120], (object_num, 2))
+    wh = rng.integers(20, 120, (object_num, 2))
+
+    objects = [{"bbox": [x, y, w, h], "score": 1.0, "category_id": c, "string": "text"}
+               for (x, y), (w, h), c in zip(xy.tolist(), wh.tolist(), classes.tolist())]
+    return {"synthetic_drawing": objects}
+
+def reference_lookup(objects, symbol_dict, symbol_type_dict):
+    """ 기존 write_symbol_result_to_xml의 text 클래스 판별 및 이름/type 탐색 (비교용)
+
+    """
+    result = []
+    for object in objects:
+        category_id = object["category_id"]
+        if "text" in symbol_dict.keys() and category_id == symbol_dict["text"]:
+            continue
+        if "text_rotated" in symbol_dict.keys() and category_id == symbol_dict["text_rotated"]:
+            continue
+        if "text_rotated_45" in symbol_dict.keys() and category_id == symbol_dict["text_rotated_45"]:
+            continue
+        symbol_name = [sym_name for sym_name, id in symbol_dict.items() if id == object["category_id"]][0]
+        type_name = [typename_name for sym_name, typename_name in symbol_type_dict.items() if sym_name == symbol_name][0]
+        result.append((symbol_name, type_name))
+    return result
+
+def registry_lookup(objects, registry):
+    result = []
+    for object in objects:
+        category_id = object["category_id"]
+        if registry.is_text_class(category_id):
+            continue
+        symbol_name = registry.get_name(category_id)
+        result.append((symbol_name, registry.get_type(symbol_name)))
+    return result
+
+def reference_write_xml(out_dir, dt_result, dt_result_text, registry):
+    """ 기존 write_symbol_result_to_xml, write_text_result_to_xml의 출력 방식 (ElementTree 생성 후 indent, 비교용)
+
+    """
+    def append_object(root, type_text, class_text, bbox, degree):
+        symbol_node = SubElement(root, "symbol_object")
+        if type_text is not None:
+            SubElement(symbol_node, "type").text = type_text
+        SubElement(symbol_node, "class").text = class_text
+        bndbox_node = SubElement(symbol_node, "bndbox")
+        SubElement(bndbox_node, "xmin").text = str(bbox[0])
+        SubElement(bndbox_node, "ymin").text = str(bbox[1])
+        SubElement(bndbox_node, "xmax").text = str(bbox[0] + bbox[2])
+        SubElement(bndbox_node, "ymax").text = str(bbox[1] + bbox[3])
+        SubElement(symbol_node, "degree").text = str(degree)
+        SubElement(symbol_node, "flip").text = "n"
+        SubElement(symbol_node, "etc").text = ""
+
+    for filename, objects in dt_result.items():
+        root = Element("annotation")
+        for object in objects:
+            if registry.is_text_class(object["category_id"]):
+                continue
+            symbol_name = registry.get_name(object["category_id"])
+            append_object(root, registry.get_type(symbol_name), symbol_name, object["bbox"], 0)
+        indent(root)
+        ElementTree(root).write(os.path.join(out_dir, f"{filename}.xml"))
+
+    for filename, objects in dt_result_text.items():
+        root = Element("annotation")
+        for object in objects:
+            append_object(root, "text", object["string"], object["bbox"], registry.get_text_degree(object["category_id"]))
+        indent(root)
+        ElementTree(root).write(os.path.join(out_dir, f"{filename}_text.xml"))
+
+def is_same_dir(dir1, dir2):
+    files = sorted(os.listdir(dir1))
+    return files == sorted(os.listdir(dir2)) and all(filecmp.cmp(os.path.join(dir1, x), os.path.join(dir2, x), shallow=False) for x in files)
+
+if __name__ == '__main__':
+    symbol_dict, symbol_type_dict = make_synthetic_symbols()
+    dt_result = make_synthetic_result(symbol_dict)
+    objects = dt_result["synthetic_drawing"]
+
+    start = time.time()
+    registry = symbol_registry(symbol_dict, symbol_type_dict)
+    registry_result = registry_lookup(objects, registry)
+    elapsed = time.time() - start
+    print(f'* {object_num} objects, symbol_registry lookup: {elapsed:.3f} sec (registry 생성 포함)')
+
+    start = time.time()
+    reference_result = reference_lookup(objects, symbol_dict, symbol_type_dict)
+    reference_elapsed = time.time() - start
+    print(f'* {object_num} objects, reference lookup: {reference_elapsed:.3f} sec, '
+          f'identical: {registry_result == reference_result}, speedup: {reference_elapsed / elapsed:.1f}x')
+
+    dt_result = {f"synthetic_drawing_{i}": objects for i in range(drawing_num)}
+    dt_result_text = {filename: [x for x in objects if registry.is_text_class(x["category_id"])] for filename in dt_result.keys()}
+    with tempfile.TemporaryDirectory() as reference_dir, tempfile.TemporaryDirectory() as stream_dir, tempfile.TemporaryDirectory() as parallel_dir:
+        start = time.time()
+        reference_write_xml(reference_dir, dt_result, dt_result_text, registry)
+        reference_elapsed = time.time() - start
+        print(f'* {drawing_num} drawings x {object_num} objects, ElementTree + indent: {reference_elapsed:.3f} sec')
+
+        start = time.time()
+        write_symbol_result_to_xml(stream_dir, dt_result, registry)
+        write_text_result_to_xml(stream_dir, dt_result_text, registry)
+        elapsed = time.time() - start
+        print(f'* {drawing_num} drawings x {object_num} objects, streaming: {elapsed:.3f} sec, '
+              f'identical: {is_same_dir(reference_dir, stream_dir)}, speedup: {reference_elapsed / elapsed:.1f}x')
+
+        start = time.time()
+        write_result_to_xml(parallel_dir, dt_result, dt_result_text, registry, num_workers=num_workers)
+        elapsed = time.time() - start
+        print(f'* {drawing_num} drawings x {object_num} objects, streaming ({num_workers} workers, {os.cpu_count()} cpus): {elapsed:.3f} sec, '
+              f'identical: {is_same_dir(reference_dir, parallel_dir)}, speedup: {reference_elapsed / elapsed:.1f}x')
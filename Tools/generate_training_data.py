@@ -19,10 +19,7 @@ drawing_dir = base_dir + "Drawing\\JPG"
 drawing_segment_dir = "C:\\pnid\\drawing_seg\\"
 symbol_xml_dir = base_dir + "SymbolXML"
 text_xml_dir = base_dir + "TextXML"
-
-# 저장 directory 만들어 주는 부분 필요
-for train_val_test in ['train', 'val', 'test']:
-    Path(drawing_segment_dir + f'/{train_val_test}').mkdir(parents=True, exist_ok=True)
+xml_cache_dir = base_dir + "XMLCache" # xml을 npz cache로 저장하고 변경된 xml만 다시 파싱 (None이면 매번 모든 xml 파싱)
 
 val_drawings = ['26071-200-M6-052-00004', '26071-200-M6-052-00013', '26071-200-M6-052-00015', '26071-200-M6-052-00021',
                 '26071-200-M6-052-00032', '26071-200-M6-052-00036', '26071-200-M6-052-00048', '26071-200-M6-052-00074',
@@ -35,10 +32,6 @@ test_drawings = ['26071-200-M6-052-00001', '26071-200-M6-052-00002','26071-200-M
                 '26071-300-M6-053-00302', '26071-300-M6-053-00305', '26071-300-M6-053-00310', '26071-500-M6-059-00007',
                 '26071-500-M6-059-00009', '26071-500-M6-059-00014', '26071-500-M6-059-00017', '26071-500-M6-059-00022']
 ignore_drawing = []
-train_drawings = [x.split(".")[0] for x in os.listdir(symbol_xml_dir)
-                  if x.split(".")[0] not in test_drawings and
-                  x.split(".")[0] not in val_drawings and
-                  x.split(".")[0] not in ignore_drawing ]
 
 symbol_txt_path = base_dir + "Hyundai_SymbolClass_Sym_Only.txt"
 
@@ -47,32 +40,43 @@ include_text_orientation_as_class = True # 세로 문자열을 또다른 별도
 
 segment_params = [800, 800, 300, 300] # width_size, height_size, width_stride, height_stride
 drawing_resize_scale = 0.5 # predict_postprocess.py의 drawing_resize_scale와 같은 값 
-
-symbol_dict = read_symbol_txt(symbol_txt_path, include_text_as_class, include_text_orientation_as_class)
-
-train_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in train_drawings]
-val_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in val_drawings]
-test_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in test_drawings]
-
-# # Random Shuffle
-# train_ratio = 0.9
-#
-# random.Random(1).shuffle(xml_paths_without_test)
-# train_count = int(len(xml_paths_without_test)*train_ratio)
-# train_xmls = xml_paths_without_test[0:train_count]
-# val_xmls = xml_paths_without_test[train_count:]
-
-val_annotation_data = generate_segmented_data(val_xmls, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir,
-                                              symbol_dict, include_text_as_class, include_text_orientation_as_class, drawing_resize_scale, "val")
-write_coco_annotation(os.path.join(drawing_segment_dir,"val.json"), val_annotation_data, symbol_dict, segment_params)
-
-train_annotation_data = generate_segmented_data(train_xmls, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir,
-                                                symbol_dict, include_text_as_class, include_text_orientation_as_class, drawing_resize_scale, "train")
-write_coco_annotation(os.path.join(drawing_segment_dir,"train.json"), train_annotation_data, symbol_dict, segment_params)
-
-test_annotation_data = generate_segmented_data(test_xmls, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir,
-                                               symbol_dict, include_text_as_class, include_text_orientation_as_class, drawing_resize_scale, "test")
-write_coco_annotation(os.path.join(drawing_segment_dir,"test.json"), test_annotation_data, symbol_dict, segment_params)
+num_workers = 1 # 도면 분할에 사용할 process 수 (1이면 순차 처리, 결과는 동일. worker가 이 파일을 다시 import하므로 실행 코드는 __main__ 아래에 둠)
+
+if __name__ == '__main__':
+    # 저장 directory 만들어 주는 부분 필요
+    for train_val_test in ['train', 'val', 'test']:
+        Path(drawing_segment_dir + f'/{train_val_test}').mkdir(parents=True, exist_ok=True)
+
+    train_drawings = [x.split(".")[0] for x in os.listdir(symbol_xml_dir)
+                      if x.split(".")[0] not in test_drawings and
+                      x.split(".")[0] not in val_drawings and
+                      x.split(".")[0] not in ignore_drawing ]
+
+    symbol_dict = read_symbol_txt(symbol_txt_path, include_text_as_class, include_text_orientation_as_class)
+
+    train_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in train_drawings]
+    val_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in val_drawings]
+    test_xmls = [os.path.join(symbol_xml_dir, f"{x}.xml") for x in test_drawings]
+
+    # # Random Shuffle
+    # train_ratio = 0.9
+    #
+    # random.Random(1).shuffle(xml_paths_without_test)
+    # train_count = int(len(xml_paths_without_test)*train_ratio)
+    # train_xmls = xml_paths_without_test[0:train_count]
+    # val_xmls = xml_paths_without_test[train_count:]
+
+    val_annotation_data = generate_segmented_data(val_xmls, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir,
+                                                  symbol_dict, include_text_as_class, include_text_orientation_as_class, drawing_resize_scale, "val", num_workers, xml_cache_dir)
+    write_coco_annotation(os.path.join(drawing_segment_dir,"val.json"), val_annotation_data, symbol_dict, segment_params)
+
+    train_annotation_data = generate_segmented_data(train_xmls, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir,
+                                                    symbol_dict, include_text_as_class, include_text_orientation_as_class, drawing_resize_scale, "train", num_workers, xml_cache_dir)
+    write_coco_annotation(os.path.join(drawing_segment_dir,"train.json"), train_annotation_data, symbol_dict, segment_params)
+
+    test_annotation_data = generate_segmented_data(test_xmls, drawing_dir, drawing_segment_dir, segment_params, text_xml_dir,
+                                                   symbol_dict, include_text_as_class, include_text_orientation_as_class, drawing_resize_scale, "test", num_workers, xml_cache_dir)
+    write_coco_annotation(os.path.join(drawing_segment_dir,"test.json"), test_annotation_data, symbol_dict, segment_params)
 
 # val_annotation_data = generate_bigsize_data(val_xmls, drawing_dir, drawing_segment_dir, text_xml_dir,
 #                                               symbol_dict, include_text_as_class, include_text_orientation_as_class, drawing_resize_scale, "val")
@@ -1,15 +1,22 @@
 import mmcv
 import time
+import numpy as np
 import sys
 from os import path, makedirs
 from mmcv.runner import load_checkpoint
 from mmdet.apis import inference_detector
 from mmdet.models import build_detector
-from Data_Generator.generate_segmented_data import segment_image
+from Data_Generator.generate_segmented_data import read_resized_drawing, iter_segment_image, ink_density_map
 from Common.pnid_xml import write_symbol_result_to_xml, write_text_result_to_xml
 from Predict_Postprocess.text_recognition.recognize_text import get_text_detection_result, recognize_text
-from Common.symbol_io import read_symbol_txt, read_symbol_type_txt
+from Predict_Postprocess.text_recognition.ocr_engine import ocr_worker_pool, local_ocr_engine, tesseract_backend
+from Predict_Postprocess.text_recognition.ocr_cache import ocr_result_cache, cached_ocr_engine
+from Predict_Postprocess.text_recognition.mosaic_ocr import mosaic_ocr_engine
+from Common.symbol_io import symbol_registry
+from Common.drawing_cache import drawing_image_cache
 from Predict_Postprocess.gt_dt_data import non_max_suppression_fast
+from Predict_Postprocess.tile_merge import tile_merger
+from Common.detection_array import empty_detections, detections_from_mmdet_result, convert_detections_to_global, detections_to_dict_list
 
 INPUT_DIR = './input_files/'
 OUTPUT_DIR = './detection_results/'
@@ -21,6 +28,10 @@ SYM_TYPE_PATH = INPUT_DIR + 'Hyundai_SymbolClass_Type.txt'
 
 segment_params = [800, 800, 300, 300]
 drawing_resize_scale = 0.5
+device = 'cuda:0' # CPU에서 실행할 경우 'cpu'
+detection_batch_size = 4 # 한 번의 inference에 묶어서 넣을 분할 이미지 수 (1이면 분할 이미지마다 inference)
+tile_dedup_iou_threshold = None # 분할 도면 overlap으로 중복 검출된 박스를 전역 좌표 변환 시 제거할 IOU 기준 (None이면 NMS에서만 처리, 설정하면 NMS 결과와 달라질 수 있음)
+min_tile_ink_ratio = 0.00005 # ink 픽셀 비율이 이보다 작은 분할 도면(여백)은 inference 하지 않음 (None이면 모든 분할 도면 inference)
 score_threshold = 0.5
 nms_threshold = 0.0
 matching_iou_threshold = 0.5  # 매칭(정답) 처리할 IOU threshold
@@ -31,6 +42,12 @@ adaptive_thr_dict = {
 }
 
 text_img_margin_ratio = 0.1
+drawing_cache_bytes = 1 << 30 # 도면 이미지 cache 최대 크기 (분할과 text recognition에서 같은 도면을 다시 읽지 않음)
+ocr_num_workers = 4 # text recognition에 사용할 tesseract worker process 수 (1이면 현재 process에서 순차 인식)
+ocr_mosaic_mode = False # True면 텍스트 crop들을 page 이미지에 모아서 page 단위로 인식 (ocr_mosaic_lines_per_page개씩)
+ocr_mosaic_lines_per_page = 200
+ocr_cache_path = OUTPUT_DIR + 'ocr_cache.sqlite' # 같은 crop의 인식 결과를 재사용하기 위한 cache 파일 (None이면 사용하지 않음, mosaic mode에서는 crop 결과가 같은 page의 다른 crop에 따라 달라지므로 사용하지 않음)
+ocr_cache_bytes = 256 << 20
 
 def check_dir(image_path):
     if not path.isdir(INPUT_DIR):
@@ -43,9 +60,7 @@ def check_dir(image_path):
             print('Output 폴더 생성 실패')
             exit()
 
-def load_model(config: str, checkpoint: str):
-    device='cuda:0'
-
+def load_model(config: str, checkpoint: str, device: str = 'cuda:0'):
     config = mmcv.Config.fromfile(config)
     # config.model.pretrained = None
 
@@ -61,93 +76,81 @@ def load_model(config: str, checkpoint: str):
 
     return model
 
-def score_filtering(result, score_threshold):
-    filtered = []
-    for category in result:
-        filtered.append([x for x in category if x[4] >= score_threshold])
-    
-    return filtered
+def iter_batches(seg_imgs, batch_size: int):
+    ''' 분할 이미지들을 batch_size개씩 묶어서 반환하는 generator (마지막 batch는 batch_size보다 작을 수 있음)
 
-def change_obj_format(obj: list):
-    '''
-           [x_min, y_min, x_max, y_max, score] 
-        -> [x_min, y_min, width, height, score] 
     '''
-    return [obj[0], obj[1], obj[2] - obj[0], obj[3] - obj[1], obj[4]]
+    batch = []
+    for image in seg_imgs:
+        batch.append(image)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+def inked_tile_filter(ink_map, min_ink_ratio: float, skip_counter: dict):
+    ''' ink 비율이 min_ink_ratio 이상인 분할 이미지만 통과시키는 iter_segment_image의 tile_filter 반환
+        (분할 위치로 ink 비율을 먼저 계산하므로 건너뛴 분할 이미지는 crop, padding 하지 않음. 건너뛴 수는 skip_counter['skipped']에 누적)
 
-def convert_bbox_to_global(result, cur_w, cur_h, segment_params, resize_scale):
-    """ 하나의 분할 도면의 감지된 박스 좌표를 global 좌표(원본 도면 기준의 좌표)로 변환
+    '''
+    width, height, _, _ = segment_params
+    def tile_filter(start_width, start_height):
+        if ink_map.ink_ratio(start_width, start_height, width, height) < min_ink_ratio:
+            skip_counter['skipped'] += 1
+            return False
+        return True
+    return tile_filter
+
+def detect_segmented_imgs(model, seg_imgs, score_threshold: float, batch_size: int = 1, dedup_iou_threshold: float = None,
+                          skip_counter: dict = None):
+    ''' 분할 이미지들에 대해 detection을 수행하고 전역 좌표로 변환한 결과를 반환
 
     Arguments:
-        result (list): 이미지 하나의 Detection 결과
-        cur_w (int): 현재 이미지의 원본 도면 상에서의 열
-        cur_h (int): 현재 이미지의 원본 도면 상에서의 행
-        segment_params (list): 분할 파라미터
-        resize_scale (float): 분할시에 사용한 resize scaling factor
-    """
-    width, height, stride_w, stride_h = segment_params
-    global_list = []
-    
-    category_id = 0
-    # category: 클래스
-    for category in result:
-        # 감지한 오브젝트
-        for item in category:
-            item = change_obj_format(item)
-            global_bbox = []
-            global_bbox.append(int((item[0] + stride_w * cur_w) / resize_scale))
-            global_bbox.append(int((item[1] + stride_h * cur_h) / resize_scale))
-            global_bbox.append(int(item[2]/resize_scale))
-            global_bbox.append(int(item[3]/resize_scale))
-            global_bbox.append(int(item[4]))
-            global_bbox.append(category_id)
-            global_list.append(global_bbox)
-        category_id += 1
-
-    return global_list
-
-def get_dict_result(result: list):
-    ''' 도면 하나의 결과를 dictionary로 리턴
-    
+        seg_imgs (iterable): segment_image의 list 또는 iter_segment_image의 generator
+        batch_size (int): 한 번의 inference_detector 호출에 묶어서 넣을 분할 이미지 수
+        dedup_iou_threshold (float): None이 아니면 인접 분할 도면에서 중복 검출된 같은 클래스 박스 중 score가 높은 것만 남김
+        skip_counter (dict): seg_imgs를 만들 때 inked_tile_filter가 건너뛴 분할 이미지 수 ({'skipped': 건너뛴 수}, 생략한 inference 출력용)
     '''
-    result_boxes = []
-    for item in result:
-        x = item[0]
-        y = item[1]
-        width = item[2]
-        height = item[3]
-
-        obj = {
-            'bbox': [x, y, width, height],
-            'category_id': item[5],
-            'score': item[4],
-            'area': width * height,
-            'segmentation': [],
-            'iscrowd': 0,
-            'ignore': 0,
-        }
-
-        result_boxes.append(obj)
-
-    return result_boxes
-
-def detect_segmented_imgs(model, seg_imgs: list, score_threshold: float):
-    result = []
-    i = 0
-    for image in seg_imgs:
-        cur_w = image['w']
-        cur_h = image['h']
-        img = image['img']
-        #* 1. 분할된 도면 하나에 대해 inference 수행
-        res = inference_detector(model, img)
-        #* 2. score filtering
-        filtered_res = score_filtering(res, score_threshold)
-        #* 3. 전역 좌표로 변환
-        global_res = convert_bbox_to_global(filtered_res, cur_w, cur_h, segment_params, drawing_resize_scale)
-        #* 4. dictionary로 포맷 변환
-        dict_res = get_dict_result(global_res)
-        #* 5. 결과에 추가
-        result.extend(dict_res)
+    width, height, stride_w, stride_h = segment_params
+    merger = tile_merger(dedup_iou_threshold) if dedup_iou_threshold is not None else None
+    global_tile_dets = []
+
+    inferred_num = 0
+    inference_time = 0
+    for batch in iter_batches(seg_imgs, batch_size):
+        #* 1. 분할 도면 batch에 대해 inference 수행 (batch_size가 1이면 기존과 동일하게 한장씩)
+        inference_start = time.time()
+        if batch_size == 1:
+            batch_res = [inference_detector(model, batch[0]['img'])]
+        else:
+            batch_res = inference_detector(model, [image['img'] for image in batch])
+        inference_time += time.time() - inference_start
+        inferred_num += len(batch)
+
+        for image, res in zip(batch, batch_res):
+            #* 2. score filtering 후 분할 도면 위치와 함께 detection array로 저장
+            dets = detections_from_mmdet_result(res, image['h'], image['w'], score_threshold)
+            #* 3. 전역 좌표로 변환 (분할 도면의 박스를 한 번에 변환), 중복 박스 제거
+            global_dets = convert_detections_to_global(dets, stride_w, stride_h, drawing_resize_scale)
+            if merger is not None:
+                merger.insert(global_dets)
+            else:
+                global_tile_dets.append(global_dets)
+
+    if merger is not None:
+        global_dets = merger.get_detections()
+        print(f'* 분할 도면 중복 박스 {merger.duplicate_num}개 제거')
+    else:
+        global_dets = np.concatenate([empty_detections()] + global_tile_dets)
+
+    if skip_counter is not None and skip_counter['skipped'] > 0:
+        saved_time = inference_time / inferred_num * skip_counter['skipped'] if inferred_num > 0 else 0
+        print(f'* 여백 분할 도면 {skip_counter["skipped"]}개 inference 생략 '
+              f'({inferred_num}개 inference, 절약 시간 약 {saved_time:.2f}초)')
+
+    #* 4. dictionary로 포맷 변환
+    result = detections_to_dict_list(global_dets, coco_annotation_fields=True)
 
     dt_results = {}
 
@@ -183,20 +186,28 @@ if __name__=='__main__':
 
     check_dir(image_path)
 
-    #! 1. 이미지 분할
-    seg_imgs = segment_image(image_path, segment_params, drawing_resize_scale)
+    #! 1. 도면 읽기 (분할 이미지는 detection 과정에서 하나씩 생성되므로 분할 시간은 detection 소요 시간에 포함됨)
+    drawing_cache = drawing_image_cache(drawing_cache_bytes)
+    drawing_img = read_resized_drawing(image_path, drawing_resize_scale, drawing_cache)
+    skip_counter = {'skipped': 0}
+    if min_tile_ink_ratio is not None:
+        tile_filter = inked_tile_filter(ink_density_map(drawing_img), min_tile_ink_ratio, skip_counter)
+    else:
+        tile_filter = None
+    seg_imgs = iter_segment_image(drawing_img, segment_params, tile_filter)
     seg_elapsed = time.time()
-    print(f'* 이미지 분할 소요 시간: {seg_elapsed - start}')
+    print(f'* 도면 읽기 및 ink map 생성 소요 시간: {seg_elapsed - start}')
 
     #! 2. 학습한 모델 로드
-    model = load_model(CONFIG, CHECKPOINT)
+    model = load_model(CONFIG, CHECKPOINT, device)
     load_elapsed = time.time()
     print(f'* 모델 Load 소요 시간: {load_elapsed - seg_elapsed}')
 
     #! 3. Detection 수행
-    results = detect_segmented_imgs(model, seg_imgs, score_threshold)
+    results = detect_segmented_imgs(model, seg_imgs, score_threshold, detection_batch_size, tile_dedup_iou_threshold,
+                                    skip_counter)
     detect_elapsed = time.time()
-    print(f'* Detection 소요 시간: {detect_elapsed - load_elapsed}')
+    print(f'* 이미지 분할 및 Detection 소요 시간: {detect_elapsed - load_elapsed}')
 
     #! 4. NMS 수행
     nms_results = get_dt_result_nms(results, matching_iou_threshold)
@@ -204,20 +215,37 @@ if __name__=='__main__':
     print(f'* NMS 소요 시간: {nms_elapsed - detect_elapsed}')
 
     #! 5. Symbol / Type 종류 dictionary로 열기
-    symbol_dict = read_symbol_txt(SYM_PATH, include_text_as_class=True, include_text_orientation_as_class=False)
-    symbol_type_dict = read_symbol_type_txt(SYM_TYPE_PATH)
+    symbol_dict = symbol_registry.from_txt(SYM_PATH, include_text_as_class=True, include_text_orientation_as_class=False,
+                                           symbol_type_txt_path=SYM_TYPE_PATH)
 
     #! 6. Text recognition 수행
     dt_result_after_nms_text_only = get_text_detection_result(nms_results, symbol_dict)
-    dt_result_text = recognize_text(image_path, dt_result_after_nms_text_only, text_img_margin_ratio,
-                                               symbol_dict)
+    if ocr_num_workers > 1:
+        ocr_engine = ocr_worker_pool(tesseract_backend, num_workers=ocr_num_workers)
+    else:
+        ocr_engine = local_ocr_engine(tesseract_backend)
+    use_ocr_cache = ocr_cache_path is not None and not ocr_mosaic_mode
+    with ocr_engine:
+        if ocr_mosaic_mode:
+            text_ocr_engine = mosaic_ocr_engine(ocr_engine, max_lines_per_page=ocr_mosaic_lines_per_page)
+        else:
+            text_ocr_engine = ocr_engine
+        if use_ocr_cache:
+            ocr_cache = ocr_result_cache(ocr_cache_path, ocr_cache_bytes)
+            ocr_config_key = tesseract_backend.config_key()
+            text_ocr_engine = cached_ocr_engine(text_ocr_engine, ocr_cache, ocr_config_key)
+        dt_result_text = recognize_text(image_path, dt_result_after_nms_text_only, text_img_margin_ratio,
+                                        symbol_dict, text_ocr_engine, drawing_cache)
     print() #* Progress bar 개행 문제 때문에 추가
+    if use_ocr_cache:
+        print(f'* {ocr_cache.stats_str()}')
+        ocr_cache.close()
 
     text_recognition_elapsed = time.time()
     print(f'* Text recognition 소요 시간: {text_recognition_elapsed - nms_elapsed}')
 
     #! 7. 결과 XML 출력
-    write_symbol_result_to_xml(OUTPUT_DIR, nms_results, symbol_dict, symbol_type_dict)
+    write_symbol_result_to_xml(OUTPUT_DIR, nms_results, symbol_dict)
     write_text_result_to_xml(OUTPUT_DIR, dt_result_text, symbol_dict)
 
     print(f'* 총 소요 시간: {time.time() - start}')
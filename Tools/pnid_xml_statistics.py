@@ -2,7 +2,8 @@ import os
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
-from Common.pnid_xml import text_xml_reader, symbol_xml_reader
+from Common.pnid_xml import read_text_xml, read_symbol_xml
+from Common.xml_cache import read_xmls_with_cache
 from Visualize.image_drawing import draw_bbox_from_bbox_list
 
 # XML 데이터 검증을 위한 가시화 코드
@@ -10,23 +11,20 @@ from Visualize.image_drawing import draw_bbox_from_bbox_list
 xml_dir = "D:/Test_Models/PNID/HyundaiEng/210518_Data/Symbol_XML"
 drawing_img_dir = "D:/Test_Models/PNID/HyundaiEng/210518_Data/Drawing/JPG"
 is_text_xml = False
+xml_cache_path = "D:/Test_Models/PNID/HyundaiEng/210518_Data/XMLCache/" + ("text_xml.npz" if is_text_xml else "symbol_xml.npz") # None이면 매번 모든 xml 파싱
 
 xml_filenames = os.listdir(xml_dir)
 
 entire_objects = []
 
-for xml_filename in xml_filenames:
+xml_paths = [os.path.join(xml_dir, xml_filename.split(".")[0] + ".xml") for xml_filename in xml_filenames]
+if xml_cache_path is not None:
+    xml_infos = read_xmls_with_cache(xml_paths, xml_cache_path, is_text_xml)
+else:
+    xml_infos = (read_text_xml(xml_path) if is_text_xml == True else read_symbol_xml(xml_path) for xml_path in xml_paths)
+
+for xml_filename, (filename, width, height, depth, object_list) in zip(xml_filenames, xml_infos):
     print(xml_filename)
-    name_only = xml_filename.split(".")[0]
-    xml_path = os.path.join(xml_dir, name_only + ".xml")
-    drawing_path = os.path.join(drawing_img_dir, name_only + ".jpg")
-
-    if is_text_xml == True:
-        text_xml_reader_obj = text_xml_reader(xml_path)
-        filename, width, height, depth, object_list = text_xml_reader_obj.getInfo()
-    else:
-        symbol_xml_reader_obj = symbol_xml_reader(xml_path)
-        filename, width, height, depth, object_list = symbol_xml_reader_obj.getInfo()
 
     bbox = [[x[0], x[1], x[2], x[3]-x[1], x[4]-x[2]] for x in object_list]
     entire_objects.extend(bbox)
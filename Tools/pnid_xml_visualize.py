@@ -1,6 +1,6 @@
 import os
 import cv2
-from Common.pnid_xml import text_xml_reader, symbol_xml_reader
+from Common.pnid_xml import read_text_xml, read_symbol_xml
 from Visualize.image_drawing import draw_bbox_from_bbox_list
 
 # XML 데이터 검증을 위한 가시화 코드
@@ -19,11 +19,9 @@ for xml_filename in xml_filenames:
     drawing_path = os.path.join(drawing_img_dir, name_only + ".jpg")
 
     if is_text_xml == True:
-        text_xml_reader_obj = text_xml_reader(xml_path)
-        filename, width, height, depth, object_list = text_xml_reader_obj.getInfo()
+        filename, width, height, depth, object_list = read_text_xml(xml_path)
     else:
-        symbol_xml_reader_obj = symbol_xml_reader(xml_path)
-        filename, width, height, depth, object_list = symbol_xml_reader_obj.getInfo()
+        filename, width, height, depth, object_list = read_symbol_xml(xml_path)
 
     img = cv2.imread(drawing_path)
 
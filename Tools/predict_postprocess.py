@@ -8,6 +8,7 @@ from pathlib import Path
 import shutil
 import datetime
 import time
+import sys
 
 # Test 결과의 성능 계산 및 이미지 출력 코드
 
@@ -57,8 +58,15 @@ adaptive_thr_dict = {
     239: 0.3, 12: 0.0002, 499: 0.2
 }
 
+threshold_sweep_mode = False # True이면 아래 threshold 후보들의 모든 조합에 대한 precision/recall 표(threshold_sweep_result.txt)만 출력하고 종료
+sweep_score_thresholds = [0.3, 0.4, 0.5, 0.6, 0.7]
+sweep_nms_thresholds = [0.0, 0.1, 0.3]
+sweep_matching_iou_thresholds = [0.5, 0.75]
+sweep_adaptive_thr_dicts = {"none": None, "default": adaptive_thr_dict} # 후보 이름: adaptive_thr_dict
+
 vertical_threshold = 2 # 세로 문자열로 판단하는 기준. 세로가 가로보다 vertical_threshold 배 이상 길면 세로로 판단
 text_img_margin_ratio = 0.1  # detection된 문자열에서 크기를 약간 키워서 text recognition을 수행할 경우. (ex, 0.1이면 box를 1.1배 키워서 인식)
+write_ap_json = False # True이면 AP 계산에 사용한 gt, dt를 coco json 파일(test_gt_global.json, test_dt_global.json)로도 출력
 
 # 0) 출력 파일이 저장될 디렉터리가 없다면 자동으로 생성, 사용한 parameter 확인을 위해 이 python script 같이 저장
 Path(output_dir).mkdir(parents=True, exist_ok=True)
@@ -82,6 +90,13 @@ symbol_type_dict = read_symbol_type_txt(symbol_type_filepath)
 # 2) evaluate 클래스 초기화 및 매칭 정보 생성
 #   : NMS 완료된 dt result와 gt result간의 매칭 dictionary 생성
 eval = evaluate(output_dir)
+if threshold_sweep_mode == True:
+    # json, xml은 위에서 한 번만 읽고, 모든 threshold 조합의 성능을 한 번에 계산
+    sweep_result = eval.sweep_thresholds(gt_dt_result, sweep_score_thresholds, sweep_nms_thresholds, sweep_matching_iou_thresholds,
+                                         sweep_adaptive_thr_dicts)
+    eval.dump_sweep_result(sweep_result)
+    sys.exit(0)
+
 gt_to_dt_match_dict, dt_to_gt_match_dict = eval.compare_gt_and_dt(gt_dt_result.gt_result,
                                                                   gt_dt_result.dt_result_after_nms,
                                                                   matching_iou_threshold)
@@ -89,11 +104,12 @@ gt_to_dt_match_dict, dt_to_gt_match_dict = eval.compare_gt_and_dt(gt_dt_result.g
 # 3) precision-recall 성능 및 AP 성능 계산 및 Dump
 #   : 위에서 얻은 정보들을 바탕으로 성능 계산(주의! AP 계산에는 NMS 하기 전의 결과가 전달되어야 함 (gt_dt_result.dt_result))
 pr_result = eval.calculate_pr(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict)
-ap_result_str = eval.calculate_ap(gt_dt_result.gt_result_json, gt_dt_result.dt_result)
+ap_stats, ap_result_str = eval.calculate_ap_stats(gt_dt_result.gt_result_json, gt_dt_result.dt_result, write_json=write_ap_json,
+                                                  filename_to_image_id=gt_dt_result.filename_to_image_id)
 recog_result = eval.calculate_recognition(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict)
 # recog_result_rotated = eval.calculate_recognition(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, 500)
 # recog_results = [recog_result, recog_result_rotated]
-eval.dump_pr_and_ap_result(pr_result, ap_result_str, recog_result, gt_dt_result.symbol_dict, score_type=score_type)
+eval.dump_pr_and_ap_result(pr_result, ap_result_str, recog_result, gt_dt_result.symbol_dict, score_type=score_type, ap_stats=ap_stats)
 eval.dump_match_recognition_result(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, recog_result, gt_dt_result.symbol_dict, score_type=score_type)
 eval.dump_match_recognition_result(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, recog_result, gt_dt_result.symbol_dict, recognized_only=True, score_type=score_type)
 # eval.label_cropped_image(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, gt_dt_result.symbol_dict, drawing_dir)
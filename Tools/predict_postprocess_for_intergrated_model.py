@@ -28,6 +28,7 @@ drawing_resize_scale = 0.5 # 학습 도면 분할시에 사용한 scaling factor
 score_threshold = 0.5  # score filtering threshold
 nms_threshold = 0.0
 matching_iou_threshold = 0.5  # 매칭(정답) 처리할 IOU threshold
+write_ap_json = False # True이면 AP 계산에 사용한 gt, dt를 coco json 파일(test_gt_global.json, test_dt_global.json)로도 출력
 adaptive_thr_dict = {
     311: 0.02, 66: 0.06, 145: 0.4,
     131: 0.65, 431: 0.04, 109: 0.03,
@@ -61,16 +62,17 @@ gt_to_dt_match_dict, dt_to_gt_match_dict = eval.compare_gt_and_dt(gt_dt_result.g
 # 3) precision-recall 성능 및 AP 성능 계산 및 Dump
 #   : 위에서 얻은 정보들을 바탕으로 성능 계산(주의! AP 계산에는 NMS 하기 전의 결과가 전달되어야 함 (gt_dt_result.dt_result))
 pr_result = eval.calculate_pr(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict)
-ap_result_str = eval.calculate_ap(gt_dt_result.gt_result_json, gt_dt_result.dt_result)
+ap_stats, ap_result_str = eval.calculate_ap_stats(gt_dt_result.gt_result_json, gt_dt_result.dt_result, write_json=write_ap_json,
+                                                  filename_to_image_id=gt_dt_result.filename_to_image_id)
 
 recog_result = eval.calculate_recognition(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict)
 
 score_type = 'gt'
-eval.dump_pr_and_ap_result(pr_result, ap_result_str, recog_result, gt_dt_result.symbol_dict, score_type=score_type)
+eval.dump_pr_and_ap_result(pr_result, ap_result_str, recog_result, gt_dt_result.symbol_dict, score_type=score_type, ap_stats=ap_stats)
 eval.dump_match_recognition_result(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, recog_result, gt_dt_result.symbol_dict, score_type=score_type)
 eval.dump_match_recognition_result(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, recog_result, gt_dt_result.symbol_dict, recognized_only=True, score_type=score_type)
 
 score_type = 'tp'
-eval.dump_pr_and_ap_result(pr_result, ap_result_str, recog_result, gt_dt_result.symbol_dict, score_type=score_type)
+eval.dump_pr_and_ap_result(pr_result, ap_result_str, recog_result, gt_dt_result.symbol_dict, score_type=score_type, ap_stats=ap_stats)
 eval.dump_match_recognition_result(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, recog_result, gt_dt_result.symbol_dict, score_type=score_type)
 eval.dump_match_recognition_result(gt_dt_result.gt_result, gt_dt_result.dt_result_after_nms, gt_to_dt_match_dict, recog_result, gt_dt_result.symbol_dict, recognized_only=True, score_type=score_type)
\ No newline at end of file
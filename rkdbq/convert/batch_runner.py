@@ -0,0 +1,50 @@
+import time, traceback
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+def _run_job(job, convert_func):
+    """ 파일 하나를 변환하고 (job, 출력한 object 수, error 문자열 또는 None) 반환 (예외가 나도 다른 파일의 변환은 계속됨)
+
+    """
+    try:
+        return job, convert_func(*job), None
+    except Exception:
+        return job, 0, traceback.format_exc()
+
+def run_batch(convert_func, jobs: list, num_workers: int = 1, chunk_size: int = 16, desc: str = 'Converting'):
+    """ 파일 단위 변환 함수를 여러 파일에 대해 실행하고 처리 속도를 출력
+
+        num_workers > 1이면 process pool에서 chunk_size개씩 묶어서 나누어 실행함.
+        convert_func는 process 간에 전달할 수 있도록 모듈 최상위에 정의된 함수(또는 그 partial)여야 함
+
+    Arguments:
+        convert_func: job의 인자들을 받아 파일 하나를 변환하고 출력한 object 수를 반환하는 함수
+        jobs: convert_func의 인자 tuple list
+        num_workers: 변환할 process 수 (1이면 순차 처리)
+        chunk_size: process에 한 번에 전달할 job 수
+        desc: 출력할 작업 이름
+    Return:
+        result: {file_num, object_num, failed: [(실패한 job, error 문자열)], elapsed, files_per_sec, objects_per_sec}
+    """
+    start = time.time()
+    run_func = partial(_run_job, convert_func=convert_func)
+    if num_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            job_results = list(executor.map(run_func, jobs, chunksize=chunk_size))
+    else:
+        job_results = list(map(run_func, jobs))
+    elapsed = time.time() - start
+
+    result = {}
+    result['file_num'] = len(jobs)
+    result['object_num'] = sum(object_num for _, object_num, _ in job_results)
+    result['failed'] = [(job, error) for job, _, error in job_results if error is not None]
+    result['elapsed'] = elapsed
+    result['files_per_sec'] = len(jobs) / elapsed if elapsed > 0 else 0
+    result['objects_per_sec'] = result['object_num'] / elapsed if elapsed > 0 else 0
+
+    for job, error in result['failed']:
+        print(f'Error converting {job}:\n{error}')
+    print(f"{desc}: {result['file_num'] - len(result['failed'])} / {result['file_num']} files, {result['object_num']} objects in {elapsed:.2f} sec "
+          f"({result['files_per_sec']:.1f} files/sec, {result['objects_per_sec']:.1f} objects/sec, {num_workers} workers)")
+    return result
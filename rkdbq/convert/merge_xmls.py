@@ -1,6 +1,8 @@
-import os, math
+import os
 import xml.etree.ElementTree as ET
 from pathlib import Path
+from functools import partial
+from rkdbq.convert.batch_runner import run_batch
 
 def txt2dict(txt_path: str, split_word: str = '|'):
         """ txt 파일을 딕셔너리로 파싱
@@ -15,65 +17,6 @@ def txt2dict(txt_path: str, split_word: str = '|'):
             result[cls] = num
         return result
 
-def rotate(point: tuple, degree: float, pivot: tuple):
-        """ pivot을 기준으로 degree만큼 point를 회전
-        
-        """
-        rad = math.radians(degree)
-        cos_theta = math.cos(rad)
-        sin_theta = math.sin(rad)
-        x, y = point
-        piv_x, piv_y = pivot
-
-        rotated = {}
-        rotated['x'] = cos_theta * (x - piv_x) - sin_theta * (y - piv_y) + piv_x
-        rotated['y'] = sin_theta * (x - piv_x) + cos_theta * (y - piv_y) + piv_y
-
-        return (rotated['x'], rotated['y'])
-
-def two2four(bbox: dict):
-        """ 2점 좌표 형식을 4점 좌표 형식으로 변환
-        
-        """
-        result = {}
-        bbox_two = {}
-        bbox_four = {}
-
-        for key, value in bbox.items():
-            result[key] = value
-        for coord, value in bbox['bndbox'].items():
-            bbox_two[coord] = float(value)
-
-        mid = {}
-        mid['x'] = (bbox_two['xmin'] + bbox_two['xmax']) / 2
-        mid['y'] = (bbox_two['ymin'] + bbox_two['ymax']) / 2
-        
-        point = (bbox_two['xmin'], bbox_two['ymin'])
-        degree = float(bbox['degree'])
-        pivot = (mid['x'], mid['y'])
-        x, y = rotate(point, degree, pivot)
-        bbox_four['x1'] = str(x)
-        bbox_four['y1'] = str(y)   
-
-        point = (bbox_two['xmin'], bbox_two['ymax'])
-        x, y = rotate(point, degree, pivot)
-        bbox_four['x2'] = str(x)
-        bbox_four['y2'] = str(y)
-
-        point = (bbox_two['xmax'], bbox_two['ymax'])
-        x, y = rotate(point, degree, pivot)
-        bbox_four['x3'] = str(x)
-        bbox_four['y3'] = str(y)
-
-        point = (bbox_two['xmax'], bbox_two['ymin'])
-        x, y = rotate(point, degree, pivot)
-        bbox_four['x4'] = str(x)
-        bbox_four['y4'] = str(y)
-
-        result['bndbox'] = bbox_four
-
-        return result
-
 def xml2dict(element):
         """ xml 파일을 딕셔너리로 파싱
         
@@ -107,64 +50,49 @@ def dict2xml(element, dictionary):
         else:
             sub_element.text = str(value)
 
-def merge_xml(from_xmls_path: str, to_xmls_path: str, type_dict_path: str):
-    types = txt2dict(type_dict_path)
-
-    from_xmls = {}
-    from_xmls['symbol'] = {}
-    from_xmls['text'] = {}
-
-    to_xmls = {}
-
-    xml_path = {}
-    xml_path['symbol'] = os.path.join(from_xmls_path, 'SymbolXML')
-    xml_path['text'] = os.path.join(from_xmls_path, 'TextXML')
-
-    for root, dirs, files in os.walk(xml_path['symbol']):
-        for filename in files:
-            if filename.endswith('.xml'):
-                file_path = os.path.join(root, filename)
-                tree = ET.parse(file_path)
-                root_element = tree.getroot()
-                diagram = filename.split('.')[0]
-                from_xmls['symbol'][diagram] = xml2dict(root_element)
-
-    for root, dirs, files in os.walk(xml_path['text']):
-        for filename in files:
-            if filename.endswith('.xml'):
-                file_path = os.path.join(root, filename)
-                tree = ET.parse(file_path)
-                root_element = tree.getroot()
-                diagram = filename.split('.')[0]
-                from_xmls['text'][diagram] = xml2dict(root_element)
-
-    for diagram, from_xml in from_xmls['symbol'].items():
-        to_xmls[diagram] = {
-             'filename': f"{diagram}.jpg",
-             'size': from_xml['size'],
-             'symbol_objects': [],
+def merge_diagram_xml(symbol_xml_path: str, text_xml_path: str, to_xml_path: str, types: dict):
+    """ 도면 하나의 심볼 xml과 텍스트 xml을 하나의 xml로 병합
+
+    Arguments:
+        symbol_xml_path: 심볼 xml 파일 경로 (None이면 오류)
+        text_xml_path: 텍스트 xml 파일 경로 (None이면 심볼만 출력)
+        to_xml_path: 출력 xml 파일 경로
+        types: 클래스 이름을 key로, 타입을 value로 갖는 딕셔너리
+    Return:
+        출력한 object 수
+    """
+    if symbol_xml_path is None:
+        raise FileNotFoundError(f'symbol xml of {text_xml_path} does not exist')
+
+    diagram = os.path.basename(symbol_xml_path).split('.')[0]
+    from_xml = xml2dict(ET.parse(symbol_xml_path).getroot())
+    to_xml = {
+         'filename': f"{diagram}.jpg",
+         'size': from_xml['size'],
+         'symbol_objects': [],
+    }
+    for from_symbol in from_xml['object']:
+        bndbox = from_symbol['bndbox']
+        cls = from_symbol['name']
+        to_symbol = {
+            'type': types[cls] if cls in types else 'unspecified_symbol',
+            'class': cls,
+            'bndbox': {
+                'xmin': bndbox['xmin'],
+                'ymin': bndbox['ymin'],
+                'xmax': bndbox['xmax'],
+                'ymax': bndbox['ymax'],
+            },
+            'degree': '0.0',
+            'flip': 'n',
         }
-        for from_symbol in from_xml['object']:
-            bndbox = from_symbol['bndbox']
-            cls = from_symbol['name']
-            to_symbol = {
-                'type': types[cls] if cls in types else 'unspecified_symbol',
-                'class': cls,
-                'bndbox': {
-                    'xmin': bndbox['xmin'],
-                    'ymin': bndbox['ymin'],
-                    'xmax': bndbox['xmax'],
-                    'ymax': bndbox['ymax'],
-                },
-                'degree': '0.0',
-                'flip': 'n',
-            }
-            to_xmls[diagram]['symbol_objects'].append(to_symbol)
+        to_xml['symbol_objects'].append(to_symbol)
 
-    for diagram, from_xml in from_xmls['text'].items():
-         for from_text in from_xml['symbol_object']:
-              bndbox = from_text['bndbox']
-              to_text = {
+    if text_xml_path is not None:
+        from_xml = xml2dict(ET.parse(text_xml_path).getroot())
+        for from_text in from_xml['symbol_object']:
+            bndbox = from_text['bndbox']
+            to_text = {
                 'type': 'text',
                 'class': from_text['class'],
                 'bndbox': {
@@ -175,21 +103,53 @@ def merge_xml(from_xmls_path: str, to_xmls_path: str, type_dict_path: str):
                 },
                 'degree': from_text['degree'],
                 'flip': from_text['flip'],
-              }
-              to_xmls[diagram]['symbol_objects'].append(to_text)
+            }
+            to_xml['symbol_objects'].append(to_text)
+
+    root = ET.Element('annotation')
+    dict2xml(root, to_xml)
+    tree = ET.ElementTree(root)
+    tree.write(to_xml_path)
+    return len(to_xml['symbol_objects'])
+
+def find_xmls(xml_dir_path: str):
+    """ 폴더 안의 xml 파일 경로를 도면 이름(확장자 제외)을 key로 하는 딕셔너리로 반환
+
+    """
+    result = {}
+    for root, dirs, files in os.walk(xml_dir_path):
+        for filename in files:
+            if filename.endswith('.xml'):
+                result[filename.split('.')[0]] = os.path.join(root, filename)
+    return result
+
+def merge_xml(from_xmls_path: str, to_xmls_path: str, type_dict_path: str, num_workers: int = 1, chunk_size: int = 16):
+    """ 도면별 심볼 xml(SymbolXML 폴더)과 텍스트 xml(TextXML 폴더)을 병합하여 to_xmls_path에 출력
+
+    Arguments:
+        num_workers: 도면을 나누어 변환할 process 수 (1이면 순차 처리)
+        chunk_size: process에 한 번에 전달할 도면 수
+    Return:
+        run_batch의 결과 (파일 수, object 수, 실패한 파일, 처리 속도)
+    """
+    types = txt2dict(type_dict_path)
+
+    xml_paths = {}
+    xml_paths['symbol'] = find_xmls(os.path.join(from_xmls_path, 'SymbolXML'))
+    xml_paths['text'] = find_xmls(os.path.join(from_xmls_path, 'TextXML'))
+
+    jobs = []
+    for diagram in list(xml_paths['symbol'].keys()) + [diagram for diagram in xml_paths['text'].keys() if diagram not in xml_paths['symbol']]:
+        jobs.append((xml_paths['symbol'].get(diagram), xml_paths['text'].get(diagram), os.path.join(to_xmls_path, f"{diagram}.xml")))
 
-    for diagram, to_xml in to_xmls.items():
-         root = ET.Element('annotation')
-         dict2xml(root, to_xmls[diagram])
-         to_xml_path = os.path.join(to_xmls_path, f"{diagram}.xml")
-         tree = ET.ElementTree(root)
-         tree.write(to_xml_path)
-    return
+    return run_batch(partial(merge_diagram_xml, types=types), jobs, num_workers=num_workers, chunk_size=chunk_size, desc='Merging XMLs')
 
 
-from_xmls_path = "D:\\Data\\PNID_RAW_not_title"
-to_xmls_path = "D:\\Data\\xml2eval\\GT_xmls_not_title"
-symbol_dict_path = "D:\\Data\\PNID_RAW\\Hyundai_SymbolClass_Type.txt"
+if __name__ == '__main__':
+    from_xmls_path = "D:\\Data\\PNID_RAW_not_title"
+    to_xmls_path = "D:\\Data\\xml2eval\\GT_xmls_not_title"
+    symbol_dict_path = "D:\\Data\\PNID_RAW\\Hyundai_SymbolClass_Type.txt"
+    num_workers = os.cpu_count() # 변환할 process 수 (1이면 순차 처리)
 
-Path(to_xmls_path).mkdir(parents=True, exist_ok=True)
-merge_xml(from_xmls_path, to_xmls_path, symbol_dict_path)
\ No newline at end of file
+    Path(to_xmls_path).mkdir(parents=True, exist_ok=True)
+    merge_xml(from_xmls_path, to_xmls_path, symbol_dict_path, num_workers=num_workers)
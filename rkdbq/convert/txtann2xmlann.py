@@ -20,6 +20,8 @@ import xml.etree.ElementTree as ET
 import numpy as np
 import math
 import os
+from functools import partial
+from rkdbq.convert.batch_runner import run_batch
 
 
 def create_class_type_map(file_path):
@@ -151,22 +153,10 @@ def create_xml(class_type_map, fourPoint, objects_list, output_file_path):
     return output_file_path
 
 
-#4점 텍스트 파일이 들어있는 폴더 선택
-txt_folder = 'D:\\Experiments\\Detections\\per_diagram_txt_annfiles\\roi_trans\\results_not_title'
-#class_type 매핑 텍스트 파일 선택
-class_file = "D:\\Data\\raw\\PNID_RAW\\Hyundai_SymbolClass_Type.txt"
-class_type_map = create_class_type_map(class_file)
-print(class_type_map)
-# 결과 xml을 저장할 폴더 경로
-output_folder = 'D:\\Data\\xml2eval\\DT_xmls_not_title'
-if not os.path.exists(output_folder):
-    os.mkdir(output_folder)
-
-# 폴더 내의 모든 txt 파일에 대해 처리
-for txt_file in os.listdir(txt_folder):
-    if not txt_file.endswith('.txt'):
-        continue
-    txt_file_path = os.path.join(txt_folder, txt_file)
+def convert_txt_file(txt_file_path, output_file_path, class_type_map):
+    """ 4점 텍스트 파일 하나를 2점 + 각도 xml로 변환하고, 출력한 object 수를 반환
+
+    """
     fourPoint = read_four_point_txt(txt_file_path)
     
     #4점 텍스트 파일에서 클래스 지우고, str -> float으로 변경
@@ -187,11 +177,32 @@ for txt_file in os.listdir(txt_folder):
             'angle': angle,
         })
     
-    
-    output_file_path = os.path.join(output_folder, txt_file)
-    output_file_path = output_file_path.replace(".txt", ".xml")
-    output_filename = create_xml(class_type_map, fourPoint, objects_list, output_file_path)
-    print(output_filename)
-
-    
-    
\ No newline at end of file
+    create_xml(class_type_map, fourPoint, objects_list, output_file_path)
+    return len(objects_list)
+
+
+if __name__ == '__main__':
+    #4점 텍스트 파일이 들어있는 폴더 선택
+    txt_folder = 'D:\\Experiments\\Detections\\per_diagram_txt_annfiles\\roi_trans\\results_not_title'
+    #class_type 매핑 텍스트 파일 선택
+    class_file = "D:\\Data\\raw\\PNID_RAW\\Hyundai_SymbolClass_Type.txt"
+    class_type_map = create_class_type_map(class_file)
+    print(class_type_map)
+    # 결과 xml을 저장할 폴더 경로
+    output_folder = 'D:\\Data\\xml2eval\\DT_xmls_not_title'
+    if not os.path.exists(output_folder):
+        os.mkdir(output_folder)
+    # 변환할 process 수 (1이면 순차 처리)
+    num_workers = os.cpu_count()
+
+    # 폴더 내의 모든 txt 파일에 대해 처리
+    jobs = []
+    for txt_file in os.listdir(txt_folder):
+        if not txt_file.endswith('.txt'):
+            continue
+        txt_file_path = os.path.join(txt_folder, txt_file)
+        output_file_path = os.path.join(output_folder, txt_file)
+        output_file_path = output_file_path.replace(".txt", ".xml")
+        jobs.append((txt_file_path, output_file_path))
+
+    run_batch(partial(convert_txt_file, class_type_map=class_type_map), jobs, num_workers=num_workers, desc='Converting txt to xml')
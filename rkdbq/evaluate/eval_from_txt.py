@@ -1,8 +1,8 @@
 import os, cv2
 import numpy as np
-from shapely import Polygon
 from pathlib import Path
 from tqdm import tqdm
+from rkdbq.geometry.box_overlap import points_to_polygons, overlap_matrix
 
 class evaluate_from_txt():
     def __init__(self, gt_txts_path: str, dt_txts_path: str, symbol_txt_path: str, iou_thr: float = 0.8):
@@ -83,23 +83,6 @@ class evaluate_from_txt():
         coords = coords.tolist()
         return coords
 
-    def __cal_iou(self, gt_points: list, dt_points: list):
-        """ IoU 계산 (바운딩 박스가 회전되어 있으므로 shapely.Polygon 사용)
-
-        """
-        coords = self.__list2points(gt_points)
-        gt_rect = Polygon(coords)
-
-        coords = self.__list2points(dt_points)
-        dt_rect = Polygon(coords)
-
-        iou = 0
-        if gt_rect.intersects(dt_rect):
-            intersection = gt_rect.intersection(dt_rect).area
-            union = gt_rect.union(dt_rect).area
-            iou = intersection / union
-        return iou
-
     def __evaluate(self, gt_dict: dict, dt_dict: dict, symbol_dict: dict):
         """ Precision, Recall 계산에 필요한 TP, DT, GT 카운팅
         
@@ -134,11 +117,12 @@ class evaluate_from_txt():
             tp = {}
             dt = {}
             gt = {}
-            for gt_item in gt_dict[diagram]:
-                gt_bbox = gt_item[0]
+            gt_polys = points_to_polygons([item[0] for item in gt_dict[diagram]])
+            dt_polys = points_to_polygons([item[0] for item in dt_dict[diagram]])
+            for gt_pos, gt_item in enumerate(gt_dict[diagram]):
                 gt_cls = gt_item[1]
-                for dt_item in dt_dict[diagram]:
-                    dt_bbox = dt_item[0]
+                iou_row = None # gt 하나와 모든 dt 간의 IoU (처음 필요할 때 한 번에 계산)
+                for dt_pos, dt_item in enumerate(dt_dict[diagram]):
                     dt_cls = dt_item[1]
                     if gt_cls == dt_cls:
                         cls = gt_cls
@@ -146,7 +130,9 @@ class evaluate_from_txt():
                             continue
                         if cls not in tp:
                             tp[cls] = 0
-                        iou = self.__cal_iou(gt_bbox, dt_bbox)
+                        if iou_row is None:
+                            iou_row = overlap_matrix(gt_polys[gt_pos:gt_pos + 1], dt_polys, mode='iou')[0]
+                        iou = iou_row[dt_pos]
                         if iou > self.__iou_thr:
                             tp[cls] += 1
             for dt_item in dt_dict[diagram]:
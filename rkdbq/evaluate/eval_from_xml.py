@@ -1,9 +1,126 @@
-import os, cv2, math, sys
+import os, cv2, sys
 import xml.etree.ElementTree as ET
 import numpy as np
-from shapely import Polygon
 from pathlib import Path
 from tqdm import tqdm
+from collections import Counter
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from rkdbq.geometry.box_overlap import overlap_matrix
+from rkdbq.geometry.xml_reader import iterparse_xml2dict
+from rkdbq.geometry.rotated_box import two2four, read_two_point_boxes, read_four_point_boxes
+
+def _freeze(value):
+    """ 딕셔너리, 리스트를 hash 가능한 tuple로 변환 (내용이 같은 박스 딕셔너리를 찾기 위해 사용)
+
+    """
+    if type(value) is dict:
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if type(value) is list:
+        return tuple(_freeze(item) for item in value)
+    if type(value) is np.ndarray:
+        return tuple(value.ravel().tolist())
+    return value
+
+def _first_index(items: list):
+    """ 각 item과 내용이 같은 첫 item의 index 리스트 (기존 list.index(item)와 같음)
+
+    """
+    first = {}
+    return [first.setdefault(_freeze(item), pos) for pos, item in enumerate(items)]
+
+def _bndbox_points(items: list):
+    """ 박스들의 4점 좌표 bndbox를 정수로 반올림한 (N, 4, 2) 배열
+
+    """
+    coords = [item['bndbox'] for item in items]
+    return np.round(np.array(coords, dtype=np.float64).reshape(-1, 4, 2))
+
+def _class_buckets(items: list, symbol_dict: dict):
+    """ 박스들을 매칭될 수 있는 그룹(type이 같고, text가 아니면 class도 같음)별 index 리스트로 분류 (symbol_dict에 없는 클래스는 제외)
+
+    Return:
+        {(type, class 또는 None): (클래스 이름, index 리스트)}
+    """
+    buckets = {}
+    for pos, item in enumerate(items):
+        cls = item['class'] if item['type'] != 'text' else 'text'
+        if cls not in symbol_dict:
+            continue
+        key = (item['type'], None) if item['type'] == 'text' else (item['type'], item['class'])
+        buckets.setdefault(key, (cls, []))[1].append(pos)
+    return buckets
+
+def _cell_ranges(polys: np.ndarray, cell_size: int):
+    """ 박스마다 envelope가 걸치는 격자 cell의 (x 시작, x 끝, y 시작, y 끝) 범위
+
+    """
+    mins = np.floor(polys.min(axis=1) / cell_size).astype(np.int64)
+    maxs = np.floor(polys.max(axis=1) / cell_size).astype(np.int64)
+    return np.stack([mins[:, 0], maxs[:, 0], mins[:, 1], maxs[:, 1]], axis=1).tolist()
+
+def _evaluate_diagram(gt_items: list, dt_items: list, symbol_dict: dict, iou_thr: float, cell_size: int = 512):
+    """ 도면 하나의 클래스별 TP, DT, GT 카운팅
+
+        gt 순서대로, 같은 그룹의 아직 매칭되지 않은 dt 중 IoU > iou_thr인 첫 dt와 매칭함 (기존 gt x dt 전체 비교와 같은 결과).
+        IoU > iou_thr >= 0 이려면 박스가 겹쳐야 하므로, 그룹별로 dt를 격자 cell에 등록하고 gt와 같은 cell에 있는 dt와만 IoU를 계산함
+
+    Arguments:
+        cell_size: 격자 cell 크기 (pixel)
+
+    Returns:
+        tp, dt, gt: 클래스 이름을 key로 갖는 Counter
+    """
+    tp = Counter()
+    dt = Counter(cls for cls, positions in _class_buckets(dt_items, symbol_dict).values() for _ in positions)
+    gt = Counter(cls for cls, positions in _class_buckets(gt_items, symbol_dict).values() for _ in positions)
+
+    # 내용이 같은 박스는 기존 구현(list.index)과 같이 첫 박스의 매칭 여부를 공유
+    gt_first = _first_index(gt_items)
+    dt_first = _first_index(dt_items)
+    gt_matched = [False]*gt_items.__len__()
+    dt_matched = [False]*dt_items.__len__()
+    gt_polys = _bndbox_points(gt_items)
+    dt_polys = _bndbox_points(dt_items)
+
+    dt_buckets = _class_buckets(dt_items, symbol_dict)
+    for key, (cls, gt_positions) in _class_buckets(gt_items, symbol_dict).items():
+        if key not in dt_buckets:
+            continue
+        dt_positions = dt_buckets[key][1]
+
+        grid = None
+        if iou_thr >= 0:
+            grid = {}
+            for dt_pos, (x_start, x_end, y_start, y_end) in zip(dt_positions, _cell_ranges(dt_polys[dt_positions], cell_size)):
+                for cell_x in range(x_start, x_end + 1):
+                    for cell_y in range(y_start, y_end + 1):
+                        grid.setdefault((cell_x, cell_y), []).append(dt_pos)
+
+        gt_ranges = _cell_ranges(gt_polys[gt_positions], cell_size)
+        for gt_pos, (x_start, x_end, y_start, y_end) in zip(gt_positions, gt_ranges):
+            if gt_matched[gt_first[gt_pos]]:
+                continue
+            if grid is None: # threshold가 음수이면 겹치지 않는 박스도 매칭될 수 있으므로 모든 dt가 후보
+                candidates = dt_positions
+            else:
+                candidates = set()
+                for cell_x in range(x_start, x_end + 1):
+                    for cell_y in range(y_start, y_end + 1):
+                        candidates.update(grid.get((cell_x, cell_y), []))
+                candidates = sorted(candidates)
+            candidates = [dt_pos for dt_pos in candidates if not dt_matched[dt_first[dt_pos]]]
+            if len(candidates) == 0:
+                continue
+
+            iou_row = overlap_matrix(gt_polys[gt_pos:gt_pos + 1], dt_polys[candidates], mode='iou')[0]
+            for dt_pos, iou in zip(candidates, iou_row.tolist()):
+                if iou > iou_thr:
+                    tp[cls] += 1
+                    gt_matched[gt_first[gt_pos]] = True
+                    dt_matched[dt_first[dt_pos]] = True
+                    break
+    return tp, dt, gt
 
 class evaluate_from_xml():
     """ Precision 및 Recall을 측정한다.
@@ -15,8 +132,11 @@ class evaluate_from_xml():
         large_symbol_txt_path: 큰 심볼 클래스 딕셔너리 텍스트 파일 경로 (e.g. 1|vertical_drum)
         iou_thr: TP 기준 threshold
         symbol_type: 측정할 심볼 클래스 ('total', 'small' 또는 'large')
+        num_workers: 도면을 나누어 평가할 process 수 (1이면 순차 처리)
+        cell_size: 같은 클래스의 박스들을 나누는 격자 cell 크기 (pixel, 같은 cell에 있는 박스끼리만 IoU 계산)
     """
-    def __init__(self, gt_xmls_path: str, dt_xmls_path: str, symbol_txt_path: str, large_symbol_txt_path: str, iou_thr: float = 0.8, symbol_type: str = 'total'):
+    def __init__(self, gt_xmls_path: str, dt_xmls_path: str, symbol_txt_path: str, large_symbol_txt_path: str, iou_thr: float = 0.8, symbol_type: str = 'total',
+                 num_workers: int = 1, cell_size: int = 512):
         self.__xmls_path = {}
         self.__xmls_path['gt'] = gt_xmls_path
         self.__xmls_path['dt'] = dt_xmls_path
@@ -24,6 +144,8 @@ class evaluate_from_xml():
         self.__symbol_txt_path['total'] = symbol_txt_path
         self.__symbol_txt_path['large'] = large_symbol_txt_path
         self.__iou_thr = iou_thr
+        self.__num_workers = num_workers
+        self.__cell_size = cell_size
         self.__TWO_POINTS_FORMAT = 22
         self.__FOUR_POINTS_FORMAT = 44
 
@@ -39,7 +161,7 @@ class evaluate_from_xml():
 
         self.symbol_dict = self.symbol_dict[self.symbol_type]
 
-        self.precision, self.recall = self.__evaluate(self.gt_dict, self.dt_dict, self.symbol_dict)
+        self.precision, self.recall, self.class_counts = self.__evaluate(self.gt_dict, self.dt_dict, self.symbol_dict)
 
     def __diff_dict(self, remain: dict, remove: dict):
         """ remain 딕셔너리 중 remove 딕셔너리와 중복되는 키를 가지는 쌍을 삭제
@@ -64,95 +186,6 @@ class evaluate_from_xml():
             result[cls] = num
         return result
     
-    def __dict2points(self, points: dict):
-        """ 점 딕셔너리를 리스트로 변환
-        
-        """
-        coords = [round(float(points['x1'])), round(float(points['y1'])), round(float(points['x2'])), round(float(points['y2'])), 
-                  round(float(points['x3'])), round(float(points['y3'])), round(float(points['x4'])), round(float(points['y4'])),]
-        coords = np.array([int(i) for i in coords])
-        coords = coords.reshape(4,2)
-        coords = coords.tolist()
-        return coords
-    
-    def __rotate(self, point: tuple, degree: float, pivot: tuple):
-        """ pivot을 기준으로 degree만큼 point를 회전
-        
-        """
-        rad = math.radians(degree)
-        cos_theta = math.cos(rad)
-        sin_theta = math.sin(rad)
-        x, y = point
-        piv_x, piv_y = pivot
-
-        rotated = {}
-        rotated['x'] = cos_theta * (x - piv_x) - sin_theta * (y - piv_y) + piv_x
-        rotated['y'] = sin_theta * (x - piv_x) + cos_theta * (y - piv_y) + piv_y
-
-        return (rotated['x'], rotated['y'])
-    
-    def __two2four(self, bbox: dict):
-        """ 2점 좌표 형식을 4점 좌표 형식으로 변환
-        
-        """
-        result = {}
-        bbox_two = {}
-        bbox_four = {}
-
-        for key, value in bbox.items():
-            result[key] = value
-        for coord, value in bbox['bndbox'].items():
-            bbox_two[coord] = float(value)
-
-        mid = {}
-        mid['x'] = (bbox_two['xmin'] + bbox_two['xmax']) / 2
-        mid['y'] = (bbox_two['ymin'] + bbox_two['ymax']) / 2
-        
-        point = (bbox_two['xmin'], bbox_two['ymin'])
-        degree = float(bbox['degree'])
-        pivot = (mid['x'], mid['y'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x1'] = str(x)
-        bbox_four['y1'] = str(y)   
-
-        point = (bbox_two['xmin'], bbox_two['ymax'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x2'] = str(x)
-        bbox_four['y2'] = str(y)
-
-        point = (bbox_two['xmax'], bbox_two['ymax'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x3'] = str(x)
-        bbox_four['y3'] = str(y)
-
-        point = (bbox_two['xmax'], bbox_two['ymin'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x4'] = str(x)
-        bbox_four['y4'] = str(y)
-
-        result['bndbox'] = bbox_four
-
-        return result
-    
-    def __xml2dict(self, element):
-        """ xml 파일을 딕셔너리로 파싱
-        
-        """
-        result = {}
-        for child in element:
-            child_data = self.__xml2dict(child)
-            if child_data:
-                if child.tag in result:
-                    if type(result[child.tag]) is list:
-                        result[child.tag].append(child_data)
-                    else:
-                        result[child.tag] = [result[child.tag], child_data]
-                else:
-                    result[child.tag] = child_data
-            else:
-                result[child.tag] = child.text
-        return result
-
     def __xmls2dict(self, xml_dir_path: str, mode: int):
         """ xml 파일들을 딕셔너리로 파싱
         
@@ -163,36 +196,19 @@ class evaluate_from_xml():
                 if filename.endswith('.xml'):
                     file_path = os.path.join(root, filename)
                     try:
-                        tree = ET.parse(file_path)
-                        root_element = tree.getroot()
                         diagram = filename[0:22]
-                        result[diagram] = self.__xml2dict(root_element)['symbol_object']
+                        result[diagram] = iterparse_xml2dict(file_path)['symbol_object']
+                        # bndbox는 도면 단위로 한 번에 변환한 4점 좌표 (4, 2) 배열로 저장
                         if mode == self.__TWO_POINTS_FORMAT:
-                            four_bboxs = []
-                            for bbox in result[diagram]:
-                                four_bboxs.append(self.__two2four(bbox))
-                            result[diagram] = four_bboxs
+                            polys = two2four(*read_two_point_boxes(result[diagram]))
+                        else:
+                            polys = read_four_point_boxes(result[diagram])
+                        for bbox, poly in zip(result[diagram], polys):
+                            bbox['bndbox'] = poly
                     except ET.ParseError as e:
                         print(f'Error parsing {file_path}: {e}')
         return result
 
-    def __cal_iou(self, gt_points: dict, dt_points: dict):
-        """ IoU 계산 (바운딩 박스가 회전되어 있으므로 shapely.Polygon 사용)
-
-        """
-        coords = self.__dict2points(gt_points)
-        gt_rect = Polygon(coords)
-
-        coords = self.__dict2points(dt_points)
-        dt_rect = Polygon(coords)
-
-        iou = 0
-        if gt_rect.intersects(dt_rect):
-            intersection = gt_rect.intersection(dt_rect).area
-            union = gt_rect.union(dt_rect).area
-            iou = intersection / union
-        return iou
-
     def __evaluate(self, gt_dict: dict, dt_dict: dict, symbol_dict: dict):
         """ Precision, Recall 계산에 필요한 TP, DT, GT 카운팅
         
@@ -204,11 +220,26 @@ class evaluate_from_xml():
         Returns:
             precision: {도면 이름: {클래스 이름: {tp, dt}}, ..., total: {tp, dt}}}}
             recall: {도면 이름: {클래스 이름: {tp, gt}}, ..., total: {tp, gt}}}} 
+            class_counts: {tp, dt, gt: 전체 도면의 클래스별 개수 Counter}
         
         """
         precision = {}
         recall = {}
-        for diagram in tqdm(gt_dict.keys(), f"Evaluation"):
+        class_counts = {'tp': Counter(), 'dt': Counter(), 'gt': Counter()}
+
+        # 도면별 TP, DT, GT 카운팅 (num_workers > 1이면 process pool에서 도면을 나누어 계산)
+        diagrams = [diagram for diagram in gt_dict.keys() if diagram in dt_dict]
+        evaluate_func = partial(_evaluate_diagram, symbol_dict=symbol_dict, iou_thr=self.__iou_thr, cell_size=self.__cell_size)
+        gt_items_list = [gt_dict[diagram] for diagram in diagrams]
+        dt_items_list = [dt_dict[diagram] for diagram in diagrams]
+        if self.__num_workers > 1 and len(diagrams) > 1:
+            with ProcessPoolExecutor(max_workers=self.__num_workers) as executor:
+                counts = list(tqdm(executor.map(evaluate_func, gt_items_list, dt_items_list), f"Evaluation", total=len(diagrams)))
+        else:
+            counts = list(map(evaluate_func, tqdm(gt_items_list, f"Evaluation"), dt_items_list))
+        counts = dict(zip(diagrams, counts))
+
+        for diagram in gt_dict.keys():
             precision[diagram] = {}
             precision[diagram]['total'] = {}
             precision[diagram]['total']['tp'] = 0
@@ -220,47 +251,11 @@ class evaluate_from_xml():
             if diagram not in dt_dict: 
                 print(f'{diagram} is skipped. (NOT exist in detection xmls path)\n')
                 continue
-            
-            # Counting tp, dt, gt for each classes
-            tp = {}
-            dt = {}
-            gt = {}
 
-            gt_matched = [False]*gt_dict[diagram].__len__()
-            dt_matched = [False]*dt_dict[diagram].__len__()
-            for gt_item in gt_dict[diagram]:
-                for dt_item in dt_dict[diagram]:
-                    gt_idx = gt_dict[diagram].index(gt_item)
-                    dt_idx = dt_dict[diagram].index(dt_item)
-                    if gt_matched[gt_idx] or dt_matched[dt_idx]:
-                        continue
-                    if gt_item['type'] == dt_item['type']:
-                        if gt_item['type'] == 'text' or gt_item['class'] == dt_item['class']:
-                            cls = gt_item['class'] if gt_item['type'] != 'text' else 'text'
-                            if cls not in symbol_dict:
-                                continue
-                            if cls not in tp:
-                                tp[cls] = 0
-                            iou = self.__cal_iou(gt_item['bndbox'], dt_item['bndbox'])
-                            if iou > self.__iou_thr:
-                                tp[cls] += 1
-                                gt_matched[gt_idx] = True
-                                dt_matched[dt_idx] = True
-                                
-            for dt_item in dt_dict[diagram]:
-                cls = dt_item['class'] if dt_item['type'] != 'text' else 'text'
-                if cls not in symbol_dict:
-                    continue
-                if cls not in dt:
-                    dt[cls] = 0
-                dt[cls] += 1
-            for gt_item in gt_dict[diagram]:
-                cls = gt_item['class'] if gt_item['type'] != 'text' else 'text'
-                if cls not in symbol_dict:
-                    continue
-                if cls not in gt:
-                    gt[cls] = 0
-                gt[cls] += 1
+            tp, dt, gt = counts[diagram]
+            class_counts['tp'].update(tp)
+            class_counts['dt'].update(dt)
+            class_counts['gt'].update(gt)
 
             # Mapping precision
             for cls, cnt in tp.items():
@@ -298,7 +293,7 @@ class evaluate_from_xml():
                 if 'tp' not in recall[diagram][cls]: 
                     recall[diagram][cls]['tp'] = 0
                 
-        return precision, recall
+        return precision, recall, class_counts
 
     def dump(self, dump_path: str):
         """ Precision, Recall을 계산하여 txt 파일로 출력
@@ -384,7 +379,7 @@ class evaluate_from_xml():
             vis_img = cv2.imread(gt_img_path)
             for dt_item in dt_dict[diagram]:
                 dt_bbox = dt_item['bndbox']
-                dt_points = self.__dict2points(dt_bbox)
+                dt_points = np.round(dt_bbox).astype(int).tolist()
                 dt_type = dt_item['type']
                 if dt_type == type or type == 'total':
                     for num in range(4):
@@ -403,7 +398,7 @@ class evaluate_from_xml():
             vis_img = cv2.imread(gt_img_path)
             for gt_item in gt_dict[diagram]:
                 gt_bbox = gt_item['bndbox']
-                gt_points = self.__dict2points(gt_bbox)
+                gt_points = np.round(gt_bbox).astype(int).tolist()
                 gt_type = gt_item['type']
                 if gt_type == type or type == 'total':
                     for num in range(4):
@@ -422,7 +417,7 @@ class evaluate_from_xml():
             vis_img = cv2.imread(gt_img_path)
             for dt_item in dt_dict[diagram]:
                 dt_bbox = dt_item['bndbox']
-                dt_points = self.__dict2points(dt_bbox)
+                dt_points = np.round(dt_bbox).astype(int).tolist()
                 dt_type = dt_item['type']
                 if dt_type == type or type == 'total':
                     for num in range(4):
@@ -430,7 +425,7 @@ class evaluate_from_xml():
             
             for gt_item in gt_dict[diagram]:
                 gt_bbox = gt_item['bndbox']
-                gt_points = self.__dict2points(gt_bbox)
+                gt_points = np.round(gt_bbox).astype(int).tolist()
                 gt_type = gt_item['type']
                 if gt_type == type or type == 'total':
                     for num in range(4):
@@ -442,7 +437,7 @@ class evaluate_from_xml():
 # pipeline
 if __name__=='__main__':
     if len(sys.argv) != 4:
-        print("Usage: python eval_from_xml.py {GT xml 폴더 경로} {DT xml 폴더 경로} {출력 파일 경로}")
+        print("Usage: python -m rkdbq.evaluate.eval_from_xml {GT xml 폴더 경로} {DT xml 폴더 경로} {출력 파일 경로}")
         exit()
 
     symbol_txt_path = 'D:\Data\SymbolClass_Class.txt'
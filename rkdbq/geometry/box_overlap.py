@@ -0,0 +1,125 @@
+import numpy as np
+import shapely
+
+def points_to_polygons(points_list: list):
+    """ 4점 좌표 list들을 (N, 4, 2) 배열로 변환 (기존 __list2points, __dict2points와 같이 정수로 버림)
+
+    Arguments:
+        points_list: [x1, y1, x2, y2, x3, y3, x4, y4] (숫자 또는 문자열) list의 list
+    """
+    coords = [[int(float(point)) for point in points] for points in points_list]
+    return np.array(coords, dtype=np.float64).reshape(-1, 4, 2)
+
+def is_axis_aligned(polys: np.ndarray):
+    """ 각 박스가 축에 평행한 직사각형인지 (변이 가로, 세로로 번갈아 나오는지) 판단. 0, 90, 180, 270도 박스가 해당됨
+
+    Arguments:
+        polys: (N, 4, 2) 박스 꼭짓점 배열
+    Return:
+        (N,) bool 배열
+    """
+    edges = np.roll(polys, -1, axis=1) - polys
+    horizontal = edges[:, :, 1] == 0
+    vertical = edges[:, :, 0] == 0
+    even_horizontal = horizontal[:, 0::2].all(axis=1) & vertical[:, 1::2].all(axis=1)
+    even_vertical = vertical[:, 0::2].all(axis=1) & horizontal[:, 1::2].all(axis=1)
+    return even_horizontal | even_vertical
+
+def overlap_matrix(polys_a: np.ndarray, polys_b: np.ndarray, mode: str = 'iou'):
+    """ 두 박스 배열의 모든 쌍에 대한 IoU 또는 IoF 행렬 계산
+
+        축에 평행한 박스끼리는 numpy로 한 번에 계산하고, 회전된 박스가 포함된 쌍은 envelope가 겹치는 쌍만 shapely로 계산함.
+        결과는 shapely.Polygon으로 쌍마다 계산한 기존 결과(__cal_iou, __cal_iof)와 같음
+
+    Arguments:
+        polys_a: (Na, 4, 2) 박스 꼭짓점 배열
+        polys_b: (Nb, 4, 2) 박스 꼭짓점 배열
+        mode: 'iou' (교집합 / 합집합) 또는 'iof' (교집합 / b 박스 넓이)
+    Return:
+        (Na, Nb) 배열
+    """
+    result = np.zeros((polys_a.shape[0], polys_b.shape[0]))
+    if polys_a.shape[0] == 0 or polys_b.shape[0] == 0:
+        return result
+
+    min_a, max_a = polys_a.min(axis=1), polys_a.max(axis=1)
+    min_b, max_b = polys_b.min(axis=1), polys_b.max(axis=1)
+
+    # 축에 평행한 박스는 envelope가 박스 자체이므로 교집합 = envelope끼리의 교집합
+    inter_w = np.maximum(0, np.minimum(max_a[:, None, 0], max_b[None, :, 0]) - np.maximum(min_a[:, None, 0], min_b[None, :, 0]))
+    inter_h = np.maximum(0, np.minimum(max_a[:, None, 1], max_b[None, :, 1]) - np.maximum(min_a[:, None, 1], min_b[None, :, 1]))
+    intersection = inter_w * inter_h
+    area_a = np.prod(max_a - min_a, axis=1)
+    area_b = np.prod(max_b - min_b, axis=1)
+    denominator = area_a[:, None] + area_b[None, :] - intersection if mode == 'iou' else np.broadcast_to(area_b[None, :], intersection.shape)
+    np.divide(intersection, denominator, out=result, where=denominator > 0)
+
+    aligned_a = is_axis_aligned(polys_a)
+    aligned_b = is_axis_aligned(polys_b)
+    if aligned_a.all() and aligned_b.all():
+        return result
+
+    # 회전된 박스가 포함된 쌍 중 envelope가 겹치는 쌍만 polygon으로 계산 (envelope가 겹치지 않으면 0)
+    rotated_pair = ~(aligned_a[:, None] & aligned_b[None, :])
+    envelope_overlap = ((max_a[:, None, 0] >= min_b[None, :, 0]) & (max_b[None, :, 0] >= min_a[:, None, 0]) &
+                        (max_a[:, None, 1] >= min_b[None, :, 1]) & (max_b[None, :, 1] >= min_a[:, None, 1]))
+    result[rotated_pair] = 0
+    rows, cols = np.nonzero(rotated_pair & envelope_overlap)
+    if rows.shape[0] == 0:
+        return result
+
+    result[rows, cols] = _polygon_overlap(polys_a[rows], polys_b[cols], mode)
+    return result
+
+def pairwise_overlap(polys_a: np.ndarray, polys_b: np.ndarray, mode: str = 'iou'):
+    """ polys_a[k]와 polys_b[k] 쌍마다의 IoU 또는 IoF 계산 (overlap_matrix의 대각 성분과 같음)
+
+    Arguments:
+        polys_a, polys_b: (K, 4, 2) 박스 꼭짓점 배열
+        mode: 'iou' 또는 'iof' (교집합 / b 박스 넓이)
+    Return:
+        (K,) 배열
+    """
+    result = np.zeros(polys_a.shape[0])
+    if polys_a.shape[0] == 0:
+        return result
+
+    min_a, max_a = polys_a.min(axis=1), polys_a.max(axis=1)
+    min_b, max_b = polys_b.min(axis=1), polys_b.max(axis=1)
+
+    inter_wh = np.maximum(0, np.minimum(max_a, max_b) - np.maximum(min_a, min_b))
+    intersection = inter_wh[:, 0] * inter_wh[:, 1]
+    area_a = np.prod(max_a - min_a, axis=1)
+    area_b = np.prod(max_b - min_b, axis=1)
+    denominator = area_a + area_b - intersection if mode == 'iou' else area_b
+    np.divide(intersection, denominator, out=result, where=denominator > 0)
+
+    rotated = ~(is_axis_aligned(polys_a) & is_axis_aligned(polys_b))
+    envelope_overlap = (max_a >= min_b).all(axis=1) & (max_b >= min_a).all(axis=1)
+    result[rotated] = 0
+    index = np.nonzero(rotated & envelope_overlap)[0]
+    if index.shape[0] == 0:
+        return result
+
+    result[index] = _polygon_overlap(polys_a[index], polys_b[index], mode)
+    return result
+
+def _polygon_overlap(polys_a: np.ndarray, polys_b: np.ndarray, mode: str):
+    """ 쌍마다 shapely polygon으로 IoU 또는 IoF 계산 (기존 __cal_iou, __cal_iof와 같은 계산, 겹치지 않으면 0)
+
+    """
+    rects_a = shapely.polygons(polys_a)
+    rects_b = shapely.polygons(polys_b)
+    result = np.zeros(polys_a.shape[0])
+    intersects = shapely.intersects(rects_a, rects_b)
+    rects_a, rects_b = rects_a[intersects], rects_b[intersects]
+
+    intersection = shapely.area(shapely.intersection(rects_a, rects_b))
+    if mode == 'iou':
+        denominator = shapely.area(shapely.union(rects_a, rects_b))
+    else:
+        denominator = shapely.area(rects_b)
+    pair_result = np.zeros(intersection.shape[0])
+    np.divide(intersection, denominator, out=pair_result, where=denominator > 0)
+    result[intersects] = pair_result
+    return result
@@ -0,0 +1,78 @@
+import numpy as np
+
+# 4점 박스 꼭짓점 순서: (xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)를 박스 중심 기준으로 회전한 점
+TWO_POINTS_KEYS = ['xmin', 'ymin', 'xmax', 'ymax']
+FOUR_POINTS_KEYS = ['x1', 'y1', 'x2', 'y2', 'x3', 'y3', 'x4', 'y4']
+
+def rotate_points(points: np.ndarray, degrees: np.ndarray, pivots: np.ndarray):
+    """ 박스마다 pivot을 기준으로 degree만큼 점들을 회전 (도면 전체를 한 번에 계산)
+
+    Arguments:
+        points: (N, K, 2) 박스별 점 배열
+        degrees: (N,) 박스별 회전 각도
+        pivots: (N, 2) 박스별 회전 중심
+    Return:
+        (N, K, 2) 회전된 점 배열
+    """
+    rad = np.radians(degrees)[:, None]
+    cos_theta = np.cos(rad)
+    sin_theta = np.sin(rad)
+    dx = points[:, :, 0] - pivots[:, None, 0]
+    dy = points[:, :, 1] - pivots[:, None, 1]
+
+    rotated = np.empty(points.shape)
+    rotated[:, :, 0] = cos_theta * dx - sin_theta * dy + pivots[:, None, 0]
+    rotated[:, :, 1] = sin_theta * dx + cos_theta * dy + pivots[:, None, 1]
+    return rotated
+
+def two2four(boxes: np.ndarray, degrees: np.ndarray):
+    """ 2점 좌표 + 각도 형식을 4점 좌표 형식으로 변환
+
+    Arguments:
+        boxes: (N, 4) [xmin, ymin, xmax, ymax] 배열
+        degrees: (N,) 박스 중심 기준 회전 각도
+    Return:
+        (N, 4, 2) 꼭짓점 배열
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    corners = boxes[:, [[0, 1], [2, 1], [2, 3], [0, 3]]]
+    pivots = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+    return rotate_points(corners, np.asarray(degrees, dtype=np.float64), pivots)
+
+def four2two(polys: np.ndarray, degrees: np.ndarray):
+    """ 4점 좌표 형식을 2점 좌표 형식으로 변환 (1, 3번째 꼭짓점을 박스 중심 기준으로 -degree만큼 회전)
+
+    Arguments:
+        polys: (N, 4, 2) 꼭짓점 배열
+        degrees: (N,) 박스 회전 각도
+    Return:
+        (N, 4) [xmin, ymin, xmax, ymax] 배열
+    """
+    polys = np.asarray(polys, dtype=np.float64).reshape(-1, 4, 2)
+    corners = polys[:, [0, 2]]
+    pivots = (corners[:, 0] + corners[:, 1]) / 2
+    return rotate_points(corners, -np.asarray(degrees, dtype=np.float64), pivots).reshape(-1, 4)
+
+def read_two_point_boxes(objects: list):
+    """ xml에서 파싱한 object 딕셔너리들의 2점 좌표 bndbox와 degree를 배열로 변환 (degree가 없으면 0)
+
+    Return:
+        boxes: (N, 4) [xmin, ymin, xmax, ymax] 배열
+        degrees: (N,) 각도 배열
+    """
+    boxes = np.array([[float(obj['bndbox'][key]) for key in TWO_POINTS_KEYS] for obj in objects], dtype=np.float64).reshape(-1, 4)
+    degrees = np.array([float(obj.get('degree') or 0) for obj in objects], dtype=np.float64)
+    return boxes, degrees
+
+def read_four_point_boxes(objects: list):
+    """ xml에서 파싱한 object 딕셔너리들의 4점 좌표 bndbox를 (N, 4, 2) 배열로 변환
+
+    """
+    coords = [[float(obj['bndbox'][key]) for key in FOUR_POINTS_KEYS] for obj in objects]
+    return np.array(coords, dtype=np.float64).reshape(-1, 4, 2)
+
+def to_bndbox_dict(box: list, keys: list = TWO_POINTS_KEYS):
+    """ xml 출력용 bndbox 딕셔너리 (좌표를 반올림한 정수 문자열로 변환, xml 출력 시에만 사용)
+
+    """
+    return {key: str(round(value)) for key, value in zip(keys, box)}
@@ -0,0 +1,51 @@
+import xml.etree.ElementTree as ET
+
+def xml2dict(element):
+    """ xml element를 딕셔너리로 파싱 (같은 tag의 자식이 여러 개면 list로 모음)
+
+    """
+    result = {}
+    for child in element:
+        child_data = xml2dict(child)
+        if child_data:
+            if child.tag in result:
+                if type(result[child.tag]) is list:
+                    result[child.tag].append(child_data)
+                else:
+                    result[child.tag] = [result[child.tag], child_data]
+            else:
+                result[child.tag] = child_data
+        else:
+            result[child.tag] = child.text
+    return result
+
+def iterparse_xml2dict(file_path: str, object_tag: str = 'symbol_object'):
+    """ xml 파일을 iterparse로 읽으면서 root의 자식 element를 하나씩 딕셔너리로 파싱
+        (object_tag element들은 항상 list로 모으고, 파싱이 끝난 element는 바로 삭제하므로 파일 크기와 관계없이 메모리 사용량이 일정함)
+
+    Arguments:
+        file_path: xml 파일 경로
+        object_tag: list로 모을 object element의 tag
+    Return:
+        result: {object_tag: [object 딕셔너리], 그 외 root 자식 tag: 값}
+    """
+    result = {object_tag: []}
+    depth = 0
+    root_element = None
+    for event, element in ET.iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            if root_element is None:
+                root_element = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+        child_data = xml2dict(element)
+        if element.tag == object_tag:
+            result[object_tag].append(child_data)
+        else:
+            result[element.tag] = child_data if child_data else element.text
+        root_element.clear()
+    return result
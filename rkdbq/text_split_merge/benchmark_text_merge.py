@@ -0,0 +1,101 @@
+import time
+import numpy as np
+from shapely import Polygon
+from rkdbq.text_split_merge.text_merge_from_xml import text_merge
+
+# 저장소 최상위 폴더에서 python -m rkdbq.text_split_merge.benchmark_text_merge 로 실행
+# 합성 도면(텍스트 조각 5천개 이상)에 대해 기존 텍스트 병합(모든 박스 쌍 비교 후 처음부터 다시 반복)과
+# STRtree로 겹치는 박스만 비교하는 병합(text_merge.merge_annotations)의 속도 및 결과 비교 코드
+
+fragment_nums = [1000, 5000, 20000] # 합성 도면 하나의 텍스트 조각 수
+reference_max_fragment_num = 1000 # 기존 구현은 O(n^2)이므로 이 수 이하의 도면에서만 비교
+drawing_size = (9933, 7016) # 도면 해상도 (width, height)
+symbol_ratio = 0.2 # text가 아닌 박스 비율
+iof_thr = 0.3
+y_diff_thr = 5
+y_diff_iof_thr = 0.1
+
+def make_bbox(type, cls, xmin, ymin, xmax, ymax, degree):
+    coords = [xmin, ymin, xmax, ymin, xmax, ymax, xmin, ymax]
+    return (type, cls) + tuple(str(float(coord)) for coord in coords) + ('n', degree, 'n')
+
+def make_synthetic_drawing(fragment_num, seed=0):
+    """ 문자열 하나가 겹치는 조각 여러 개로 나누어 검출된 도면의 텍스트 박스들을 흉내낸 박스 tuple list 생성
+
+    """
+    rng = np.random.default_rng(seed)
+    annset = []
+    while len(annset) < fragment_num:
+        if rng.random() < symbol_ratio:
+            x, y = rng.integers(0, drawing_size[0] - 100), rng.integers(0, drawing_size[1] - 100)
+            annset.append(make_bbox('symbol', f'valve_{rng.integers(0, 20)}', x, y, x + rng.integers(20, 100), y + rng.integers(20, 100), '0'))
+            continue
+
+        # 조각 2~4개로 나뉜 문자열 (조각끼리 x 방향으로 조금씩 겹침)
+        piece_num = int(rng.integers(2, 5))
+        x, y = int(rng.integers(0, drawing_size[0] - 600)), int(rng.integers(0, drawing_size[1] - 60))
+        height = int(rng.integers(20, 40))
+        degree = '0' if rng.random() < 0.8 else '90'
+        chars = "".join(rng.choice(list("ABCDEFGH0123456789-"), piece_num * 3 + 2))
+        for piece in range(piece_num):
+            width = int(rng.integers(60, 120))
+            y_jitter = int(rng.integers(-2, 3))
+            annset.append(make_bbox('text', chars[piece * 3:piece * 3 + 5], x, y + y_jitter, x + width, y + y_jitter + height, degree))
+            x += width - int(rng.integers(5, 30))
+    order = rng.permutation(len(annset))
+    return [annset[i] for i in order]
+
+def reference_iof(remain_bbox, remove_bbox):
+    """ 기존 __cal_iof (shapely Polygon으로 쌍마다 계산)
+
+    """
+    remain_rect = Polygon(np.array([int(float(point)) for point in remain_bbox[2:10]]).reshape(4, 2).tolist())
+    remove_rect = Polygon(np.array([int(float(point)) for point in remove_bbox[2:10]]).reshape(4, 2).tolist())
+    iof = 0
+    if remain_rect.intersects(remove_rect):
+        iof = remain_rect.intersection(remove_rect).area / remove_rect.area
+    return iof
+
+def reference_merge(merge, annset):
+    """ 기존 구현 (모든 박스 쌍 비교, 병합이 있으면 처음부터 다시 비교). 비교를 위해 박스 순서만 merge_annotations와 같게 유지
+
+    """
+    is_mergeable = merge._text_merge__is_mergeable
+    get_merged_bbox = merge._text_merge__get_merged_bbox
+
+    ann = list(dict.fromkeys(annset))
+    while True:
+        result = list(ann)
+        merged_flag = [False]*len(ann)
+        merged_cnt = 0
+        for remain_index, remain_bbox in enumerate(ann):
+            for remove_index, remove_bbox in enumerate(ann):
+                if merged_flag[remain_index] or merged_flag[remove_index] or remain_index == remove_index:
+                    continue
+                if is_mergeable(remain_bbox, remove_bbox, iof_thr, y_diff_thr, y_diff_iof_thr, reference_iof(remain_bbox, remove_bbox)):
+                    result[remain_index] = get_merged_bbox(remain_bbox, remove_bbox)
+                    result[remove_index] = None
+                    merged_flag[remain_index] = True
+                    merged_flag[remove_index] = True
+                    merged_cnt += 1
+        ann = list(dict.fromkeys(bbox for bbox in result if bbox is not None))
+        if merged_cnt == 0:
+            return ann
+
+if __name__ == '__main__':
+    merge = text_merge('')
+    for fragment_num in fragment_nums:
+        annset = make_synthetic_drawing(fragment_num)
+
+        start = time.time()
+        result = merge.merge_annotations(annset, iof_thr, y_diff_thr, y_diff_iof_thr)
+        elapsed = time.time() - start
+
+        if fragment_num <= reference_max_fragment_num:
+            start = time.time()
+            reference_result = reference_merge(merge, annset)
+            reference_elapsed = time.time() - start
+            print(f'* {fragment_num} boxes: full scan {reference_elapsed:.3f} sec, indexed {elapsed:.3f} sec, {len(result)} boxes after merge, '
+                  f'identical: {result == reference_result}, speedup: {reference_elapsed / elapsed:.1f}x')
+        else:
+            print(f'* {fragment_num} boxes: indexed {elapsed:.3f} sec, {len(result)} boxes after merge')
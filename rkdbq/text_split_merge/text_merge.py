@@ -1,8 +1,8 @@
 import os
 import numpy as np
-from shapely import Polygon
 from pathlib import Path
 from tqdm import tqdm
+from rkdbq.geometry.box_overlap import points_to_polygons, pairwise_overlap
 
 class text_merge():
     def __init__(self, anntxts_path: str, iof_thr: float = 0.3, y_diff_iof_thr: float = 0.1, y_diff_thr: int = 5):
@@ -12,24 +12,8 @@ class text_merge():
         self.__y_diff_thr = y_diff_thr
 
     def __cal_iof(self, remain_points: tuple, remove_points: tuple):
-        coords = self.__list2points(remain_points)
-        remain_rect = Polygon(coords)
-
-        coords = self.__list2points(remove_points)
-        remove_rect = Polygon(coords)
-
-        iof = 0
-        if remain_rect.intersects(remove_rect):
-            intersection = remain_rect.intersection(remove_rect).area
-            iof = intersection / remove_rect.area
-        return iof
-    
-    def __list2points(self, points: list):
-        coords = points
-        coords = np.array([int(i) for i in coords])
-        coords = coords.reshape(4,2)
-        coords = coords.tolist()
-        return coords
+        polys = points_to_polygons([remain_points, remove_points])
+        return pairwise_overlap(polys[0:1], polys[1:2], mode='iof')[0]
     
     def __ann2dict(self, ann_path: str, split_word: str = ' '):
         """ ann 파일을 집합으로 파싱
@@ -1,10 +1,14 @@
-import os, math, cv2
+import os, cv2
 import numpy as np
 from xml.dom import minidom
 import xml.etree.ElementTree as ET
-from shapely import Polygon
+import shapely
+from shapely import STRtree
 from pathlib import Path
 from tqdm import tqdm
+from rkdbq.geometry.box_overlap import points_to_polygons, pairwise_overlap
+from rkdbq.geometry.xml_reader import iterparse_xml2dict
+from rkdbq.geometry.rotated_box import two2four, four2two, read_two_point_boxes, read_four_point_boxes, to_bndbox_dict
 
 class text_merge():
     """ 텍스트 병합을 수행한다.
@@ -17,143 +21,6 @@ class text_merge():
         self.__TWO_POINTS_FORMAT = 22 # 2점 좌표 + 각도 포맷
         self.__FOUR_POINTS_FORMAT = 44 # 4점 좌표 (+ 각도) 포맷
 
-    def __cal_iof(self, remain_points: tuple, remove_points: tuple):
-        coords = self.__list2points(remain_points)
-        remain_rect = Polygon(coords)
-
-        coords = self.__list2points(remove_points)
-        remove_rect = Polygon(coords)
-
-        iof = 0
-        if remain_rect.intersects(remove_rect):
-            intersection = remain_rect.intersection(remove_rect).area
-            iof = intersection / remove_rect.area
-        return iof
-    
-    def __rotate(self, point: tuple, degree: float, pivot: tuple):
-        """ pivot을 기준으로 degree만큼 point를 회전
-
-        """
-        rad = math.radians(degree)
-        cos_theta = math.cos(rad)
-        sin_theta = math.sin(rad)
-        x, y = point
-        piv_x, piv_y = pivot
-
-        rotated = {}
-        rotated['x'] = cos_theta * (x - piv_x) - sin_theta * (y - piv_y) + piv_x
-        rotated['y'] = sin_theta * (x - piv_x) + cos_theta * (y - piv_y) + piv_y
-
-        return (rotated['x'], rotated['y'])
-    
-    def __dict2points(self, points: dict):
-        """ 점 딕셔너리를 리스트로 변환
-        
-        """
-        coords = [float(points['x1']), float(points['y1']), float(points['x2']), float(points['y2']), 
-                  float(points['x3']), float(points['y3']), float(points['x4']), float(points['y4']),]
-        coords = np.array([int(i) for i in coords])
-        coords = coords.reshape(4,2)
-        coords = coords.tolist()
-        return coords
-    
-    def __four2two(self, bbox: dict):
-        """ 4점 좌표 형식을 2점 좌표 형식으로 변환
-        
-        """
-        result = {}
-        bbox_two = {}
-        bbox_four = {}
-
-        for key, value in bbox.items():
-            result[key] = value
-        for coord, value in bbox['bndbox'].items():
-            bbox_four[coord] = float(value)
-
-        mid = {}
-        mid['x'] = (bbox_four['x1'] + bbox_four['x3']) / 2
-        mid['y'] = (bbox_four['y1'] + bbox_four['y3']) / 2
-
-        point = (bbox_four['x1'], bbox_four['y1'])
-        degree = float(bbox['degree'])
-        pivot = (mid['x'], mid['y'])
-        x, y = self.__rotate(point, -degree, pivot)
-        bbox_two['xmin'] = str(x)
-        bbox_two['ymin'] = str(y)
-
-        point = (bbox_four['x3'], bbox_four['y3'])
-        degree = float(bbox['degree'])
-        pivot = (mid['x'], mid['y'])
-        x, y = self.__rotate(point, -degree, pivot)
-        bbox_two['xmax'] = str(x)
-        bbox_two['ymax'] = str(y)
-
-        result['bndbox'] = bbox_two
-
-        return result
-    
-    def __two2four(self, bbox: dict):
-        """ 2점 좌표 형식을 4점 좌표 형식으로 변환
-        
-        """
-        result = {}
-        bbox_two = {}
-        bbox_four = {}
-
-        for key, value in bbox.items():
-            result[key] = value
-        for coord, value in bbox['bndbox'].items():
-            bbox_two[coord] = float(value)
-
-        mid = {}
-        mid['x'] = (bbox_two['xmin'] + bbox_two['xmax']) / 2
-        mid['y'] = (bbox_two['ymin'] + bbox_two['ymax']) / 2
-        
-        point = (bbox_two['xmin'], bbox_two['ymin'])
-        degree = float(bbox['degree'])
-        pivot = (mid['x'], mid['y'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x1'] = str(x)
-        bbox_four['y1'] = str(y)
-
-        point = (bbox_two['xmax'], bbox_two['ymin'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x2'] = str(x)
-        bbox_four['y2'] = str(y)
-
-        point = (bbox_two['xmax'], bbox_two['ymax'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x3'] = str(x)
-        bbox_four['y3'] = str(y)
-
-        point = (bbox_two['xmin'], bbox_two['ymax'])
-        x, y = self.__rotate(point, degree, pivot)
-        bbox_four['x4'] = str(x)
-        bbox_four['y4'] = str(y)
-
-        result['bndbox'] = bbox_four
-
-        return result
-    
-    def __xml2dict(self, element):
-        """ xml 파일을 집합으로 파싱
-        
-        """
-        result = {}
-        for child in element:
-            child_data = self.__xml2dict(child)
-            if child_data:
-                if child.tag in result:
-                    if type(result[child.tag]) is list:
-                        result[child.tag].append(child_data)
-                    else:
-                        result[child.tag] = [result[child.tag], child_data]
-                else:
-                    result[child.tag] = child_data
-            else:
-                result[child.tag] = child.text
-        return result
-
     def __xmls2dict(self, xml_dir_path: str, mode: int):
         """ xml 파일들을 딕셔너리로 파싱
         
@@ -164,26 +31,20 @@ class text_merge():
                 if filename.endswith('.xml'):
                     file_path = os.path.join(root, filename)
                     try:
-                        tree = ET.parse(file_path)
-                        root_element = tree.getroot()
                         diagram = filename.split('.xml')[0]
-                        result[diagram] = self.__xml2dict(root_element)
+                        result[diagram] = iterparse_xml2dict(file_path)
+                        # bndbox는 도면 단위로 한 번에 변환한 4점 좌표 (4, 2) 배열로 저장
+                        objects = result[diagram]['symbol_object']
                         if mode == self.__TWO_POINTS_FORMAT:
-                            four_bboxs = []
-                            for bbox in result[diagram]['symbol_object']:
-                                four_bboxs.append(self.__two2four(bbox))
-                            result[diagram]['symbol_object'] = four_bboxs
+                            polys = two2four(*read_two_point_boxes(objects))
+                        else:
+                            polys = read_four_point_boxes(objects)
+                        for bbox, poly in zip(objects, polys):
+                            bbox['bndbox'] = poly
                     except ET.ParseError as e:
                         print(f'Error parsing {file_path}: {e}')
         return result
     
-    def __list2points(self, points: list):
-        coords = points
-        coords = np.array([int(i) for i in coords])
-        coords = coords.reshape(4,2)
-        coords = coords.tolist()
-        return coords
-    
     def __get_merged_text(self, remain_str: str, remove_str: str):
         remain_len = len(remain_str)
         remove_len = len(remove_str)
@@ -243,46 +104,133 @@ class text_merge():
 
         return tuple(result)
     
-    def __cmp_iof(self, ann: list, iof_thr: float, y_diff_thr: int, y_diff_iof_thr: float):
-        remain_ann = set(ann)
+    def __is_mergeable(self, remain_bbox: tuple, remove_bbox: tuple, iof_thr: float, y_diff_thr: int, y_diff_iof_thr: float, iof: float = None):
+        """ remain_bbox에 remove_bbox를 병합할지 판단 (같은 각도의 text 박스이고, IoF 또는 y값 차 조건을 만족)
+
+            iof가 주어지지 않으면 두 박스의 IoF를 계산함
+        """
+        remain_type = remain_bbox[0]
+        remove_type = remove_bbox[0]
+        remain_degree = remain_bbox[11]
+        remove_degree = remove_bbox[11]
+        if remain_type != 'text' or remove_type != 'text' or remain_degree != remove_degree:
+            return False
+
+        remain_points = [float(point) for point in remain_bbox[2:10]]
+        remove_points = [float(point) for point in remove_bbox[2:10]]
+        remain_y = {}
+        remove_y = {}
+        remain_y['min'] = min(remain_points[1::2])
+        remain_y['max'] = max(remain_points[1::2])
+        remove_y['min'] = min(remove_points[1::2])
+        remove_y['max'] = max(remove_points[1::2])
+        ymin_diff = abs(float(remain_y['min']) - float(remove_y['min']))
+        ymax_diff = abs(float(remain_y['max']) - float(remove_y['max']))
+        if iof is None:
+            polys = points_to_polygons([remain_points, remove_points])
+            iof = pairwise_overlap(polys[0:1], polys[1:2], mode='iof')[0]
+        horizontal_intersect = ymin_diff < y_diff_thr and ymax_diff < y_diff_thr and iof > y_diff_iof_thr
+        return iof > iof_thr or horizontal_intersect
+
+    def __get_neighbors(self, polys: np.ndarray, use_index: bool):
+        """ 박스마다 병합 후보가 될 수 있는 (envelope가 겹치는) 박스 index list 반환 (STRtree 사용, index 오름차순)
+
+        Arguments:
+            polys: (N, 4, 2) 박스 꼭짓점 배열
+        """
+        if not use_index: # threshold가 음수이면 겹치지 않는 박스도 병합될 수 있으므로 모든 박스가 후보
+            return [[j for j in range(polys.shape[0]) if j != i] for i in range(polys.shape[0])]
+
+        envelopes = shapely.box(polys[:, :, 0].min(axis=1), polys[:, :, 1].min(axis=1), polys[:, :, 0].max(axis=1), polys[:, :, 1].max(axis=1))
+        pairs = STRtree(envelopes).query(envelopes, predicate='intersects')
+        pairs = pairs[:, pairs[0] != pairs[1]]
+        pairs = pairs[:, np.lexsort((pairs[1], pairs[0]))]
+
+        neighbors = [[] for _ in range(polys.shape[0])]
+        for i, j in zip(pairs[0].tolist(), pairs[1].tolist()):
+            neighbors[i].append(j)
+        return neighbors
+
+    def __get_neighbor_iofs(self, polys: np.ndarray, neighbors: list, changed_flag: list):
+        """ 박스마다 병합 후보 박스들과의 IoF를 한 번에 계산 (iofs[i][j]: i 박스에 대한 j 박스의 IoF, j는 neighbors[i]의 박스)
+
+            changed_flag가 둘 다 False인 쌍은 비교하지 않으므로 계산하지 않음
+        """
+        pairs = [(i, j) for i, neighbor in enumerate(neighbors) for j in neighbor if changed_flag[i] or changed_flag[j]]
+        remain_index = [i for i, _ in pairs]
+        remove_index = [j for _, j in pairs]
+        pair_iofs = pairwise_overlap(polys[remain_index], polys[remove_index], mode='iof').tolist()
+
+        iofs = [{} for _ in neighbors]
+        for i, j, iof in zip(remain_index, remove_index, pair_iofs):
+            iofs[i][j] = iof
+        return iofs
+
+    def __cmp_iof(self, ann: list, iof_thr: float, y_diff_thr: int, y_diff_iof_thr: float, changed: set = None):
+        """ 박스들을 순서대로 보면서 아직 병합되지 않은 박스 중 병합 조건을 만족하는 첫 박스와 병합 (한 박스는 한 번에 한 번만 병합)
+
+            envelope가 겹치는 박스만 비교하고, changed가 주어지면 두 박스 중 하나라도 changed(직전 단계에서 새로 병합된 박스)에
+            속하는 쌍만 비교함 (둘 다 변하지 않은 쌍은 직전 단계에서 이미 병합 조건을 만족하지 않았음)
+
+        Return:
+            remain_ann (list): 병합 후 박스 list (병합된 박스는 remain 박스의 위치에 놓임)
+            merged_cnt (int): 병합 횟수
+            merged_bboxes (set): 이번 단계에서 새로 병합된 박스
+        """
+        use_index = min(iof_thr, y_diff_iof_thr) >= 0
+        polys = points_to_polygons([bbox[2:10] for bbox in ann])
+        neighbors = self.__get_neighbors(polys, use_index)
+        changed_flag = [changed is None or bbox in changed for bbox in ann]
+        iofs = self.__get_neighbor_iofs(polys, neighbors, changed_flag)
+
+        result = list(ann)
         merged_flag = [False]*ann.__len__()
+        merged_bboxes = set()
         merged_cnt = 0
-        for remain_bbox in ann:
-                for remove_bbox in ann:
-                    if merged_flag[ann.index(remain_bbox)]:
-                        continue
-                    if merged_flag[ann.index(remove_bbox)]:
-                        continue
-                    if remain_bbox != remove_bbox:
-                        remain_type = remain_bbox[0]
-                        remove_type = remove_bbox[0]
-                        remain_degree = remain_bbox[11]
-                        remove_degree = remove_bbox[11]
-                        if remain_type == 'text' and remove_type == 'text' and remain_degree == remove_degree:
-                            remain_points = [float(point) for point in remain_bbox[2:10]]
-                            remove_points = [float(point) for point in remove_bbox[2:10]]
-                            remain_y = {}
-                            remove_y = {}
-                            remain_y['min'] = min(remain_points[1::2])
-                            remain_y['max'] = max(remain_points[1::2])
-                            remove_y['min'] = min(remove_points[1::2])
-                            remove_y['max'] = max(remove_points[1::2])
-                            ymin_diff = abs(float(remain_y['min']) - float(remove_y['min']))
-                            ymax_diff = abs(float(remain_y['max']) - float(remove_y['max']))
-                            iof = self.__cal_iof(remain_points, remove_points)
-                            horizontal_intersect = ymin_diff < y_diff_thr and ymax_diff < y_diff_thr and iof > y_diff_iof_thr
-                            if iof > iof_thr or horizontal_intersect:
-
-                                merged_bbox = self.__get_merged_bbox(remain_bbox, remove_bbox)
-                                if remove_bbox in remain_ann:
-                                    remain_ann.remove(remove_bbox)
-                                if remain_bbox in remain_ann:
-                                    remain_ann.remove(remain_bbox)
-                                remain_ann.add(merged_bbox)
-                                merged_flag[ann.index(remain_bbox)] = True
-                                merged_flag[ann.index(remove_bbox)] = True
-                                merged_cnt += 1
-        return remain_ann, merged_cnt
+        for remain_index, remain_bbox in enumerate(ann):
+            if merged_flag[remain_index]:
+                continue
+            for remove_index in neighbors[remain_index]:
+                if merged_flag[remove_index]:
+                    continue
+                remove_bbox = ann[remove_index]
+                if not changed_flag[remain_index] and not changed_flag[remove_index]:
+                    continue
+                if self.__is_mergeable(remain_bbox, remove_bbox, iof_thr, y_diff_thr, y_diff_iof_thr, iofs[remain_index][remove_index]):
+                    merged_bbox = self.__get_merged_bbox(remain_bbox, remove_bbox)
+                    result[remain_index] = merged_bbox
+                    result[remove_index] = None
+                    merged_bboxes.add(merged_bbox)
+                    merged_flag[remain_index] = True
+                    merged_flag[remove_index] = True
+                    merged_cnt += 1
+                    break
+
+        remain_ann = [bbox for bbox in result if bbox is not None]
+        return remain_ann, merged_cnt, merged_bboxes
+
+    def merge_annotations(self, annset: list, iof_thr: float = 0.3, y_diff_thr: int = 5, y_diff_iof_thr: float = 0.1):
+        """ 도면 하나의 박스들에 대해 더 이상 병합되는 박스가 없을 때까지 텍스트 병합 반복
+
+        Arguments:
+            annset: (type, class, x1, y1, ..., x4, y4, isLarge, degree, flip) 형식의 박스 tuple list
+        Return:
+            병합 후 박스 tuple list
+        """
+        merged_annset = list(dict.fromkeys(annset)) # 같은 박스는 하나만 남김
+        changed = None
+        while True:
+            merged_annset, merged_cnt, changed = self.__cmp_iof(
+                ann=merged_annset,
+                iof_thr=iof_thr,
+                y_diff_thr=y_diff_thr,
+                y_diff_iof_thr=y_diff_iof_thr,
+                changed=changed,
+            )
+            merged_annset = list(dict.fromkeys(merged_annset))
+            if merged_cnt == 0:
+                break
+        return merged_annset
     
     def __merge(self, iof_thr: float, y_diff_thr: int, y_diff_iof_thr: float, xml_dir_path: str):
         result = {}
@@ -293,46 +241,28 @@ class text_merge():
             for obj in ann['symbol_object']:
                 type = obj['type']
                 cls = obj['class'] if obj['class'] is not None else ''
-                coords = [str(coord) for coord in obj['bndbox'].values()]
+                coords = obj['bndbox'].ravel().tolist()
                 isLarge = obj['isLarge'] if 'isLarge' in obj else 'n'
                 degree = obj['degree'] if 'degree' in obj else '0'
                 flip = obj['flip'] if 'flip' in obj else 'n'
                 bbox = (type,) + (cls,) + tuple(coords) + (isLarge,) + (degree,) + (flip,)
                 annset.append(bbox)
 
-            merged_annset = annset
-            while True:
-                merged_annset, merged_cnt = self.__cmp_iof(
-                    ann=list(merged_annset),
-                    iof_thr=iof_thr,
-                    y_diff_thr=y_diff_thr,
-                    y_diff_iof_thr=y_diff_iof_thr,
-                )
-                if merged_cnt == 0:
-                    break
+            merged_annset = self.merge_annotations(annset, iof_thr, y_diff_thr, y_diff_iof_thr)
 
+            # 병합 후 박스들을 한 번에 2점 좌표로 변환하고, 출력할 때만 문자열로 변환
+            polys = np.array([obj[2:10] for obj in merged_annset], dtype=np.float64)
+            boxes = four2two(polys, [float(obj[11]) for obj in merged_annset]).tolist()
             result[diagram]['symbol_object'] = []
-            for obj in merged_annset:
+            for obj, box in zip(merged_annset, boxes):
                 symbol_obj = {
                     'type': obj[0],
                     'class': obj[1],
-                    'bndbox': {
-                        'x1': obj[2],
-                        'y1': obj[3],
-                        'x2': obj[4],
-                        'y2': obj[5],
-                        'x3': obj[6],
-                        'y3': obj[7],
-                        'x4': obj[8],
-                        'y4': obj[9],
-                    },
+                    'bndbox': to_bndbox_dict(box),
                     'isLarge': obj[10],
                     'degree': obj[11],
                     'flip': obj[12],
                 }
-                symbol_obj = self.__four2two(symbol_obj)
-                for coord, value in symbol_obj['bndbox'].items():
-                    symbol_obj['bndbox'][coord] = str(round(float(value)))
                 result[diagram]['symbol_object'].append(symbol_obj)
         return result
          
@@ -415,7 +345,7 @@ class text_merge():
             vis_img = cv2.imread(gt_img_path)
             for aft_item in aft_dict[diagram]['symbol_object']:
                 aft_bbox = aft_item['bndbox']
-                aft_points = self.__dict2points(aft_bbox)
+                aft_points = aft_bbox.astype(int).tolist()
                 aft_type = aft_item['type']
                 if aft_type == type or type == 'total':
                     for num in range(4):
@@ -434,7 +364,7 @@ class text_merge():
             vis_img = cv2.imread(gt_img_path)
             for bef_item in bef_dict[diagram]['symbol_object']:
                 bef_bbox = bef_item['bndbox']
-                bef_points = self.__dict2points(bef_bbox)
+                bef_points = bef_bbox.astype(int).tolist()
                 bef_type = bef_item['type']
                 if bef_type == type or type == 'total':
                     for num in range(4):
@@ -453,7 +383,7 @@ class text_merge():
             vis_img = cv2.imread(gt_img_path)
             for aft_item in aft_dict[diagram]['symbol_object']:
                 aft_bbox = aft_item['bndbox']
-                aft_points = self.__dict2points(aft_bbox)
+                aft_points = aft_bbox.astype(int).tolist()
                 aft_type = aft_item['type']
                 if aft_type == type or type == 'total':
                     for num in range(4):
@@ -466,7 +396,7 @@ class text_merge():
 
             for bef_item in bef_dict[diagram]['symbol_object']:
                 bef_bbox = bef_item['bndbox']
-                bef_points = self.__dict2points(bef_bbox)
+                bef_points = bef_bbox.astype(int).tolist()
                 bef_type = bef_item['type']
                 if bef_type == type or type == 'total':
                     for num in range(4):
@@ -480,24 +410,25 @@ class text_merge():
             vis_img_path = os.path.join(out_imgs_path, f"{diagram}_total.jpg")
             cv2.imwrite(vis_img_path, vis_img)
 
-gt_imgs_path = 'D:\\Data\\raw\\PNID_DOTA_before_split\\test\\images'
-annxmls_path = 'D:\\Data\\xml2eval\\DT_test_second_year_before_text_merge'
-
-merge = text_merge(annxmls_path)
-
-merged_annxmls_path = 'D:\\Experiments\\Text_Merge\\from_xml\\DT_test_final_merged'
-merge.text_merge_from_xmls(
-    out_xmls_path=merged_annxmls_path,
-    # iof_thr=0.8,
-    # y_diff_thr=,
-    # y_diff_iof_thr=0.8,
-)
-
-visualize_path = 'D:\\Experiments\\Visualizations\\from_xml\\DT_xmls_test_after_merge'
-merge.visualize(
-    gt_imgs_path=gt_imgs_path, 
-    befxmls_path=annxmls_path, 
-    aftxmls_path=merged_annxmls_path, 
-    out_imgs_path=visualize_path, 
-    type='text'
-)
\ No newline at end of file
+if __name__ == '__main__':
+    gt_imgs_path = 'D:\\Data\\raw\\PNID_DOTA_before_split\\test\\images'
+    annxmls_path = 'D:\\Data\\xml2eval\\DT_test_second_year_before_text_merge'
+
+    merge = text_merge(annxmls_path)
+
+    merged_annxmls_path = 'D:\\Experiments\\Text_Merge\\from_xml\\DT_test_final_merged'
+    merge.text_merge_from_xmls(
+        out_xmls_path=merged_annxmls_path,
+        # iof_thr=0.8,
+        # y_diff_thr=,
+        # y_diff_iof_thr=0.8,
+    )
+
+    visualize_path = 'D:\\Experiments\\Visualizations\\from_xml\\DT_xmls_test_after_merge'
+    merge.visualize(
+        gt_imgs_path=gt_imgs_path, 
+        befxmls_path=annxmls_path, 
+        aftxmls_path=merged_annxmls_path, 
+        out_imgs_path=visualize_path, 
+        type='text'
+    )
\ No newline at end of file